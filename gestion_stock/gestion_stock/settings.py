@@ -45,6 +45,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'stock.instrumentation.MesureRequetesMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -149,3 +150,66 @@ DEFAULT_FROM_EMAIL = 'gestion.stock@example.com'
 
 # ==================== FIN CONFIGURATION EMAIL ====================
 
+
+# ==================== ALERTES DE STOCK ====================
+
+# Fenêtre (en secondes) pendant laquelle les alertes rupture / stock bas d'un
+# même produit sont regroupées (voir stock.alertes). Les clés sont gardées
+# dans le cache Django (par défaut en mémoire, propre à chaque processus).
+STOCK_FENETRE_ALERTES = 3600
+
+# Durée (en secondes) de conservation en cache des compteurs de notifications
+# non lues / non traitées (voir stock.compteurs). Les écritures invalident le
+# cache du processus courant ; les autres processus relisent au plus tard
+# après ce délai.
+STOCK_DUREE_CACHE_COMPTEURS = 300
+
+# Secondes sans événement avant l'envoi d'un commentaire de maintien sur le
+# flux en direct /stock/evenements/ (voir stock.evenements).
+STOCK_FLUX_PING = 15
+
+# Âge minimal (en secondes) des mouvements de stock comptés dans un
+# instantané (voir stock.mouvements) : doit dépasser la durée de la plus
+# longue transaction qui écrit des mouvements.
+STOCK_MARGE_INSTANTANES = 300
+
+
+# ==================== INSTRUMENTATION SQL ====================
+
+# Nombre maximal de requêtes SQL par nom d'URL (voir stock.instrumentation).
+# Chaque requête HTTP est résumée dans l'en-tête Server-Timing et sur le
+# logger 'stock.requetes' ; un dépassement est journalisé en WARNING, et
+# fait échouer la requête si STOCK_BUDGETS_STRICTS est vrai (tests).
+STOCK_BUDGETS_REQUETES = {
+    'stock:dashboard': 9,
+    'stock:produit_list': 8,
+    'stock:commande_list': 8,
+    'stock:facture_list': 8,
+    'stock:historique_list': 6,
+    'stock:statistiques_list': 8,
+    'stock:agent_list': 7,
+    'stock:fournisseur_list': 5,
+    'stock:agent_graphs_data': 5,
+    'admin:stock_produit_changelist': 8,
+    'admin:stock_commande_changelist': 7,
+    'admin:stock_facture_changelist': 6,
+    'admin:stock_fournisseur_changelist': 5,
+    'admin:stock_notification_changelist': 5,
+    'admin:stock_panier_changelist': 6,
+    'admin:stock_produitfournisseur_changelist': 6,
+}
+STOCK_BUDGETS_STRICTS = False
+
+
+# ==================== MÉTRIQUES ====================
+
+# Métriques exposées au format Prometheus sur /stock/metriques/ (voir
+# stock.metriques). Avec plusieurs processus (workers gunicorn, commande
+# envoyer_emails), STOCK_METRIQUES_DOSSIER désigne un dossier local partagé,
+# à vider au démarrage du serveur : chaque processus y écrit ses valeurs
+# toutes les STOCK_METRIQUES_INTERVALLE secondes (thread démon) et à sa
+# sortie. Sans jeton, seuls les administrateurs connectés lisent les
+# métriques.
+STOCK_METRIQUES_DOSSIER = None
+STOCK_METRIQUES_INTERVALLE = 5
+STOCK_METRIQUES_JETON = None
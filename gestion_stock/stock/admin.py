@@ -6,11 +6,12 @@ Amélioration v2.0 : Filtres avancés, actions étendues, affichages optimisés.
 """
 
 from django.contrib import admin
+from django.utils import timezone
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 from django.contrib.admin import SimpleListFilter, TabularInline
-from django.db.models import Count, Sum, F, DecimalField, Case, When, Q
+from django.db.models import Count, Sum, F, DecimalField, Case, When, Q, OuterRef, Subquery, FloatField, Value
 from django.db.models.functions import Coalesce
 from datetime import datetime, timedelta
 import json
@@ -29,7 +30,9 @@ admin.site.index_title = "Bienvenue dans l'administration"
 
 # Personnalisation CSS du site
 admin.site.enable_nav_sidebar = True
-from .models import Produit, Commande, Facture, Historique, Fournisseur, ProduitFournisseur, Notification, MontantAgent
+from .models import Produit, Commande, Facture, Historique, Fournisseur, ProduitFournisseur, Notification, MontantAgent, Panier, EmailSortant, MouvementMontantAgent, StatistiqueJournaliere, Archive, SuggestionReapprovisionnement, PrevisionDemande, AlerteFournisseur, CompteurNotification
+from .statistiques import annoter_fournisseurs
+from . import archivage
 
 
 # ==================== FILTRES PERSONNALISES ====================
@@ -184,9 +187,26 @@ class NotificationLueFilter(SimpleListFilter):
 
 
 
+# ==================== SUPPRESSION LOGIQUE ====================
+
+class ArchivesVisiblesMixin:
+    """
+    Affiche aussi les lignes supprimées logiquement (manager all_objects) :
+    le manager par défaut ne retourne que les lignes actives, l'admin les
+    distingue avec le filtre is_deleted.
+    """
+
+    def get_queryset(self, request):
+        queryset = self.model.all_objects.get_queryset()
+        ordering = self.get_ordering(request)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        return queryset
+
+
 # ==================== INLINES POUR EDITION RAPIDE ====================
 
-class CommandeInline(TabularInline):
+class CommandeInline(ArchivesVisiblesMixin, TabularInline):
     """Inline pour éditer les commandes directement dans la fiche produit."""
     model = Commande
     fields = ('code_cmd', 'quantite_cmd', 'date_commande', 'is_deleted')
@@ -206,7 +226,7 @@ class ProduitFournisseurInline(TabularInline):
 
 
 @admin.register(Produit)
-class ProduitAdmin(admin.ModelAdmin):
+class ProduitAdmin(ArchivesVisiblesMixin, admin.ModelAdmin):
     """
     Configuration de l'administration des produits.
     Version 2.0 : Inlines, optimisation, affichages avancés.
@@ -225,7 +245,7 @@ class ProduitAdmin(admin.ModelAdmin):
             'classes': ('wide',)
         }),
         ('Stock et Prix', {
-            'fields': ('quantite', 'prix_unit', 'total_valeur_stock', 'stock_alert'),
+            'fields': ('quantite', 'seuil_alerte', 'prix_unit', 'total_valeur_stock', 'stock_alert'),
             'classes': ('wide',)
         }),
         ('Métadonnées', {
@@ -328,7 +348,7 @@ class ProduitAdmin(admin.ModelAdmin):
 
 
 @admin.register(Commande)
-class CommandeAdmin(admin.ModelAdmin):
+class CommandeAdmin(ArchivesVisiblesMixin, admin.ModelAdmin):
     """
     Configuration de l'administration des commandes.
     Version 2.0 : Optimisation requêtes, filtres avancés.
@@ -356,7 +376,7 @@ class CommandeAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         """Optimisation des requêtes avec select_related."""
         queryset = super().get_queryset(request)
-        return queryset.select_related('code_prod', 'agent_utilisateur')
+        return queryset.select_related('code_prod', 'agent_utilisateur').with_montant()
     
     def quantite_cmd_badge(self, obj):
         """Affiche la quantité avec couleur."""
@@ -366,12 +386,13 @@ class CommandeAdmin(admin.ModelAdmin):
     quantite_cmd_badge.short_description = 'Quantité'
     
     def montant_badge(self, obj):
-        """Affiche le montant avec format couleur."""
-        montant = obj.montant_commande()
+        """Affiche le montant (calculé en base) avec format couleur."""
+        montant = obj.montant
         return format_html(
             f'<span style="background-color: #8b5cf6; color: white; padding: 6px 12px; border-radius: 4px; font-weight: 600;">{montant:.2f}€</span>'
         )
     montant_badge.short_description = 'Montant'
+    montant_badge.admin_order_field = 'montant'
     
     def montant_commande_display(self, obj):
         """Affiche le montant total de la commande."""
@@ -389,14 +410,46 @@ class CommandeAdmin(admin.ModelAdmin):
     statut_cmd.short_description = 'Statut'
 
 
+class LignePanierInline(ArchivesVisiblesMixin, TabularInline):
+    """Inline pour afficher les lignes (commandes) d'un panier."""
+    model = Commande
+    fk_name = 'panier'
+    fields = ('code_cmd', 'code_prod', 'quantite_cmd', 'is_deleted')
+    readonly_fields = ('code_cmd', 'code_prod', 'quantite_cmd')
+    extra = 0
+    can_delete = False
+
+
+@admin.register(Panier)
+class PanierAdmin(admin.ModelAdmin):
+    """
+    Configuration de l'administration des paniers (commandes multi-produits).
+    """
+    list_display = ('code_panier', 'agent_utilisateur', 'nombre_lignes', 'date_creation', 'is_deleted')
+    list_filter = ('is_deleted', 'date_creation', 'agent_utilisateur')
+    search_fields = ('code_panier', 'agent_utilisateur__username')
+    readonly_fields = ('code_panier', 'date_creation')
+    inlines = [LignePanierInline]
+    
+    def get_queryset(self, request):
+        """Optimisation des requêtes : nombre de lignes calculé en base."""
+        queryset = super().get_queryset(request)
+        return queryset.select_related('agent_utilisateur').annotate(nb_lignes=Count('lignes'))
+    
+    def nombre_lignes(self, obj):
+        """Affiche le nombre de lignes du panier."""
+        return format_html(f'<strong style="color: #2563eb;">{obj.nb_lignes}</strong> ligne(s)')
+    nombre_lignes.short_description = 'Lignes'
+
+
 @admin.register(Facture)
-class FactureAdmin(admin.ModelAdmin):
+class FactureAdmin(ArchivesVisiblesMixin, admin.ModelAdmin):
     """
     Configuration de l'administration des factures.
     Version 2.0 : Optimisation requêtes, nouveaux filtres.
     """
     list_display = ('code_facture', 'commande', 'agent_utilisateur', 'montant_badge', 'statut_badge', 'paiement_badge', 'date_facture')
-    list_filter = (StatutPaiementFilter, DateRangeFilter, 'statut', 'date_facture', 'agent_utilisateur')
+    list_filter = (StatutPaiementFilter, DateRangeFilter, 'statut', 'date_facture', 'is_deleted', 'agent_utilisateur')
     search_fields = ('code_facture', 'commande__code_cmd', 'agent_utilisateur__username')
     readonly_fields = ('code_facture', 'date_facture', 'date_modification', 'montant_restant')
     fieldsets = (
@@ -518,9 +571,9 @@ class FournisseurAdmin(admin.ModelAdmin):
     )
     
     def get_queryset(self, request):
-        """Optimisation des requêtes."""
+        """Optimisation des requêtes : statistiques annotées en une requête groupée."""
         queryset = super().get_queryset(request)
-        return queryset.prefetch_related('produits_fournis')
+        return annoter_fournisseurs(queryset)
     
     def mot_de_passe_badge(self, obj):
         """Affiche l'état du mot de passe."""
@@ -536,8 +589,8 @@ class FournisseurAdmin(admin.ModelAdmin):
     
     def fournisseur_score(self, obj):
         """Affiche un score du fournisseur."""
-        # Nombre de produits fournis
-        nb_produits = obj.produits_fournis.count()
+        # Nombre de produits fournis (annoté par get_queryset)
+        nb_produits = obj.produits_count
         
         if nb_produits >= 20:
             score = '⭐⭐⭐⭐⭐'
@@ -698,22 +751,14 @@ class NotificationAdmin(admin.ModelAdmin):
     statut_badges.short_description = 'Statut'
     
     def marquer_comme_lue(self, request, queryset):
-        """Action pour marquer les notifications comme lues."""
-        updated = 0
-        for notification in queryset:
-            if not notification.est_lue:
-                notification.marquer_comme_lue()
-                updated += 1
+        """Action pour marquer les notifications comme lues (un seul UPDATE)."""
+        updated = queryset.marquer_lues()
         self.message_user(request, f'{updated} notification(s) marquée(s) comme lue(s).')
     marquer_comme_lue.short_description = '✅ Marquer comme lue(s)'
     
     def marquer_comme_traitee(self, request, queryset):
-        """Action pour marquer les notifications comme traitées."""
-        updated = 0
-        for notification in queryset:
-            if not notification.est_traitee:
-                notification.marquer_comme_traitee()
-                updated += 1
+        """Action pour marquer les notifications comme traitées (un seul UPDATE)."""
+        updated = queryset.marquer_traitees()
         self.message_user(request, f'{updated} notification(s) marquée(s) comme traitée(s).')
     marquer_comme_traitee.short_description = '✅ Marquer comme traitée(s)'
     
@@ -722,20 +767,165 @@ class NotificationAdmin(admin.ModelAdmin):
         return False
 
 
+@admin.register(EmailSortant)
+class EmailSortantAdmin(admin.ModelAdmin):
+    """
+    Configuration de l'administration de la file d'envoi des emails.
+    """
+    list_display = ('code_email', 'destinataire', 'sujet', 'statut', 'tentatives', 'prochaine_tentative', 'date_envoi')
+    list_filter = ('statut', 'date_creation')
+    search_fields = ('destinataire', 'sujet')
+    readonly_fields = ('code_email', 'jeton', 'derniere_erreur', 'date_creation', 'date_envoi')
+    actions = ['remettre_en_file']
+    
+    def remettre_en_file(self, request, queryset):
+        """Action pour réessayer immédiatement les emails sélectionnés."""
+        updated = queryset.exclude(statut='envoye').update(
+            statut='en_attente', tentatives=0, prochaine_tentative=timezone.now()
+        )
+        self.message_user(request, f'{updated} email(s) remis en file.')
+    remettre_en_file.short_description = '🔁 Remettre en file'
+    
+    def has_add_permission(self, request):
+        """Les emails sont mis en file automatiquement."""
+        return False
+
+
+@admin.register(StatistiqueJournaliere)
+class StatistiqueJournaliereAdmin(admin.ModelAdmin):
+    """
+    Consultation des agrégats statistiques (reconstruits par `reconstruire_statistiques`).
+    """
+    list_display = ('jour', 'produit', 'fournisseur', 'agent_utilisateur', 'nb_commandes', 'quantite_commandee', 'montant_commandes')
+    list_filter = ('jour', 'fournisseur')
+    date_hierarchy = 'jour'
+    list_select_related = ('produit', 'fournisseur', 'agent_utilisateur')
+    
+    def has_add_permission(self, request):
+        """Les agrégats sont calculés automatiquement."""
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        """Les agrégats sont calculés automatiquement."""
+        return False
+
+
+@admin.register(CompteurNotification)
+class CompteurNotificationAdmin(admin.ModelAdmin):
+    """
+    Consultation des compteurs de notifications (reconstruits par `reconstruire_compteurs`).
+    """
+    list_display = ('type_notification', 'fournisseur_produit', 'destinataire', 'non_lues', 'non_traitees')
+    list_filter = ('type_notification', 'destinataire')
+    list_select_related = ('fournisseur_produit', 'destinataire')
+    
+    def has_add_permission(self, request):
+        """Les compteurs sont calculés automatiquement."""
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        """Les compteurs sont calculés automatiquement."""
+        return False
+
+
+@admin.register(SuggestionReapprovisionnement)
+class SuggestionReapprovisionnementAdmin(admin.ModelAdmin):
+    """
+    Consultation des suggestions de réapprovisionnement (`planifier_reapprovisionnement`).
+    """
+    list_display = ('produit', 'fournisseur', 'stock_actuel', 'point_commande', 'quantite_suggeree', 'prix_fournisseur', 'delai_livraison', 'date_calcul')
+    list_filter = ('fournisseur',)
+    search_fields = ('produit__nom_prod',)
+    list_select_related = ('produit', 'fournisseur')
+    
+    def has_add_permission(self, request):
+        """Les suggestions sont calculées automatiquement."""
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        """Les suggestions sont calculées automatiquement."""
+        return False
+
+
+@admin.register(PrevisionDemande)
+class PrevisionDemandeAdmin(admin.ModelAdmin):
+    """
+    Consultation des prévisions de demande (`prevoir_demande`).
+    """
+    list_display = ('produit', 'methode', 'demande_journaliere', 'erreur', 'stock_actuel', 'jours_avant_rupture', 'date_calcul')
+    list_filter = ('methode',)
+    search_fields = ('produit__nom_prod',)
+    list_select_related = ('produit',)
+    
+    def has_add_permission(self, request):
+        """Les prévisions sont calculées automatiquement."""
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        """Les prévisions sont calculées automatiquement."""
+        return False
+
+
+@admin.register(AlerteFournisseur)
+class AlerteFournisseurAdmin(admin.ModelAdmin):
+    """
+    Consultation des ruptures signalées aux fournisseurs (`envoyer_digests`).
+    """
+    list_display = ('fournisseur', 'produit', 'quantite_suggeree', 'prix_fournisseur', 'date_creation', 'date_envoi')
+    list_filter = ('fournisseur', ('date_envoi', admin.EmptyFieldListFilter))
+    search_fields = ('produit__nom_prod', 'fournisseur__nom_fournisseur')
+    list_select_related = ('fournisseur', 'produit')
+    
+    def has_add_permission(self, request):
+        """Les alertes sont créées par les ruptures de stock."""
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        """Les alertes sont créées par les ruptures de stock."""
+        return False
+
+
+@admin.register(Archive)
+class ArchiveAdmin(admin.ModelAdmin):
+    """
+    Consultation et restauration des lignes archivées (`python manage.py archiver`).
+    """
+    list_display = ('type_objet', 'id_objet', 'date_reference', 'date_archivage')
+    list_filter = ('type_objet', 'date_archivage')
+    search_fields = ('id_objet',)
+    date_hierarchy = 'date_reference'
+    readonly_fields = ('type_objet', 'id_objet', 'donnees', 'date_reference', 'date_archivage')
+    actions = ['restaurer_archives']
+    
+    def has_add_permission(self, request):
+        """Les archives sont créées par la commande archiver."""
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        """Les archives ne se modifient pas."""
+        return False
+    
+    def restaurer_archives(self, request, queryset):
+        """Action pour réinsérer les lignes sélectionnées dans leur table d'origine."""
+        count = archivage.restaurer(queryset)
+        self.message_user(request, f'✅ {count} ligne(s) restaurée(s) (toujours supprimées logiquement).')
+    restaurer_archives.short_description = '♻️ Restaurer dans les tables principales'
+
+
 # ==================== ACTIONS PERSONNALISEES GLOBALES ====================
 
-def archiver_produits(modeladmin, request, queryset):
-    """Action pour archiver les produits."""
-    count = queryset.update(is_deleted=True)
-    modeladmin.message_user(request, f'✅ {count} produit(s) archivé(s) avec succès.')
-archiver_produits.short_description = '📦 Archiver les produits sélectionnés'
+def archiver_selection(modeladmin, request, queryset):
+    """Action pour archiver (suppression logique) la sélection, en un seul UPDATE."""
+    count = queryset.supprimer_logique()
+    modeladmin.message_user(request, f'✅ {count} élément(s) archivé(s) avec succès ({modeladmin.model._meta.verbose_name_plural}).')
+archiver_selection.short_description = '📦 Archiver la sélection'
 
 
-def restaurer_produits(modeladmin, request, queryset):
-    """Action pour restaurer les produits archivés."""
-    count = queryset.update(is_deleted=False)
-    modeladmin.message_user(request, f'✅ {count} produit(s) restauré(s) avec succès.')
-restaurer_produits.short_description = '♻️ Restaurer les produits sélectionnés'
+def restaurer_selection(modeladmin, request, queryset):
+    """Action pour restaurer les éléments archivés de la sélection, en un seul UPDATE."""
+    count = queryset.restaurer()
+    modeladmin.message_user(request, f'✅ {count} élément(s) restauré(s) avec succès ({modeladmin.model._meta.verbose_name_plural}).')
+restaurer_selection.short_description = '♻️ Restaurer la sélection'
 
 
 def exporter_csv(modeladmin, request, queryset):
@@ -829,19 +1019,19 @@ def marquer_comme_paye(modeladmin, request, queryset):
 marquer_comme_paye.short_description = '💳 Marquer comme payées'
 
 
-def marquer_comme_envoyee(modeladmin, request, queryset):
-    """Action pour marquer les factures comme envoyées."""
-    count = queryset.exclude(statut='payee').update(statut='envoyee')
-    modeladmin.message_user(request, f'✅ {count} facture(s) marquée(s) comme envoyée(s).')
-marquer_comme_envoyee.short_description = '📤 Marquer comme envoyées'
+def marquer_comme_validee(modeladmin, request, queryset):
+    """Action pour valider les factures en brouillon (agrégats statistiques tenus à jour)."""
+    count = queryset.filter(statut='brouillon').changer_statut('validee')
+    modeladmin.message_user(request, f'✅ {count} facture(s) marquée(s) comme validée(s).')
+marquer_comme_validee.short_description = '📤 Marquer comme validées'
 
 
 # ==================== ENREGISTREMENT DES ACTIONS ====================
 
 # Ajouter les actions personnalisées aux ModelAdmin
-ProduitAdmin.actions = [archiver_produits, restaurer_produits, exporter_csv, exporter_json]  # exporter_excel commenté
-CommandeAdmin.actions = [exporter_csv, exporter_json]  # exporter_excel commenté
-FactureAdmin.actions = [marquer_comme_paye, marquer_comme_envoyee, exporter_csv, exporter_json]  # exporter_excel commenté
+ProduitAdmin.actions = [archiver_selection, restaurer_selection, exporter_csv, exporter_json]  # exporter_excel commenté
+CommandeAdmin.actions = [archiver_selection, restaurer_selection, exporter_csv, exporter_json]  # exporter_excel commenté
+FactureAdmin.actions = [marquer_comme_paye, marquer_comme_validee, archiver_selection, restaurer_selection, exporter_csv, exporter_json]  # exporter_excel commenté
 
 
 # ==================== GESTION DES UTILISATEURS ====================
@@ -963,16 +1153,38 @@ class MontantAgentAdmin(admin.ModelAdmin):
     search_fields = ('agent_utilisateur__username', 'agent_utilisateur__first_name')
     readonly_fields = ('agent_utilisateur', 'date_mise_a_jour')
     list_filter = ('date_mise_a_jour',)
+    actions = ['compacter_montants']
+    
+    def get_queryset(self, request):
+        """Montant courant calculé en base : instantané + mouvements non compactés."""
+        queryset = super().get_queryset(request)
+        mouvements = (
+            MouvementMontantAgent.objects
+            .filter(agent_utilisateur=OuterRef('agent_utilisateur'))
+            .values('agent_utilisateur')
+            .annotate(total=Sum('montant'))
+            .values('total')
+        )
+        return queryset.select_related('agent_utilisateur').annotate(
+            montant_courant=F('montant_total') + Coalesce(Subquery(mouvements), Value(0.0), output_field=FloatField())
+        )
     
     def montant_total_formatted(self, obj):
         """Affiche le montant avec formatage."""
-        if obj.montant_total >= 1000:
-            return format_html(f'<strong style="color: #dc2626;">{obj.montant_total:.2f}€</strong>')
-        elif obj.montant_total >= 500:
-            return format_html(f'<strong style="color: #f59e0b;">{obj.montant_total:.2f}€</strong>')
+        montant = max(0.0, obj.montant_courant)
+        if montant >= 1000:
+            return format_html(f'<strong style="color: #dc2626;">{montant:.2f}€</strong>')
+        elif montant >= 500:
+            return format_html(f'<strong style="color: #f59e0b;">{montant:.2f}€</strong>')
         else:
-            return format_html(f'<strong style="color: #10b981;">{obj.montant_total:.2f}€</strong>')
+            return format_html(f'<strong style="color: #10b981;">{montant:.2f}€</strong>')
     montant_total_formatted.short_description = '💰 Montant Total'
+    
+    def compacter_montants(self, request, queryset):
+        """Action pour replier les mouvements des agents sélectionnés."""
+        count = sum(MontantAgent.compacter(agent_id) for agent_id in queryset.values_list('agent_utilisateur_id', flat=True))
+        self.message_user(request, f'✅ {count} mouvement(s) compacté(s).')
+    compacter_montants.short_description = '🗜️ Compacter les montants'
 
 
 # ==================== CRÉATION DES GROUPES PAR DÉFAUT ====================
@@ -0,0 +1,118 @@
+"""
+Alertes de stock (rupture / stock bas) au franchissement d'un seuil.
+
+Le niveau d'un produit dépend de son stock et de son seuil
+(Produit.seuil_alerte) :
+- 'rupture' à 0 ;
+- 'alerte_basse' sous le seuil ;
+- aucun au-dessus.
+
+Une alerte n'est évaluée que lorsqu'une variation du stock fait passer le
+produit à un niveau plus grave : une commande qui laisse le stock du même
+côté du seuil, ou la modification d'une commande, ne coûte aucune requête.
+
+Les alertes sont regroupées par produit et par niveau sur une fenêtre de
+`STOCK_FENETRE_ALERTES` secondes (réglage Django, une heure par défaut) :
+le premier franchissement réserve une clé dans le cache, les suivants sont
+ignorés jusqu'à son expiration. La clé n'est posée qu'au commit de la
+transaction de la commande : une commande annulée (rollback) ne prive pas le
+franchissement suivant de son alerte. Deux franchissements concurrents du
+même niveau sont exclus par le verrou de ligne du stock (stock.reservations).
+Au premier franchissement, une alerte du même type encore non traitée en
+base évite aussi le doublon (cache vidé, ou cache local à chaque processus).
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Notification
+
+NIVEAUX = [None, 'alerte_basse', 'rupture']
+
+
+def fenetre():
+    """Durée de regroupement des alertes d'un produit (secondes)."""
+    return getattr(settings, 'STOCK_FENETRE_ALERTES', 3600)
+
+
+def niveau(quantite, seuil):
+    """Niveau d'alerte d'un stock : 'rupture', 'alerte_basse' ou None."""
+    if quantite <= 0:
+        return 'rupture'
+    if quantite < seuil:
+        return 'alerte_basse'
+    return None
+
+
+def franchissements(variations):
+    """
+    Produits qui viennent de passer à un niveau plus grave.
+
+    `variations` : {produit: quantité avant la variation}, le produit portant
+    son stock après la variation. Retourne [(produit, niveau)].
+    """
+    resultats = []
+    for produit, avant in variations.items():
+        apres = niveau(produit.quantite, produit.seuil_alerte)
+        if NIVEAUX.index(apres) > NIVEAUX.index(niveau(avant, produit.seuil_alerte)):
+            resultats.append((produit, apres))
+    return resultats
+
+
+def cle(produit_id, type_notification):
+    """Clé de cache de la fenêtre de regroupement."""
+    return f'stock:alerte:{produit_id}:{type_notification}'
+
+
+def a_emettre(candidats):
+    """
+    Filtre les franchissements déjà alertés (fenêtre en cache, puis alerte
+    non traitée en base) et réserve la fenêtre des autres au commit.
+    Retourne [(produit, niveau)].
+    """
+    nouveaux = [
+        (produit, type_notification)
+        for produit, type_notification in candidats
+        if cle(produit.pk, type_notification) not in cache
+    ]
+    if not nouveaux:
+        return []
+
+    def reserver():
+        for produit, type_notification in nouveaux:
+            cache.add(cle(produit.pk, type_notification), True, fenetre())
+
+    transaction.on_commit(reserver)
+
+    ouvertes = set(
+        Notification.objects.filter(
+            produit__in=[produit for produit, _ in nouveaux],
+            type_notification__in=NIVEAUX[1:],
+            est_traitee=False,
+        ).values_list('produit_id', 'type_notification')
+    )
+    return [(produit, type_notification) for produit, type_notification in nouveaux if (produit.pk, type_notification) not in ouvertes]
+
+
+def notification(produit, type_notification, date_commande=None):
+    """Notification (non enregistrée) d'une alerte de stock."""
+    if type_notification == 'rupture':
+        message = f'Le produit "{produit.nom_prod}" est en rupture de stock!\n\nDétails:\n- Prix unitaire: {produit.prix_unit}€'
+        if date_commande is not None:
+            message += f'\n- Dernière commande: {date_commande}'
+        return Notification(
+            type_notification='rupture',
+            produit=produit,
+            titre=f'⚠️ RUPTURE DE STOCK: {produit.nom_prod}',
+            message=message,
+            fournisseur=None,
+        )
+    return Notification(
+        type_notification='alerte_basse',
+        produit=produit,
+        titre=f'📉 STOCK BAS: {produit.nom_prod} ({produit.quantite} unités)',
+        message=f'Le produit "{produit.nom_prod}" a un stock bas.\n\nDétails:\n- Quantité restante: {produit.quantite} unités\n- Seuil d\'alerte: {produit.seuil_alerte} unités\n- Prix unitaire: {produit.prix_unit}€',
+        fournisseur=None,
+    )
+
@@ -8,4 +8,5 @@ class StockConfig(AppConfig):
         """
         Enregistre les signaux Django quand l'application est prête.
         """
+        import stock.instrumentation  # noqa
         import stock.signals  # noqa
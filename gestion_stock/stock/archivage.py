@@ -0,0 +1,185 @@
+"""
+Archivage froid des lignes mortes (modèle Archive).
+
+Les tables principales ne gardent que les lignes utiles. `archiver()`
+déplace vers Archive, par lots (INSERT dans Archive puis DELETE dans une
+même transaction) :
+- les entrées d'Historique plus anciennes que la rétention ;
+- les factures, commandes et produits supprimés logiquement dont la date de
+  référence est plus ancienne que la rétention, si plus rien ne les
+  référence : une commande qui a encore une facture, ou un produit qui a
+  encore des commandes, des liaisons fournisseur ou des notifications, reste
+  en place jusqu'à un prochain passage.
+
+Les lignes supprimées logiquement ne contribuent plus aux statistiques : les
+déplacer ne change pas les agrégats.
+
+Lecture unifiée :
+- `trouver(type_objet, id_objet)` cherche la ligne dans sa table, puis dans
+  les archives (instance non enregistrée, marquée `est_archive`) ;
+- `rechercher(type_objet, **champs)` filtre les archives sur leurs champs
+  (par ex. rechercher('produit', nom_prod__icontains='vis')) ;
+- `restaurer(archives)` réinsère les lignes dans leur table, telles
+  qu'archivées (donc toujours supprimées logiquement). Le journal du stock
+  d'un produit archivé est supprimé avec lui ; sa restauration le rouvre
+  par un mouvement initial.
+"""
+
+import datetime
+
+from django.core import serializers
+from django.db import transaction
+
+from .models import Produit, Commande, Facture, Historique, Archive
+from . import mouvements
+
+# Type d'objet -> (modèle, champ date utilisé pour la rétention).
+# L'ordre est celui de l'archivage : une facture avant sa commande, une
+# commande avant son produit.
+TYPES = {
+    'historique': (Historique, 'date_suppression'),
+    'facture': (Facture, 'date_modification'),
+    'commande': (Commande, 'date_commande'),
+    'produit': (Produit, 'date_creation'),
+}
+
+
+def _valeur_json(valeur):
+    """Dates en ISO 8601 complet (DjangoJSONEncoder tronque les microsecondes)."""
+    if isinstance(valeur, (datetime.date, datetime.time)):
+        return valeur.isoformat()
+    return valeur
+
+
+def candidats(type_objet, avant):
+    """Lignes archivables d'un type, dont la date de référence précède `avant`."""
+    modele, champ_date = TYPES[type_objet]
+    if modele is Historique:
+        queryset = Historique.objects.all()
+    else:
+        queryset = modele.archives.all()
+    queryset = queryset.filter(**{f'{champ_date}__lt': avant})
+
+    if modele is Commande:
+        queryset = queryset.filter(facture__isnull=True)
+    elif modele is Produit:
+        queryset = queryset.filter(commandes__isnull=True, fournisseurs__isnull=True, notifications__isnull=True)
+    return queryset
+
+
+def archiver_lot(type_objet, avant, taille_lot=5000):
+    """
+    Déplace au plus `taille_lot` lignes archivables vers Archive.
+
+    Une transaction par lot ; retourne le nombre de lignes déplacées.
+    """
+    modele, champ_date = TYPES[type_objet]
+    champs = [champ.name for champ in modele._meta.concrete_fields if not champ.primary_key]
+
+    with transaction.atomic():
+        lignes = list(candidats(type_objet, avant).order_by('pk').values('pk', *champs)[:taille_lot])
+        if not lignes:
+            return 0
+        archives = [
+            Archive(
+                type_objet=type_objet,
+                id_objet=ligne.pop('pk'),
+                date_reference=ligne[champ_date],
+                donnees={champ: _valeur_json(valeur) for champ, valeur in ligne.items()},
+            )
+            for ligne in lignes
+        ]
+        Archive.objects.bulk_create(archives)
+        modele._base_manager.filter(pk__in=[archive.id_objet for archive in archives]).delete()
+    return len(archives)
+
+
+def archiver(avant, types=None, taille_lot=5000):
+    """
+    Archive toutes les lignes archivables antérieures à `avant`.
+
+    Retourne {type_objet: nombre de lignes archivées}.
+    """
+    resultats = {}
+    for type_objet in TYPES:
+        if types and type_objet not in types:
+            continue
+        total = 0
+        while True:
+            deplaces = archiver_lot(type_objet, avant, taille_lot)
+            total += deplaces
+            if deplaces < taille_lot:
+                break
+        resultats[type_objet] = total
+    return resultats
+
+
+# ---------- Lecture ----------
+
+def deserialiser(archive):
+    """Instance (non enregistrée) du modèle d'origine d'une archive."""
+    modele, _ = TYPES[archive.type_objet]
+    objet = next(serializers.deserialize('python', [{
+        'model': modele._meta.label_lower,
+        'pk': archive.id_objet,
+        'fields': archive.donnees,
+    }]))
+    return objet.object
+
+
+def trouver(type_objet, id_objet):
+    """
+    Ligne `id_objet` de type `type_objet`, qu'elle soit dans sa table
+    (même supprimée logiquement) ou archivée ; None si elle n'existe pas.
+    """
+    modele, _ = TYPES[type_objet]
+    objet = modele._base_manager.filter(pk=id_objet).first()
+    if objet is not None:
+        objet.est_archive = False
+        return objet
+
+    archive = Archive.objects.filter(type_objet=type_objet, id_objet=id_objet).first()
+    if archive is None:
+        return None
+    objet = deserialiser(archive)
+    objet.est_archive = True
+    return objet
+
+
+def rechercher(type_objet=None, depuis=None, jusqua=None, **champs):
+    """
+    Archives filtrées par type, par date de référence et par champs
+    archivés (lookups Django sur le JSON : nom_prod__icontains='vis').
+    """
+    queryset = Archive.objects.all()
+    if type_objet:
+        queryset = queryset.filter(type_objet=type_objet)
+    if depuis:
+        queryset = queryset.filter(date_reference__gte=depuis)
+    if jusqua:
+        queryset = queryset.filter(date_reference__lt=jusqua)
+    if champs:
+        queryset = queryset.filter(**{f'donnees__{champ}': valeur for champ, valeur in champs.items()})
+    return queryset
+
+
+def restaurer(archives):
+    """
+    Réinsère des archives dans leurs tables puis les supprime d'Archive.
+
+    Les produits sont restaurés avant les commandes et les commandes avant
+    les factures (clés étrangères). Retourne le nombre de lignes restaurées.
+    """
+    ordre = list(reversed(TYPES))
+    archives = sorted(archives, key=lambda archive: ordre.index(archive.type_objet))
+    with transaction.atomic():
+        for archive in archives:
+            objet = deserialiser(archive)
+            # Enregistrement brut (raw), comme loaddata : les dates auto_now
+            # sont conservées et les signaux ignorent les lignes supprimées.
+            objet.save_base(raw=True, force_insert=True)
+            if archive.type_objet == 'produit':
+                # Le journal du produit a été supprimé avec lui
+                mouvements.enregistrer({objet.pk: objet.quantite}, 'initial')
+        Archive.objects.filter(pk__in=[archive.pk for archive in archives]).delete()
+    return len(archives)
@@ -0,0 +1,51 @@
+"""
+Outils communs aux commandes de benchmark (python manage.py bench_*).
+
+Les benchmarks tournent sur une base de test jetable, créée puis détruite
+comme pour `manage.py test`, afin de ne jamais toucher aux données réelles.
+"""
+
+import contextlib
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+
+@contextlib.contextmanager
+def base_de_test(verbosity=0):
+    """
+    Crée une base de test jetable le temps du benchmark.
+
+    Avec SQLite, la base est un fichier temporaire (et non la base mémoire
+    par défaut) pour que plusieurs threads puissent écrire en parallèle.
+    """
+    db = settings.DATABASES['default']
+    if db['ENGINE'].endswith('sqlite3'):
+        dossier = tempfile.mkdtemp(prefix='bench_stock_')
+        db.setdefault('TEST', {})['NAME'] = os.path.join(dossier, 'bench.sqlite3')
+        options = db.setdefault('OPTIONS', {})
+        options.setdefault('timeout', 60)
+        options.setdefault('transaction_mode', 'IMMEDIATE')
+
+    setup_test_environment()
+    runner = DiscoverRunner(verbosity=verbosity, interactive=False)
+    anciennes_bases = runner.setup_databases()
+    try:
+        yield
+    finally:
+        runner.teardown_databases(anciennes_bases)
+        teardown_test_environment()
+
+
+@contextlib.contextmanager
+def chronometre(resultats, cle):
+    """Mesure la durée du bloc (en secondes) dans resultats[cle]."""
+    debut = time.perf_counter()
+    try:
+        yield
+    finally:
+        resultats[cle] = time.perf_counter() - debut
@@ -0,0 +1,279 @@
+"""
+Compteurs de notifications non lues / non traitées (CompteurNotification).
+
+Chaque notification non lue ou non traitée contribue à une ligne
+type × fournisseur du produit × fournisseur destinataire. Comme pour
+stock.statistiques, les contributions sont appliquées par incréments F() :
+- à chaque save() d'une notification (signaux de stock.signals) ;
+- explicitement pour les notifications insérées par bulk_create (pipeline
+  des commandes, digests fournisseurs) ;
+- avant l'UPDATE / DELETE des opérations en lot du QuerySet
+  (marquer_lues(), marquer_traitees(), purger(), delete()) et de
+  Notification.delete(), d'après l'état des lignes en base.
+
+Le fournisseur du produit fait partie de la clé : un save() du produit qui
+change de fournisseur déplace les contributions de ses notifications
+(`reindexer_produit`, signaux de stock.signals). Un changement de
+fournisseur par Produit.objects.update(), comme les autres modifications
+faites par queryset.update(), n'est pas suivi :
+`python manage.py reconstruire_compteurs` recalcule tout depuis les
+notifications.
+
+Les lectures (`totaux`) sont servies par le cache Django, avec repli sur la
+somme des lignes de compteurs (jamais un COUNT sur les notifications). Les
+écritures invalident les clés des portées concernées, immédiatement et au
+commit de la transaction. Le cache étant par défaut propre à chaque
+processus, une autre instance peut servir un total périmé au plus
+`STOCK_DUREE_CACHE_COMPTEURS` secondes.
+"""
+
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import Fournisseur, Notification, CompteurNotification
+
+CHAMPS = ['non_lues', 'non_traitees']
+TYPES = [type_notification for type_notification, _ in Notification.TYPE_CHOICES]
+PORTEES = ['fournisseur_produit', 'destinataire']
+
+
+# ---------- Contributions ----------
+
+def contribution(notification):
+    """Retourne (clé, compteurs) d'une notification, ou None si elle est lue et traitée."""
+    if notification.est_lue and notification.est_traitee:
+        return None
+    cle = (
+        notification.type_notification,
+        notification.produit.fournisseur_id,
+        notification.fournisseur_id,
+    )
+    return cle, {
+        'non_lues': int(not notification.est_lue),
+        'non_traitees': int(not notification.est_traitee),
+    }
+
+
+# ---------- Écriture ----------
+
+def ajouter(deltas, contribution, signe=1):
+    """Ajoute (ou retire si signe=-1) une contribution à un dictionnaire de deltas."""
+    if contribution is None:
+        return
+    cle, compteurs = contribution
+    for champ, valeur in compteurs.items():
+        deltas[cle][champ] += signe * valeur
+
+
+def appliquer(deltas):
+    """
+    Applique les deltas {clé: Counter} aux compteurs et invalide le cache
+    des portées concernées.
+
+    Un UPDATE F() par clé ; la ligne est créée si elle n'existe pas encore.
+    """
+    cles_cache = set()
+    with transaction.atomic():
+        for (type_notification, fournisseur_produit_id, destinataire_id), compteurs in deltas.items():
+            compteurs = {champ: valeur for champ, valeur in compteurs.items() if valeur}
+            if not compteurs:
+                continue
+            cle = {
+                'type_notification': type_notification,
+                'fournisseur_produit_id': fournisseur_produit_id,
+                'destinataire_id': destinataire_id,
+            }
+            lignes_modifiees = CompteurNotification.objects.filter(**cle).update(
+                **{champ: F(champ) + valeur for champ, valeur in compteurs.items()}
+            )
+            if not lignes_modifiees:
+                CompteurNotification.objects.create(**cle, **compteurs)
+            cles_cache.update(cles_touchees(fournisseur_produit_id, destinataire_id))
+
+    if cles_cache:
+        cache.delete_many(cles_cache)
+        transaction.on_commit(lambda: cache.delete_many(cles_cache))
+
+
+def enregistrer(notifications):
+    """Ajoute aux compteurs des notifications nouvellement insérées (bulk_create)."""
+    deltas = defaultdict(Counter)
+    for notification in notifications:
+        ajouter(deltas, contribution(notification))
+    appliquer(deltas)
+
+
+def remplacer(avant, apres):
+    """Remplace une contribution par une autre (modification d'une notification)."""
+    if avant == apres:
+        return
+    deltas = defaultdict(Counter)
+    ajouter(deltas, avant, signe=-1)
+    ajouter(deltas, apres)
+    appliquer(deltas)
+
+
+def _deltas_groupes(deltas, notifications, signe=1, champs=CHAMPS):
+    """
+    Ajoute à `deltas` les contributions (limitées à `champs`) d'un queryset
+    de notifications, calculées par une requête groupée.
+    """
+    lignes = (
+        notifications
+        .values('type_notification', 'produit__fournisseur_id', 'fournisseur_id')
+        .annotate(
+            non_lues=Count('pk', filter=Q(est_lue=False)),
+            non_traitees=Count('pk', filter=Q(est_traitee=False)),
+        )
+        .order_by()
+    )
+    for ligne in lignes:
+        cle = (ligne['type_notification'], ligne['produit__fournisseur_id'], ligne['fournisseur_id'])
+        for champ in champs:
+            deltas[cle][champ] += signe * ligne[champ]
+    return deltas
+
+
+def ajuster(notifications, signe=-1, champs=CHAMPS):
+    """
+    Retire (signe=-1) ou ajoute des compteurs les contributions d'un queryset
+    de notifications.
+
+    Utilisé par les opérations en lot du QuerySet, juste avant l'UPDATE ou le
+    DELETE : marquer_lues() ne retire que 'non_lues', marquer_traitees() que
+    'non_traitees'.
+    """
+    appliquer(_deltas_groupes(defaultdict(Counter), notifications, signe=signe, champs=champs))
+
+
+def contributions_produit(produit_id, signe=1, deltas=None):
+    """
+    Contributions des notifications non lues ou non traitées d'un produit,
+    telles qu'elles sont en base (requête groupée), ajoutées à `deltas`.
+    """
+    if deltas is None:
+        deltas = defaultdict(Counter)
+    notifications = Notification.objects.filter(Q(est_lue=False) | Q(est_traitee=False), produit_id=produit_id)
+    return _deltas_groupes(deltas, notifications, signe=signe)
+
+
+def reindexer_produit(avant, produit_id):
+    """
+    Remplace les contributions d'un produit mémorisées avant son save()
+    (`contributions_produit(..., signe=-1)`) par celles calculées après.
+    """
+    appliquer(contributions_produit(produit_id, deltas=avant))
+
+
+def reconstruire():
+    """
+    Recalcule tous les compteurs depuis les notifications.
+
+    Retourne le nombre de lignes de compteurs créées.
+    """
+    deltas = _deltas_groupes(
+        defaultdict(Counter),
+        Notification.objects.filter(Q(est_lue=False) | Q(est_traitee=False)),
+    )
+
+    with transaction.atomic():
+        CompteurNotification.objects.all().delete()
+        lignes = CompteurNotification.objects.bulk_create([
+            CompteurNotification(
+                type_notification=type_notification,
+                fournisseur_produit_id=fournisseur_produit_id,
+                destinataire_id=destinataire_id,
+                **compteurs,
+            )
+            for (type_notification, fournisseur_produit_id, destinataire_id), compteurs in deltas.items()
+        ], batch_size=1000)
+    fournisseurs = Fournisseur.objects.values_list('pk', flat=True)
+    cache.delete_many([cle_cache(), *[cle_cache(**{portee: pk}) for pk in fournisseurs for portee in PORTEES]])
+    return len(lignes)
+
+
+# ---------- Lecture ----------
+
+def duree_cache():
+    """Durée de conservation des totaux en cache (secondes)."""
+    return getattr(settings, 'STOCK_DUREE_CACHE_COMPTEURS', 300)
+
+
+def cle_cache(**portee):
+    """
+    Clé de cache des totaux d'une portée : tous les fournisseurs, ou
+    fournisseur_produit=<code> ou destinataire=<code>.
+    """
+    if not portee:
+        return 'stock:compteurs:tous'
+    (champ, code), = portee.items()
+    return f'stock:compteurs:{champ}:{code}'
+
+
+def cles_touchees(fournisseur_produit_id, destinataire_id):
+    """Clés de cache des portées qui incluent une ligne de compteurs."""
+    return {cle_cache(), cle_cache(fournisseur_produit=fournisseur_produit_id), cle_cache(destinataire=destinataire_id)}
+
+
+def totaux(**portee):
+    """
+    Totaux d'une portée (voir `cle_cache`), depuis le cache ou, à défaut, depuis
+    la somme des lignes de compteurs.
+
+    Retourne {'non_lues', 'non_traitees', 'par_type': {type: {'non_lues', 'non_traitees'}}}.
+    """
+    resultat = cache.get(cle_cache(**portee))
+    if resultat is None:
+        resultat = _resultat(list(_lignes(portee)))
+        cache.set(cle_cache(**portee), resultat, duree_cache())
+    return resultat
+
+
+async def atotaux(**portee):
+    """Variante asynchrone de `totaux` (cache et ORM asynchrones)."""
+    resultat = await cache.aget(cle_cache(**portee))
+    if resultat is None:
+        resultat = _resultat([ligne async for ligne in _lignes(portee)])
+        await cache.aset(cle_cache(**portee), resultat, duree_cache())
+    return resultat
+
+
+def _lignes(portee):
+    """Sommes des compteurs d'une portée, par type (QuerySet de dictionnaires)."""
+    if len(portee) > 1 or set(portee) - set(PORTEES):
+        raise ValueError(f'Portée invalide : {portee}')
+    filtres = {f'{champ}_id': code for champ, code in portee.items()}
+    return (
+        CompteurNotification.objects.filter(**filtres)
+        .values('type_notification')
+        .annotate(**{champ: Sum(champ) for champ in CHAMPS})
+        .order_by()
+    )
+
+
+def _resultat(lignes):
+    par_type = {type_notification: dict.fromkeys(CHAMPS, 0) for type_notification in TYPES}
+    for ligne in lignes:
+        par_type[ligne['type_notification']] = {champ: ligne[champ] for champ in CHAMPS}
+    resultat = {champ: sum(compteurs[champ] for compteurs in par_type.values()) for champ in CHAMPS}
+    resultat['par_type'] = par_type
+    return resultat
+
+
+def totaux_utilisateur(user):
+    """
+    Totaux visibles par un utilisateur : tous pour un administrateur, ceux
+    dont il est le destinataire pour un fournisseur, None sinon.
+    """
+    if user.is_staff:
+        return totaux()
+    if 'Fournisseur' in user.groups.values_list('name', flat=True):
+        try:
+            return totaux(destinataire=user.fournisseur.pk)
+        except Fournisseur.DoesNotExist:
+            return None
+    return None
@@ -0,0 +1,146 @@
+"""
+Digest des alertes fournisseurs.
+
+Une rupture ne contacte plus chaque fournisseur immédiatement (un email et
+une notification par liaison ProduitFournisseur) : `signaler_ruptures`
+ajoute, en une requête de lecture et un bulk_create, une AlerteFournisseur
+en attente par fournisseur du produit.
+
+`envoyer_digests` (commande `envoyer_digests`, à lancer périodiquement)
+regroupe ensuite les alertes en attente par fournisseur :
+- un seul email par fournisseur, rendu une fois avec tous ses produits et
+  mis dans la file d'envoi (EmailSortant, envoyé par `envoyer_emails` sur
+  une seule connexion SMTP) ;
+- une seule notification 'fournisseur_contact' par fournisseur ;
+- au plus un digest par fournisseur et par `intervalle` : les alertes
+  arrivées entre-temps attendent le digest suivant.
+
+Les alertes des produits réapprovisionnés (ou supprimés) avant l'envoi sont
+abandonnées : le digest ne liste que les produits encore en rupture.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import Fournisseur, ProduitFournisseur, Notification, EmailSortant, AlerteFournisseur
+from . import compteurs, metriques
+
+
+def signaler_ruptures(produits):
+    """
+    Met en attente une alerte par fournisseur de chaque produit en rupture.
+
+    Retourne le nombre de liaisons concernées (les alertes déjà en attente
+    ne sont pas dupliquées).
+    """
+    liaisons = ProduitFournisseur.objects.filter(produit__in=produits).values_list(
+        'produit_id', 'fournisseur_id', 'quantite_min', 'prix_fournisseur', 'delai_livraison'
+    )
+    alertes = [
+        AlerteFournisseur(
+            produit_id=produit_id,
+            fournisseur_id=fournisseur_id,
+            quantite_suggeree=quantite_min,
+            prix_fournisseur=prix_fournisseur,
+            delai_livraison=delai_livraison,
+        )
+        for produit_id, fournisseur_id, quantite_min, prix_fournisseur, delai_livraison in liaisons
+    ]
+    AlerteFournisseur.objects.bulk_create(alertes, ignore_conflicts=True)
+    return len(alertes)
+
+
+def fournisseurs_a_contacter(intervalle):
+    """Fournisseurs ayant des alertes en attente et aucun digest depuis `intervalle`."""
+    recents = AlerteFournisseur.objects.filter(
+        fournisseur=OuterRef('pk'),
+        date_envoi__gte=timezone.now() - intervalle,
+    )
+    en_attente = AlerteFournisseur.objects.filter(fournisseur=OuterRef('pk'), date_envoi__isnull=True)
+    return Fournisseur.objects.filter(Exists(en_attente)).exclude(Exists(recents))
+
+
+def rediger(fournisseur, alertes):
+    """Sujet et corps du digest d'un fournisseur (alertes triées par produit)."""
+    sujet = f"⚠️ URGENCE: {len(alertes)} produit(s) en rupture de stock"
+    lignes = [
+        f"📦 {alerte.produit.nom_prod}\n"
+        f"   - Quantité suggérée: {alerte.quantite_suggeree} unités\n"
+        f"   - Prix fournisseur: {alerte.prix_fournisseur}€/unité\n"
+        f"   - Montant: {alerte.quantite_suggeree * alerte.prix_fournisseur}€\n"
+        f"   - Délai de livraison: {alerte.delai_livraison} jours"
+        for alerte in alertes
+    ]
+    total = sum(alerte.quantite_suggeree * alerte.prix_fournisseur for alerte in alertes)
+    separateur = '\n\n'
+    message = f"""
+Bonjour {fournisseur.nom_fournisseur},
+
+⚠️  ALERTE RUPTURE DE STOCK ⚠️
+
+Les produits suivants sont en rupture de stock:
+
+{separateur.join(lignes)}
+
+💰 Montant total suggéré: {total}€
+
+⏰ Merci de confirmer les commandes au plus tôt!
+
+Cordialement,
+Système de Gestion de Stock
+"""
+    return sujet, message
+
+
+def envoyer_digests(intervalle=timedelta(hours=1)):
+    """
+    Met en file un digest par fournisseur à contacter.
+
+    Les alertes sont d'abord réservées par un UPDATE conditionnel
+    (date_envoi), ce qui empêche deux exécutions simultanées de les envoyer
+    deux fois. Retourne le nombre de digests mis en file.
+    """
+    maintenant = timezone.now()
+    with transaction.atomic():
+        AlerteFournisseur.objects.filter(
+            Q(produit__quantite__gt=0) | Q(produit__is_deleted=True),
+            date_envoi__isnull=True,
+        ).delete()
+
+        fournisseurs = fournisseurs_a_contacter(intervalle)
+        AlerteFournisseur.objects.filter(
+            fournisseur__in=fournisseurs,
+            date_envoi__isnull=True,
+        ).update(date_envoi=maintenant)
+
+        par_fournisseur = defaultdict(list)
+        for alerte in (
+            AlerteFournisseur.objects
+            .filter(date_envoi=maintenant)
+            .select_related('fournisseur', 'produit')
+            .order_by('fournisseur', 'produit__nom_prod')
+        ):
+            par_fournisseur[alerte.fournisseur].append(alerte)
+
+        emails, notifications = [], []
+        for fournisseur, alertes in par_fournisseur.items():
+            sujet, message = rediger(fournisseur, alertes)
+            emails.append(EmailSortant(destinataire=fournisseur.email, sujet=sujet, message=message))
+            notifications.append(Notification(
+                type_notification='fournisseur_contact',
+                produit=alertes[0].produit,
+                fournisseur=fournisseur,
+                titre=f'📧 Fournisseur contacté: {fournisseur.nom_fournisseur} ({len(alertes)} produit(s))',
+                message=f'Email envoyé à {fournisseur.email} pour {len(alertes)} produit(s) en rupture:\n'
+                        + '\n'.join(f'- {alerte.produit.nom_prod}: {alerte.quantite_suggeree} unités' for alerte in alertes),
+                est_lue=False,
+            ))
+        EmailSortant.objects.bulk_create(emails)
+        Notification.objects.bulk_create(notifications)
+        compteurs.enregistrer(notifications)
+        metriques.NOTIFICATIONS.inc(len(notifications), type='fournisseur_contact')
+    return len(emails)
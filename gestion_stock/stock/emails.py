@@ -0,0 +1,135 @@
+"""
+File d'envoi des emails (outbox transactionnelle).
+
+Les emails ne sont jamais envoyés pendant le traitement d'une commande :
+`mettre_en_file` écrit une ligne EmailSortant dans la transaction courante,
+et `traiter_file` (appelée par `python manage.py envoyer_emails`) les envoie
+ensuite avec un pool de threads et une seule connexion SMTP réutilisée.
+Un envoi en échec est retenté avec un délai exponentiel.
+"""
+
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection as connexion_db
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import EmailSortant
+from . import metriques
+
+# Durée pendant laquelle un lot réservé n'est pas repris par un autre worker
+DUREE_RESERVATION = timedelta(minutes=10)
+
+
+def mettre_en_file(destinataire, sujet, message):
+    """Ajoute un email à la file d'envoi (dans la transaction courante)."""
+    return EmailSortant.objects.create(
+        destinataire=destinataire,
+        sujet=sujet,
+        message=message,
+    )
+
+
+def reserver_lot(taille):
+    """
+    Réserve jusqu'à `taille` emails prêts à partir et les retourne.
+
+    Les emails restés 'en_cours' au-delà de DUREE_RESERVATION (worker
+    arrêté en plein envoi) redeviennent disponibles.
+    """
+    maintenant = timezone.now()
+    ids = list(
+        EmailSortant.objects.filter(
+            Q(statut='en_attente') | Q(statut='en_cours'),
+            prochaine_tentative__lte=maintenant,
+        ).order_by('prochaine_tentative').values_list('code_email', flat=True)[:taille]
+    )
+    if not ids:
+        return []
+
+    # Réservation conditionnelle : un autre worker ne peut pas prendre les mêmes lignes
+    jeton = uuid.uuid4().hex
+    EmailSortant.objects.filter(
+        Q(statut='en_attente') | Q(statut='en_cours'),
+        code_email__in=ids,
+        prochaine_tentative__lte=maintenant,
+    ).update(statut='en_cours', jeton=jeton, prochaine_tentative=maintenant + DUREE_RESERVATION)
+
+    return list(EmailSortant.objects.filter(jeton=jeton, statut='en_cours'))
+
+
+def traiter_file(taille_lot=100, workers=4, max_tentatives=5, delai_base=60):
+    """
+    Envoie un lot d'emails de la file.
+
+    Retourne un dictionnaire {'envoyes': n, 'reessais': n, 'echecs': n}.
+    """
+    emails = reserver_lot(taille_lot)
+    bilan = {'envoyes': 0, 'reessais': 0, 'echecs': 0}
+    if not emails:
+        return bilan
+
+    # Une seule connexion SMTP pour tout le lot (le backend SMTP sérialise les envois)
+    connexion_smtp = get_connection(fail_silently=False)
+    try:
+        connexion_smtp.open()
+    except Exception as e:
+        # Serveur injoignable : tout le lot réservé est replanifié, sans attendre
+        # la fin de DUREE_RESERVATION
+        for email in emails:
+            bilan[_enregistrer_echec(email, e, max_tentatives, delai_base)] += 1
+        return bilan
+
+    def envoyer(email):
+        try:
+            with metriques.EMAILS.chronometre(resultat='echec') as etiquettes:
+                EmailMessage(
+                    email.sujet,
+                    email.message,
+                    settings.DEFAULT_FROM_EMAIL,
+                    [email.destinataire],
+                    connection=connexion_smtp,
+                ).send()
+                etiquettes['resultat'] = 'envoye'
+        except Exception as e:
+            return _enregistrer_echec(email, e, max_tentatives, delai_base)
+        else:
+            EmailSortant.objects.filter(code_email=email.code_email).update(
+                statut='envoye',
+                tentatives=F('tentatives') + 1,
+                date_envoi=timezone.now(),
+                derniere_erreur=None,
+            )
+            return 'envoyes'
+        finally:
+            connexion_db.close()
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for resultat in pool.map(envoyer, emails):
+                bilan[resultat] += 1
+    finally:
+        connexion_smtp.close()
+
+    return bilan
+
+
+def _enregistrer_echec(email, erreur, max_tentatives, delai_base):
+    """Planifie un nouvel essai (délai exponentiel) ou abandonne l'email."""
+    tentatives = email.tentatives + 1
+    if tentatives >= max_tentatives:
+        statut, resultat = 'echec', 'echecs'
+    else:
+        statut, resultat = 'en_attente', 'reessais'
+
+    EmailSortant.objects.filter(code_email=email.code_email).update(
+        statut=statut,
+        tentatives=tentatives,
+        prochaine_tentative=timezone.now() + timedelta(seconds=delai_base * 2 ** (tentatives - 1)),
+        derniere_erreur=str(erreur),
+    )
+    return resultat
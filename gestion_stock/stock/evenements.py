@@ -0,0 +1,205 @@
+"""
+Flux d'événements en direct (server-sent events) des tableaux de bord.
+
+Un hub en mémoire relie les producteurs (code synchrone, n'importe quel
+thread) aux abonnés du flux (vue asynchrone `flux_evenements_view`, une
+boucle asyncio par processus ASGI) :
+- le pipeline des commandes publie les commandes créées et les
+  notifications insérées ;
+- le journal du stock (stock.mouvements) publie le nouveau stock des
+  produits modifiés, quelle que soit l'origine (réservation, libération,
+  ajustement).
+
+Les événements sont publiés au commit de la transaction, et seulement s'il
+y a des abonnés dans le processus : sans client connecté, la publication
+ne coûte ni requête ni objet. Chaque abonné a sa propre file bornée ; un
+client trop lent perd les événements en excès et reçoit un événement
+'resynchroniser' (il recharge alors la page).
+
+Le filtrage se fait à la publication :
+- un administrateur reçoit tout ;
+- un fournisseur reçoit ce qui concerne ses produits, ou ce qui lui est
+  destiné ;
+- un agent reçoit ses propres commandes et les niveaux de stock.
+
+Le hub est propre au processus : un abonné ne reçoit que les événements
+produits par le même processus. Le flux suppose donc un serveur ASGI (par
+exemple `uvicorn gestion_stock.asgi:application`) servant toute
+l'application avec un seul processus, ou un routage des écritures et du
+flux vers le même processus.
+"""
+
+import asyncio
+import itertools
+import json
+import threading
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Produit
+from . import metriques
+
+TAILLE_FILE = 100
+
+_abonnements = set()
+_verrou = threading.Lock()
+_identifiants = itertools.count(1)
+
+
+def intervalle_ping():
+    """Secondes sans événement avant l'envoi d'un commentaire de maintien."""
+    return getattr(settings, 'STOCK_FLUX_PING', 15)
+
+
+class Abonnement:
+    """
+    File d'événements d'un client du flux, consommée dans sa boucle asyncio.
+
+    `fournisseur` (code) ou `agent` (id utilisateur) restreignent les
+    événements reçus ; sans l'un ni l'autre, l'abonné reçoit tout.
+    """
+
+    def __init__(self, fournisseur=None, agent=None, boucle=None, taille=TAILLE_FILE):
+        self.fournisseur = fournisseur
+        self.agent = agent
+        self.boucle = boucle or asyncio.get_running_loop()
+        self.file = asyncio.Queue(maxsize=taille)
+        self.perdus = 0
+
+    def accepte(self, evt):
+        """Indique si l'événement concerne cet abonné."""
+        if self.fournisseur is not None:
+            return self.fournisseur in evt['fournisseurs']
+        if self.agent is not None:
+            return evt['type'] == 'stock' or evt['agent'] == self.agent
+        return True
+
+    def deposer(self, evt):
+        """Ajoute un événement à la file (dans la boucle de l'abonné)."""
+        try:
+            self.file.put_nowait(evt)
+        except asyncio.QueueFull:
+            self.perdus += 1
+
+    async def suivant(self, delai):
+        """
+        Prochain événement, ou None après `delai` secondes sans événement.
+
+        Après une perte, retourne d'abord un événement 'resynchroniser'.
+        """
+        if self.perdus:
+            self.perdus = 0
+            return evenement('resynchroniser', {})
+        try:
+            return await asyncio.wait_for(self.file.get(), delai)
+        except asyncio.TimeoutError:
+            return None
+
+
+def abonner(**filtres):
+    """Crée et enregistre un abonnement (voir Abonnement)."""
+    abonnement = Abonnement(**filtres)
+    with _verrou:
+        _abonnements.add(abonnement)
+    metriques.ABONNES_FLUX.inc()
+    return abonnement
+
+
+def desabonner(abonnement):
+    """Retire un abonnement du hub."""
+    with _verrou:
+        present = abonnement in _abonnements
+        _abonnements.discard(abonnement)
+    if present:
+        metriques.ABONNES_FLUX.dec()
+
+
+def abonnes():
+    """Nombre d'abonnés connectés à ce processus."""
+    return len(_abonnements)
+
+
+# ---------- Publication ----------
+
+def evenement(type_evenement, donnees, fournisseurs=(), agent=None):
+    """Événement à publier : type, données JSON et destinataires."""
+    return {
+        'id': next(_identifiants),
+        'type': type_evenement,
+        'donnees': donnees,
+        'fournisseurs': {code for code in fournisseurs if code},
+        'agent': agent,
+    }
+
+
+def publier(evenements):
+    """
+    Distribue des événements aux abonnés concernés (depuis n'importe quel
+    thread). Retourne le nombre de dépôts.
+    """
+    with _verrou:
+        abonnements = list(_abonnements)
+    depots = 0
+    for abonnement in abonnements:
+        for evt in evenements:
+            if not abonnement.accepte(evt):
+                continue
+            try:
+                abonnement.boucle.call_soon_threadsafe(abonnement.deposer, evt)
+            except RuntimeError:
+                # Boucle fermée : client parti sans désabonnement
+                desabonner(abonnement)
+                break
+            depots += 1
+    return depots
+
+
+def publier_apres_commit(fabrique):
+    """
+    Publie au commit de la transaction les événements retournés par
+    `fabrique()`, s'il y a des abonnés (sinon `fabrique` n'est pas appelée).
+    """
+    if abonnes():
+        transaction.on_commit(lambda: publier(fabrique()) if abonnes() else None)
+
+
+def evenement_commande(commande):
+    """Événement 'commande' d'une commande créée (produit chargé)."""
+    produit = commande.code_prod
+    return evenement('commande', {
+        'code_cmd': commande.code_cmd,
+        'produit': produit.code_prod,
+        'nom_prod': produit.nom_prod,
+        'quantite_cmd': commande.quantite_cmd,
+        'date_commande': commande.date_commande.isoformat(),
+    }, fournisseurs=[produit.fournisseur_id], agent=commande.agent_utilisateur_id)
+
+
+def evenement_notification(notification):
+    """Événement 'notification' d'une notification insérée (produit chargé)."""
+    return evenement('notification', {
+        'code_notification': notification.code_notification,
+        'type_notification': notification.type_notification,
+        'produit': notification.produit_id,
+        'titre': notification.titre,
+    }, fournisseurs=[notification.produit.fournisseur_id, notification.fournisseur_id])
+
+
+def evenements_stock(produit_ids):
+    """Événements 'stock' des produits donnés (une requête)."""
+    return [
+        evenement('stock', {
+            'produit': code_prod,
+            'nom_prod': nom_prod,
+            'quantite': quantite,
+        }, fournisseurs=[fournisseur_id])
+        for code_prod, nom_prod, quantite, fournisseur_id in Produit.all_objects.filter(pk__in=produit_ids).values_list(
+            'code_prod', 'nom_prod', 'quantite', 'fournisseur_id'
+        )
+    ]
+
+
+def format_sse(evt):
+    """Texte server-sent events d'un événement."""
+    return f"id: {evt['id']}\nevent: {evt['type']}\ndata: {json.dumps(evt['donnees'])}\n\n"
@@ -0,0 +1,183 @@
+"""
+Instrumentation SQL par requête HTTP.
+
+`MesureRequetesMiddleware` mesure, pour chaque requête HTTP, les requêtes
+SQL exécutées (toutes connexions et tous threads confondus, y compris l'ORM
+asynchrone) :
+- nombre de requêtes et temps total passé en base ;
+- empreintes dupliquées : même SQL aux paramètres près (les listes IN sont
+  normalisées), signature typique d'un N+1 ;
+- requêtes les plus lentes.
+
+Il alimente aussi l'histogramme des durées des vues par nom d'URL
+(stock.metriques).
+
+Le résumé est envoyé :
+- dans l'en-tête `Server-Timing` (onglet Réseau / Timing du navigateur) ;
+- sur le logger 'stock.requetes', une ligne JSON par requête HTTP (niveau
+  INFO, WARNING si le budget est dépassé).
+
+Budgets : STOCK_BUDGETS_REQUETES associe un nom d'URL (par exemple
+'stock:commande_list' ou 'admin:stock_commande_changelist') au nombre
+maximal de requêtes SQL. Un dépassement est journalisé ; avec
+STOCK_BUDGETS_STRICTS = True (tests), il lève BudgetRequetesDepasse, ce qui
+fait échouer le test qui a chargé la page.
+
+La mesure repose sur un execute_wrapper installé sur chaque connexion à sa
+création (signal connection_created) ; hors d'une requête HTTP mesurée, il
+ne fait qu'une lecture de ContextVar.
+"""
+
+import contextvars
+import json
+import logging
+import re
+import time
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from . import metriques
+
+logger = logging.getLogger('stock.requetes')
+
+NOMBRE_PLUS_LENTES = 3
+NOMBRE_DOUBLONS = 5
+
+_mesure_courante = contextvars.ContextVar('stock_mesure_requetes', default=None)
+
+
+class BudgetRequetesDepasse(AssertionError):
+    """Une vue a exécuté plus de requêtes SQL que son budget."""
+
+
+def empreinte(sql):
+    """SQL normalisé : listes de paramètres (IN, VALUES) et nombres littéraux remplacés."""
+    sql = re.sub(r'\((?:%s, )+%s\)', '(%s, ...)', sql)
+    return re.sub(r'\b\d+\b', '?', sql)
+
+
+class MesureRequetes:
+    """Requêtes SQL exécutées pendant une requête HTTP."""
+
+    def __init__(self):
+        self.requetes = []  # (durée en secondes, sql)
+
+    def __call__(self, execute, sql, params, many, context):
+        """execute_wrapper : chronomètre la requête."""
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.requetes.append((time.perf_counter() - debut, sql))
+
+    @property
+    def nombre(self):
+        return len(self.requetes)
+
+    @property
+    def duree(self):
+        return sum(duree for duree, _ in self.requetes)
+
+    def doublons(self):
+        """[(empreinte, nombre)] des empreintes exécutées plusieurs fois, les plus fréquentes d'abord."""
+        compteur = Counter(empreinte(sql) for _, sql in self.requetes)
+        return [(sql, nombre) for sql, nombre in compteur.most_common(NOMBRE_DOUBLONS) if nombre > 1]
+
+    def plus_lentes(self):
+        """[(durée, sql)] des requêtes les plus lentes."""
+        return sorted(self.requetes, key=lambda requete: requete[0], reverse=True)[:NOMBRE_PLUS_LENTES]
+
+
+@receiver(connection_created)
+def instrumenter_connexion(sender, connection, **kwargs):
+    """Installe la mesure sur chaque nouvelle connexion (une seule fois)."""
+    if enregistrer_requete not in connection.execute_wrappers:
+        connection.execute_wrappers.append(enregistrer_requete)
+
+
+def enregistrer_requete(execute, sql, params, many, context):
+    """execute_wrapper permanent : délègue à la mesure de la requête HTTP en cours."""
+    mesure = _mesure_courante.get()
+    if mesure is None:
+        return execute(sql, params, many, context)
+    return mesure(execute, sql, params, many, context)
+
+
+def budget(nom_url):
+    """Budget de requêtes SQL d'un nom d'URL, ou None."""
+    return getattr(settings, 'STOCK_BUDGETS_REQUETES', {}).get(nom_url)
+
+
+class MesureRequetesMiddleware:
+    """
+    Mesure les requêtes SQL de chaque requête HTTP (voir le module).
+
+    À placer en tête de MIDDLEWARE pour inclure les requêtes de session et
+    d'authentification. Compatible WSGI et ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        mesure, jeton, debut = self.commencer()
+        try:
+            response = self.get_response(request)
+        finally:
+            _mesure_courante.reset(jeton)
+        return self.terminer(request, response, mesure, debut)
+
+    async def __acall__(self, request):
+        mesure, jeton, debut = self.commencer()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _mesure_courante.reset(jeton)
+        return self.terminer(request, response, mesure, debut)
+
+    def commencer(self):
+        mesure = MesureRequetes()
+        return mesure, _mesure_courante.set(mesure), time.perf_counter()
+
+    def terminer(self, request, response, mesure, debut):
+        total = time.perf_counter() - debut
+        doublons = mesure.doublons()
+        response['Server-Timing'] = (
+            f'sql;dur={mesure.duree * 1000:.1f};desc="{mesure.nombre} requetes, '
+            f'{sum(nombre - 1 for _, nombre in doublons)} doublons", total;dur={total * 1000:.1f}'
+        )
+
+        nom_url = request.resolver_match.view_name if request.resolver_match else None
+        metriques.VUES.observe(total, vue=nom_url)
+        limite = budget(nom_url)
+        depasse = limite is not None and mesure.nombre > limite
+        logger.log(logging.WARNING if depasse else logging.INFO, json.dumps({
+            'methode': request.method,
+            'chemin': request.path,
+            'vue': nom_url,
+            'statut': response.status_code,
+            'requetes': mesure.nombre,
+            'budget': limite,
+            'sql_ms': round(mesure.duree * 1000, 1),
+            'total_ms': round(total * 1000, 1),
+            'doublons': [{'sql': sql, 'nombre': nombre} for sql, nombre in doublons],
+            'plus_lentes': [{'sql': sql, 'ms': round(duree * 1000, 1)} for duree, sql in mesure.plus_lentes()],
+        }, ensure_ascii=False))
+
+        if depasse and getattr(settings, 'STOCK_BUDGETS_STRICTS', False):
+            raise BudgetRequetesDepasse(
+                f'{nom_url} : {mesure.nombre} requêtes SQL pour un budget de {limite}\n'
+                + '\n'.join(f'  {nombre} × {sql}' for sql, nombre in doublons)
+            )
+        return response
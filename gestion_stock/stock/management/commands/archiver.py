@@ -0,0 +1,38 @@
+"""
+Management command pour déplacer les lignes mortes vers les archives.
+Usage: python manage.py archiver [--retention 365] [--types historique facture] [--lot 5000]
+
+À lancer périodiquement (cron) : les entrées d'Historique et les produits,
+commandes et factures supprimés logiquement plus anciens que la rétention
+quittent les tables principales (voir stock.archivage).
+"""
+
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from stock.archivage import TYPES, archiver
+
+
+class Command(BaseCommand):
+    help = 'Archive les lignes supprimées et l\'historique plus anciens que la rétention'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention', type=int, default=365, help='Rétention dans les tables principales (jours)')
+        parser.add_argument('--types', nargs='+', choices=list(TYPES), help='Types à archiver (tous par défaut)')
+        parser.add_argument('--lot', type=int, default=5000, help='Lignes déplacées par transaction')
+
+    def handle(self, *args, **options):
+        avant = timezone.now() - timedelta(days=options['retention'])
+
+        debut = time.perf_counter()
+        resultats = archiver(avant, types=options['types'], taille_lot=options['lot'])
+        duree = time.perf_counter() - debut
+
+        for type_objet, nombre in resultats.items():
+            self.stdout.write(f'📦 {type_objet}: {nombre} ligne(s) archivée(s)')
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✅ {sum(resultats.values())} ligne(s) archivée(s) en {duree:.2f}s (avant le {avant:%d/%m/%Y})\n'
+        ))
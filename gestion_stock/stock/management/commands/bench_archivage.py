@@ -0,0 +1,74 @@
+"""
+Benchmark de l'archivage sur un historique synthétique.
+Usage: python manage.py bench_archivage [--lignes 10000000] [--jours 1000] [--retention 365] [--lot 5000]
+
+Génère `lignes` entrées d'Historique réparties sur `jours` jours, puis
+mesure `archiver` (débit), la taille de la table principale avant/après et
+le coût d'une lecture par trouver() / rechercher() dans les archives.
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from stock.archivage import archiver, rechercher, trouver
+from stock.benchmarks import base_de_test, chronometre
+from stock.models import Historique, Archive
+
+TAILLE_INSERTION = 10000
+
+
+class Command(BaseCommand):
+    help = 'Mesure le débit de l\'archivage sur un historique synthétique'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lignes', type=int, default=10_000_000, help='Entrées d\'historique générées')
+        parser.add_argument('--jours', type=int, default=1000, help='Période couverte par l\'historique (jours)')
+        parser.add_argument('--retention', type=int, default=365, help='Rétention (jours)')
+        parser.add_argument('--lot', type=int, default=5000, help='Lignes déplacées par transaction')
+
+    def handle(self, *args, **options):
+        resultats = {}
+        maintenant = timezone.now()
+
+        with base_de_test():
+            with chronometre(resultats, 'generation'):
+                self.generer(options['lignes'], options['jours'], maintenant)
+            avant_archivage = Historique.objects.count()
+
+            limite = maintenant - timedelta(days=options['retention'])
+            with chronometre(resultats, 'archivage'):
+                archivees = archiver(limite, types=['historique'], taille_lot=options['lot'])['historique']
+            apres_archivage = Historique.objects.count()
+
+            archive = Archive.objects.order_by('id_objet').first()
+            with chronometre(resultats, 'trouver'):
+                if archive is not None:
+                    trouver('historique', archive.id_objet)
+            with chronometre(resultats, 'rechercher'):
+                trouvees = rechercher('historique', depuis=limite - timedelta(days=1), jusqua=limite).count()
+
+        debit = archivees / resultats['archivage'] if resultats['archivage'] else 0
+        self.stdout.write(self.style.SUCCESS(f"\n📦 Archivage de l'historique ({options['lignes']} lignes sur {options['jours']} jours)\n"))
+        self.stdout.write(f"  Génération          : {resultats['generation']:.2f}s")
+        self.stdout.write(f"  Archivage           : {resultats['archivage']:.2f}s ({archivees} lignes, {debit:.0f} lignes/s)")
+        self.stdout.write(f"  Table Historique    : {avant_archivage} -> {apres_archivage} lignes")
+        self.stdout.write(f"  trouver() archivé   : {resultats['trouver'] * 1000:.2f} ms")
+        self.stdout.write(f"  rechercher() 1 jour : {resultats['rechercher'] * 1000:.2f} ms ({trouvees} lignes)")
+
+    def generer(self, lignes, jours, maintenant):
+        """Insère l'historique par blocs ; chaque bloc reçoit une date (auto_now_add l'écrase à l'insertion)."""
+        blocs = max(1, -(-lignes // TAILLE_INSERTION))
+        for bloc in range(blocs):
+            taille = min(TAILLE_INSERTION, lignes - bloc * TAILLE_INSERTION)
+            crees = Historique.objects.bulk_create([
+                Historique(
+                    type_objet='commande',
+                    id_objet=bloc * TAILLE_INSERTION + i,
+                    donnees_supprimees={'quantite_cmd': i % 50 + 1, 'code_prod': i % 1000},
+                )
+                for i in range(taille)
+            ])
+            date = maintenant - timedelta(days=jours * (blocs - bloc) / blocs)
+            Historique.objects.filter(pk__gte=crees[0].pk).update(date_suppression=date)
@@ -0,0 +1,165 @@
+"""
+Benchmark des dashboards et des données JSON : vues synchrones sous WSGI
+face aux variantes asynchrones sous ASGI.
+Usage: python manage.py bench_asgi [--clients 20] [--requetes 200] [--commandes 2000]
+
+Les deux modes appellent directement les points d'entrée de Django, sans
+réseau, avec `--clients` clients simultanés :
+- WSGI : WSGIHandler dans un pool de threads (comme gunicorn --threads) ;
+- ASGI : application ASGI dans une seule boucle asyncio (comme un worker
+  uvicorn), pour la vue synchrone et pour sa variante asynchrone.
+
+Pour chaque vue : latence p50 / p99 et requêtes par seconde.
+"""
+
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.test import Client, RequestFactory
+from django.urls import reverse
+
+from stock import statistiques
+from stock.benchmarks import base_de_test
+from stock.models import Produit, Commande, Fournisseur
+
+
+def percentile(valeurs, rang):
+    """Percentile `rang` (0-100) d'une liste triée."""
+    return valeurs[min(len(valeurs) - 1, int(len(valeurs) * rang / 100))]
+
+
+class Command(BaseCommand):
+    help = 'Compare les dashboards synchrones (WSGI) et asynchrones (ASGI) : p50, p99 et débit'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=20, help='Clients simultanés')
+        parser.add_argument('--requetes', type=int, default=200, help='Requêtes par vue et par mode')
+        parser.add_argument('--commandes', type=int, default=2000, help='Commandes en base')
+
+    def handle(self, *args, **options):
+        with base_de_test():
+            cookies = self.preparer(options['commandes'])
+            agent_id = User.objects.get(username='agent_bench').pk
+            vues = [
+                ('Dashboard admin', 'admin', reverse('stock:dashboard'), reverse('stock:dashboard_async')),
+                ('Dashboard agent', 'agent', reverse('stock:agent_dashboard'), reverse('stock:agent_dashboard_async')),
+                ('Dashboard fournisseur', 'fournisseur', reverse('stock:fournisseur_dashboard'), reverse('stock:fournisseur_dashboard_async')),
+                ('Graphiques agent (JSON)', 'admin', reverse('stock:agent_graphs_data', args=[agent_id]), reverse('stock:agent_graphs_data_async', args=[agent_id])),
+            ]
+
+            wsgi = get_wsgi_application()
+            asgi = get_asgi_application()
+            lignes = []
+            for nom, role, url_sync, url_async in vues:
+                for mode, mesure in (
+                    ('WSGI  vue sync', lambda: self.mesurer_wsgi(wsgi, url_sync, cookies[role], options)),
+                    ('ASGI  vue sync', lambda: asyncio.run(self.mesurer_asgi(asgi, url_sync, cookies[role], options))),
+                    ('ASGI  vue async', lambda: asyncio.run(self.mesurer_asgi(asgi, url_async, cookies[role], options))),
+                ):
+                    latences, duree, statuts = mesure()
+                    lignes.append((nom, mode, latences, duree, statuts))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"\n⚡ Dashboards : {options['clients']} clients simultanés, {options['requetes']} requêtes par vue et par mode\n"
+        ))
+        self.stdout.write(f"  {'Vue':<26}{'Mode':<17}{'p50':>9}{'p99':>9}{'req/s':>9}  Statuts")
+        for nom, mode, latences, duree, statuts in lignes:
+            latences.sort()
+            self.stdout.write(
+                f"  {nom:<26}{mode:<17}"
+                f"{statistics.median(latences) * 1000:>7.1f}ms{percentile(latences, 99) * 1000:>7.1f}ms"
+                f"{len(latences) / duree:>9.0f}  {sorted(statuts)}"
+            )
+
+    def preparer(self, nb_commandes):
+        """Données du benchmark ; retourne les cookies de session par rôle."""
+        admin = User.objects.create_user(username='admin_bench', is_staff=True)
+        agent = User.objects.create_user(username='agent_bench')
+        utilisateur_fournisseur = User.objects.create_user(username='fournisseur_bench')
+        utilisateur_fournisseur.groups.add(Group.objects.get_or_create(name='Fournisseur')[0])
+
+        fournisseurs = Fournisseur.objects.bulk_create([
+            Fournisseur(code_fournisseur=f'F{i}', nom_fournisseur=f'Fournisseur {i}', email=f'f{i}@bench.com')
+            for i in range(10)
+        ])
+        Fournisseur.objects.filter(pk='F0').update(user=utilisateur_fournisseur)
+        produits = Produit.objects.bulk_create([
+            Produit(nom_prod=f'Produit {i}', quantite=i % 50, prix_unit=1.0 + i % 7, fournisseur=fournisseurs[i % 10])
+            for i in range(500)
+        ])
+        Commande.objects.bulk_create([
+            Commande(code_prod=produits[i % 500], quantite_cmd=1 + i % 3, agent_utilisateur=agent if i % 100 == 0 else None)
+            for i in range(nb_commandes)
+        ], batch_size=2000)
+        statistiques.reconstruire()
+
+        cookies = {}
+        for role, utilisateur in (('admin', admin), ('agent', agent), ('fournisseur', utilisateur_fournisseur)):
+            client = Client()
+            client.force_login(utilisateur)
+            cookies[role] = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+        return cookies
+
+    def mesurer_wsgi(self, application, url, cookie, options):
+        """Requêtes WSGI réparties sur un pool de `clients` threads."""
+        environ = RequestFactory()._base_environ(PATH_INFO=url, REQUEST_METHOD='GET', HTTP_COOKIE=cookie)
+        statuts = set()
+
+        def requete(_):
+            debut = time.perf_counter()
+            reponse = application(dict(environ), lambda statut, entetes: statuts.add(int(statut.split()[0])))
+            b''.join(reponse)
+            reponse.close()
+            return time.perf_counter() - debut
+
+        debut = time.perf_counter()
+        with ThreadPoolExecutor(options['clients']) as pool:
+            latences = list(pool.map(requete, range(options['requetes'])))
+        return latences, time.perf_counter() - debut, statuts
+
+    async def mesurer_asgi(self, application, url, cookie, options):
+        """Requêtes ASGI de `clients` clients simultanés dans une seule boucle."""
+        latences, statuts = [], set()
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': url,
+            'raw_path': url.encode(),
+            'query_string': b'',
+            'root_path': '',
+            'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+            'client': ('127.0.0.1', 0),
+            'server': ('testserver', 80),
+        }
+
+        async def requete():
+            entree = asyncio.Queue()
+            await entree.put({'type': 'http.request', 'body': b'', 'more_body': False})
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    statuts.add(message['status'])
+
+            debut = time.perf_counter()
+            await application(dict(scope), entree.get, send)
+            latences.append(time.perf_counter() - debut)
+
+        async def client(nombre):
+            for _ in range(nombre):
+                await requete()
+
+        parts = [options['requetes'] // options['clients']] * options['clients']
+        parts[0] += options['requetes'] - sum(parts)
+        debut = time.perf_counter()
+        await asyncio.gather(*(client(nombre) for nombre in parts))
+        return latences, time.perf_counter() - debut, statuts
@@ -0,0 +1,144 @@
+"""
+Benchmark du flux d'événements en direct (stock.evenements).
+Usage: python manage.py bench_flux [--abonnes 1000] [--repos 5]
+
+Ouvre N connexions /stock/evenements/ sur un seul processus, en appelant
+directement l'application ASGI de Django (comme le ferait un serveur), puis
+mesure :
+- le temps d'ouverture des N flux et la mémoire (RSS, Linux) par abonné ;
+- le CPU consommé par les abonnés au repos ;
+- la latence de diffusion d'une commande réelle à tous les abonnés ;
+- la fermeture des flux à la déconnexion des clients.
+"""
+
+import asyncio
+import resource
+import statistics
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from stock import evenements
+from stock.benchmarks import base_de_test, chronometre
+from stock.models import Produit, Commande
+from stock.reservations import reserver_stock
+
+
+class ClientFlux:
+    """Client ASGI minimal d'une connexion au flux."""
+
+    def __init__(self, application, chemin, cookie):
+        self.application = application
+        self.chemin = chemin
+        self.cookie = cookie
+        self.entree = asyncio.Queue()
+        self.statut = None
+        self.commande_recue = None
+        self.connecte = asyncio.Event()
+
+    async def receive(self):
+        return await self.entree.get()
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            self.statut = message['status']
+        elif message['type'] == 'http.response.body':
+            if b'event: commande' in message.get('body', b''):
+                self.commande_recue = time.perf_counter()
+            self.connecte.set()
+
+    async def executer(self):
+        await self.entree.put({'type': 'http.request', 'body': b'', 'more_body': False})
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': self.chemin,
+            'raw_path': self.chemin.encode(),
+            'query_string': b'',
+            'root_path': '',
+            'headers': [(b'host', b'testserver'), (b'cookie', self.cookie)],
+            'client': ('127.0.0.1', 0),
+            'server': ('testserver', 80),
+        }
+        await self.application(scope, self.receive, self.send)
+
+    async def deconnecter(self):
+        await self.entree.put({'type': 'http.disconnect'})
+
+
+class Command(BaseCommand):
+    help = 'Mesure N abonnés au repos sur le flux d\'événements d\'un seul processus'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--abonnes', type=int, default=1000, help='Nombre de connexions simultanées')
+        parser.add_argument('--repos', type=float, default=5.0, help='Secondes de mesure au repos')
+
+    def handle(self, *args, **options):
+        with base_de_test():
+            admin = User.objects.create_user(username='admin_bench', is_staff=True)
+            client = Client()
+            client.force_login(admin)
+            cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'.encode()
+            produit = Produit.objects.create(nom_prod='Produit bench', quantite=10_000, prix_unit=1.0)
+
+            resultats = asyncio.run(self.mesurer(options['abonnes'], options['repos'], cookie, produit))
+
+        nombre = options['abonnes']
+        latences = sorted(resultats['latences'])
+        self.stdout.write(self.style.SUCCESS(f'\n📡 Flux d\'événements : {nombre} abonnés sur un processus\n'))
+        self.stdout.write(f"  Ouverture des flux          {resultats['ouverture']:>9.2f}s  ({resultats['connectes']} connecté(s))")
+        self.stdout.write(f"  Mémoire (RSS) par abonné    {resultats['memoire'] / nombre / 1024:>9.1f} Ko")
+        self.stdout.write(f"  CPU au repos                {resultats['cpu_repos'] * 100:>9.2f} %  (sur {options['repos']:.0f}s)")
+        if latences:
+            self.stdout.write(f"  Diffusion d'une commande    {len(latences)} reçue(s), latence depuis l'appel (commande : {resultats['commande'] * 1000:.1f} ms)")
+            self.stdout.write(f"    p50                       {statistics.median(latences) * 1000:>9.1f} ms")
+            self.stdout.write(f"    p99                       {latences[int(len(latences) * 0.99) - 1] * 1000:>9.1f} ms")
+            self.stdout.write(f"    max                       {latences[-1] * 1000:>9.1f} ms")
+        self.stdout.write(f"  Fermeture des flux          {resultats['fermeture']:>9.2f}s  ({resultats['restants']} abonné(s) restant(s))")
+
+    async def mesurer(self, nombre, repos, cookie, produit):
+        application = get_asgi_application()
+        chemin = reverse('stock:flux_evenements')
+        resultats = {}
+
+        memoire_avant = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        with chronometre(resultats, 'ouverture'):
+            clients = [ClientFlux(application, chemin, cookie) for _ in range(nombre)]
+            taches = [asyncio.create_task(client.executer()) for client in clients]
+            await asyncio.gather(*(client.connecte.wait() for client in clients))
+        resultats['memoire'] = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - memoire_avant) * 1024
+        resultats['connectes'] = evenements.abonnes()
+
+        cpu = time.process_time()
+        await asyncio.sleep(repos)
+        resultats['cpu_repos'] = (time.process_time() - cpu) / repos
+
+        # Une commande réelle : réservation + pipeline, publiés au commit
+        def commander():
+            reserver_stock(produit.code_prod, 1)
+            Commande.objects.create(code_prod=produit, quantite_cmd=1)
+
+        debut = time.perf_counter()
+        await sync_to_async(commander)()
+        resultats['commande'] = time.perf_counter() - debut
+        for _ in range(100):
+            if all(client.commande_recue for client in clients):
+                break
+            await asyncio.sleep(0.05)
+        resultats['latences'] = [client.commande_recue - debut for client in clients if client.commande_recue]
+
+        with chronometre(resultats, 'fermeture'):
+            for client in clients:
+                await client.deconnecter()
+            await asyncio.gather(*taches, return_exceptions=True)
+        resultats['restants'] = evenements.abonnes()
+        return resultats
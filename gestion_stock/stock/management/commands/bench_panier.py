@@ -0,0 +1,71 @@
+"""
+Benchmark des paniers multi-produits.
+Usage: python manage.py bench_panier [--lignes 100]
+
+Compare un panier de N lignes (une requête HTTP, une transaction) avec
+N appels successifs à passer_commande_view.
+"""
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from stock.benchmarks import base_de_test, chronometre
+from stock.models import Produit, Commande, Facture
+
+
+class Command(BaseCommand):
+    help = 'Compare un panier de N lignes avec N commandes unitaires'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lignes', type=int, default=100, help='Nombre de lignes / de commandes')
+
+    def handle(self, *args, **options):
+        nb_lignes = options['lignes']
+
+        with base_de_test():
+            User.objects.create_user(username='agent_bench', password='bench123')
+            client = Client()
+            client.login(username='agent_bench', password='bench123')
+
+            produits = Produit.objects.bulk_create([
+                Produit(nom_prod=f'Produit {i}', quantite=1000, prix_unit=5.0 + i)
+                for i in range(nb_lignes)
+            ])
+
+            resultats = {}
+
+            # 1. N commandes unitaires
+            with CaptureQueriesContext(connection) as requetes_unitaires:
+                with chronometre(resultats, 'unitaires'):
+                    for produit in produits:
+                        client.post(
+                            reverse('stock:passer_commande', args=[produit.code_prod]),
+                            {'quantite': 1},
+                        )
+            factures_unitaires = Facture.objects.count()
+
+            # 2. Un panier de N lignes
+            donnees = {f'quantite_{produit.code_prod}': 1 for produit in produits}
+            with CaptureQueriesContext(connection) as requetes_panier:
+                with chronometre(resultats, 'panier'):
+                    client.post(reverse('stock:passer_panier'), donnees)
+            factures_panier = Facture.objects.count() - factures_unitaires
+
+            lignes_panier = Commande.objects.filter(panier__isnull=False).count()
+
+        self.stdout.write(self.style.SUCCESS(f'\n🧺 Panier de {nb_lignes} lignes vs {nb_lignes} commandes unitaires\n'))
+        self.stdout.write(f"  {'':<22}{'Durée':>10}{'Requêtes SQL':>15}{'Factures':>10}")
+        self.stdout.write(
+            f"  {'Commandes unitaires':<22}{resultats['unitaires']:>9.3f}s"
+            f"{len(requetes_unitaires):>15}{factures_unitaires:>10}"
+        )
+        self.stdout.write(
+            f"  {'Panier':<22}{resultats['panier']:>9.3f}s"
+            f"{len(requetes_panier):>15}{factures_panier:>10}"
+        )
+        self.stdout.write(f"\n  Lignes de panier créées : {lignes_panier}")
+        self.stdout.write(f"  Gain : x{resultats['unitaires'] / resultats['panier']:.1f}")
@@ -0,0 +1,90 @@
+"""
+Benchmark des prévisions de demande.
+Usage: python manage.py bench_previsions [--produits 50000] [--annees 3] [--densite 0.02] [--nouveaux 500]
+
+Génère `produits` produits et `annees` années de commandes (chaque produit
+a sa propre probabilité d'être commandé un jour donné, en moyenne
+`densite` : beaucoup de demandes intermittentes), puis mesure :
+- un calcul complet ;
+- un rafraîchissement incrémental après des commandes sur `nouveaux`
+  produits.
+"""
+
+from datetime import timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+
+from stock.benchmarks import base_de_test, chronometre
+from stock.models import Produit, Commande, PrevisionDemande
+from stock.previsions import prevoir
+
+TAILLE_LOT = 5000
+
+
+class Command(BaseCommand):
+    help = 'Mesure le temps de calcul des prévisions de demande'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--produits', type=int, default=50_000, help='Nombre de produits')
+        parser.add_argument('--annees', type=int, default=3, help="Années d'historique")
+        parser.add_argument('--densite', type=float, default=0.02, help='Probabilité moyenne de commande par produit et par jour')
+        parser.add_argument('--nouveaux', type=int, default=500, help='Produits commandés avant le rafraîchissement incrémental')
+
+    def handle(self, *args, **options):
+        resultats = {}
+        aleatoire = np.random.default_rng(42)
+        jours = options['annees'] * 365
+
+        with base_de_test():
+            with chronometre(resultats, 'generation'):
+                nb_commandes = self.generer(options['produits'], jours, options['densite'], aleatoire)
+
+            with chronometre(resultats, 'complet'):
+                completes = prevoir(jours=jours)
+
+            codes = Produit.objects.order_by('?').values_list('code_prod', flat=True)[:options['nouveaux']]
+            Commande.objects.bulk_create([Commande(code_prod_id=code, quantite_cmd=1) for code in codes])
+            with chronometre(resultats, 'incremental'):
+                incrementales = prevoir(jours=jours, incremental=True)
+
+            methodes = dict(PrevisionDemande.objects.values_list('methode').annotate(nombre=Count('pk')).order_by())
+
+        self.stdout.write(self.style.SUCCESS(
+            f"\n📈 Prévisions ({options['produits']} produits, {jours} jours, {nb_commandes} commandes)\n"
+        ))
+        self.stdout.write(f"  Génération   : {resultats['generation']:.2f}s")
+        self.stdout.write(f"  Complet      : {resultats['complet']:.2f}s ({completes} prévisions)")
+        self.stdout.write(f"  Incrémental  : {resultats['incremental']:.2f}s ({incrementales} prévisions)")
+        self.stdout.write(f"  Méthodes     : {methodes}")
+
+    def generer(self, nb_produits, jours, densite, aleatoire):
+        """
+        Produits et commandes synthétiques (bulk_create : pas de signaux).
+
+        Les commandes sont insérées jour par jour ; chaque jour reçoit sa
+        date par un UPDATE (auto_now_add l'écrase à l'insertion).
+        """
+        for debut in range(0, nb_produits, TAILLE_LOT):
+            Produit.objects.bulk_create([
+                Produit(nom_prod=f'Produit bench {i}', quantite=int(aleatoire.integers(0, 200)), prix_unit=10.0)
+                for i in range(debut, min(debut + TAILLE_LOT, nb_produits))
+            ])
+        codes = np.array(Produit.objects.order_by('code_prod').values_list('code_prod', flat=True))
+        probabilites = np.minimum(aleatoire.exponential(densite, len(codes)), 1.0)
+
+        maintenant = timezone.now()
+        total = 0
+        for jour in range(jours, 0, -1):
+            commandes = codes[aleatoire.random(len(codes)) < probabilites]
+            quantites = aleatoire.integers(1, 10, len(commandes))
+            crees = Commande.objects.bulk_create([
+                Commande(code_prod_id=int(code), quantite_cmd=int(quantite))
+                for code, quantite in zip(commandes, quantites)
+            ], batch_size=1000)
+            if crees:
+                Commande.objects.filter(pk__gte=crees[0].pk).update(date_commande=maintenant - timedelta(days=jour))
+            total += len(crees)
+        return total
@@ -0,0 +1,88 @@
+"""
+Benchmark du planificateur de réapprovisionnement.
+Usage: python manage.py bench_reapprovisionnement [--produits 100000] [--fournisseurs 3] [--jours-actifs 5]
+
+Génère `produits` produits, jusqu'à `fournisseurs` liaisons fournisseur par
+produit et `jours-actifs` jours de demande par produit sur les 90 derniers
+jours, puis mesure séparément le chargement, le calcul vectorisé et
+l'écriture des suggestions.
+"""
+
+import random
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from stock.benchmarks import base_de_test, chronometre
+from stock.models import Produit, Fournisseur, ProduitFournisseur, StatistiqueJournaliere
+from stock.reapprovisionnement import charger, calculer, enregistrer
+
+TAILLE_LOT = 5000
+
+
+class Command(BaseCommand):
+    help = 'Mesure le temps de calcul des suggestions de réapprovisionnement'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--produits', type=int, default=100_000, help='Nombre de produits')
+        parser.add_argument('--fournisseurs', type=int, default=3, help='Liaisons fournisseur maximum par produit')
+        parser.add_argument('--jours-actifs', type=int, default=5, help='Jours avec des commandes par produit')
+
+    def handle(self, *args, **options):
+        resultats = {}
+        aleatoire = random.Random(42)
+
+        with base_de_test():
+            with chronometre(resultats, 'generation'):
+                self.generer(options['produits'], options['fournisseurs'], options['jours_actifs'], aleatoire)
+
+            with chronometre(resultats, 'chargement'):
+                donnees = charger()
+            with chronometre(resultats, 'calcul'):
+                suggestions = calculer(donnees)
+            with chronometre(resultats, 'ecriture'):
+                enregistrees = enregistrer(suggestions)
+
+        total = resultats['chargement'] + resultats['calcul'] + resultats['ecriture']
+        self.stdout.write(self.style.SUCCESS(
+            f"\n📦 Réapprovisionnement ({options['produits']} produits, {len(donnees['option_produit'])} options fournisseur)\n"
+        ))
+        self.stdout.write(f"  Génération : {resultats['generation']:.2f}s")
+        self.stdout.write(f"  Chargement : {resultats['chargement']:.3f}s")
+        self.stdout.write(f"  Calcul     : {resultats['calcul']:.3f}s")
+        self.stdout.write(f"  Écriture   : {resultats['ecriture']:.3f}s ({enregistrees} suggestions)")
+        self.stdout.write(f"  Total      : {total:.3f}s")
+
+    def generer(self, nb_produits, nb_fournisseurs, jours_actifs, aleatoire):
+        """Produits, liaisons et demande synthétiques (bulk_create : pas de signaux)."""
+        fournisseurs = Fournisseur.objects.bulk_create([
+            Fournisseur(code_fournisseur=f'B{i:03}', nom_fournisseur=f'Fournisseur bench {i}', email=f'b{i}@test.com')
+            for i in range(max(nb_fournisseurs, 1) * 4)
+        ])
+        aujourd_hui = timezone.localdate()
+        for debut in range(0, nb_produits, TAILLE_LOT):
+            produits = Produit.objects.bulk_create([
+                Produit(nom_prod=f'Produit bench {i}', quantite=aleatoire.randint(0, 200), prix_unit=aleatoire.uniform(1, 100))
+                for i in range(debut, min(debut + TAILLE_LOT, nb_produits))
+            ])
+            liaisons, statistiques = [], []
+            for produit in produits:
+                for j, fournisseur in enumerate(aleatoire.sample(fournisseurs, aleatoire.randint(1, max(nb_fournisseurs, 1)))):
+                    liaisons.append(ProduitFournisseur(
+                        produit=produit,
+                        fournisseur=fournisseur,
+                        prix_fournisseur=produit.prix_unit * aleatoire.uniform(0.5, 0.9),
+                        delai_livraison=aleatoire.randint(2, 30),
+                        quantite_min=aleatoire.choice([1, 10, 50]),
+                        is_principal=j == 0,
+                    ))
+                for jour in aleatoire.sample(range(90), jours_actifs):
+                    statistiques.append(StatistiqueJournaliere(
+                        jour=aujourd_hui - timedelta(days=jour),
+                        produit=produit,
+                        nb_commandes=1,
+                        quantite_commandee=aleatoire.randint(1, 20),
+                    ))
+            ProduitFournisseur.objects.bulk_create(liaisons, batch_size=1000)
+            StatistiqueJournaliere.objects.bulk_create(statistiques, batch_size=1000)
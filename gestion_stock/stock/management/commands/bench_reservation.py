@@ -0,0 +1,93 @@
+"""
+Benchmark de concurrence du service de réservation de stock.
+Usage: python manage.py bench_reservation [--commandes 5000] [--threads 32] [--stock 1000]
+
+Lance des milliers de commandes en parallèle sur un seul produit "chaud"
+et vérifie le débit ainsi que l'absence de survente.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Sum
+
+from stock.benchmarks import base_de_test, chronometre
+from stock.models import Produit, Commande
+from stock.reservations import reserver_stock
+
+
+class Command(BaseCommand):
+    help = 'Mesure le débit et vérifie l\'absence de survente du service de réservation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--commandes', type=int, default=5000, help='Nombre de commandes lancées')
+        parser.add_argument('--threads', type=int, default=32, help='Nombre de commandes en parallèle')
+        parser.add_argument('--stock', type=int, default=1000, help='Stock initial du produit')
+        parser.add_argument(
+            '--naif', action='store_true',
+            help='Compare avec l\'ancienne lecture-modification-écriture (produit.save())'
+        )
+
+    def handle(self, *args, **options):
+        with base_de_test():
+            self.stdout.write(self.style.SUCCESS('\n⚡ Réservation atomique (UPDATE conditionnel)'))
+            ok = self.executer(options, self.commande_atomique)
+            if options['naif']:
+                self.stdout.write(self.style.WARNING('\n🐢 Ancienne méthode (lecture puis save())'))
+                self.executer(options, self.commande_naive)
+
+        if not ok:
+            raise CommandError('Survente détectée avec la réservation atomique !')
+
+    def executer(self, options, commande):
+        produit = Produit.objects.create(
+            nom_prod=f'Produit chaud {commande.__name__}',
+            quantite=options['stock'],
+            prix_unit=10.0,
+        )
+
+        def tache(_):
+            try:
+                return commande(produit.code_prod)
+            finally:
+                connection.close()
+
+        resultats = {}
+        with chronometre(resultats, 'duree'):
+            with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+                reussites = sum(pool.map(tache, range(options['commandes'])))
+
+        produit.refresh_from_db()
+        vendues = Commande.objects.filter(code_prod=produit).aggregate(total=Sum('quantite_cmd'))['total'] or 0
+        sans_survente = produit.quantite >= 0 and vendues + produit.quantite == options['stock']
+
+        self.stdout.write(f"  Commandes lancées   : {options['commandes']} ({options['threads']} threads)")
+        self.stdout.write(f"  Commandes acceptées : {reussites}")
+        self.stdout.write(f"  Unités vendues      : {vendues} / stock initial {options['stock']}")
+        self.stdout.write(f"  Stock final         : {produit.quantite}")
+        self.stdout.write(f"  Durée               : {resultats['duree']:.2f}s "
+                          f"({options['commandes'] / resultats['duree']:.0f} commandes/s)")
+        if sans_survente:
+            self.stdout.write(self.style.SUCCESS('  ✅ Aucune survente'))
+        else:
+            self.stdout.write(self.style.ERROR('  ❌ Survente ou stock incohérent'))
+        return sans_survente
+
+    @staticmethod
+    def commande_atomique(produit_id):
+        with transaction.atomic():
+            if not reserver_stock(produit_id, 1):
+                return False
+            Commande.objects.create(code_prod_id=produit_id, quantite_cmd=1)
+        return True
+
+    @staticmethod
+    def commande_naive(produit_id):
+        produit = Produit.objects.get(code_prod=produit_id)
+        if produit.quantite < 1:
+            return False
+        produit.quantite -= 1
+        produit.save()
+        Commande.objects.create(code_prod_id=produit_id, quantite_cmd=1)
+        return True
@@ -0,0 +1,68 @@
+"""
+Benchmark des statistiques par agent d'un fournisseur.
+Usage: python manage.py bench_stats_agents [--agents 10 100 1000] [--commandes 5]
+
+Mesure stats_agents_fournisseur (utilisée par CommandeListView et
+FactureListView) pour un nombre croissant d'agents : le nombre de requêtes
+SQL doit rester constant.
+"""
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from stock.benchmarks import base_de_test, chronometre
+from stock.models import Produit, Commande, Facture, Fournisseur
+from stock.statistiques import stats_agents_fournisseur
+
+
+class Command(BaseCommand):
+    help = 'Mesure le coût des statistiques par agent quand le nombre d\'agents augmente'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--agents', type=int, nargs='+', default=[10, 100, 1000], help='Nombres d\'agents à tester')
+        parser.add_argument('--commandes', type=int, default=5, help='Commandes par agent')
+
+    def handle(self, *args, **options):
+        mesures = []
+
+        with base_de_test():
+            fournisseur = Fournisseur.objects.create(
+                code_fournisseur='BENCH', nom_fournisseur='Fournisseur bench', email='bench@test.com'
+            )
+            produit = Produit.objects.create(nom_prod='Produit bench', quantite=10**9, prix_unit=4.5, fournisseur=fournisseur)
+
+            for nb_agents in sorted(options['agents']):
+                # Compléter la base jusqu'à nb_agents agents (bulk_create : pas de signaux)
+                existants = User.objects.filter(username__startswith='agent_bench_').count()
+                agents = User.objects.bulk_create([
+                    User(username=f'agent_bench_{i}') for i in range(existants, nb_agents)
+                ])
+                commandes = Commande.objects.bulk_create([
+                    Commande(code_prod=produit, quantite_cmd=1 + j, agent_utilisateur=agent)
+                    for agent in agents
+                    for j in range(options['commandes'])
+                ])
+                Facture.objects.bulk_create([
+                    Facture(
+                        commande=commande,
+                        montant_total=commande.quantite_cmd * produit.prix_unit,
+                        agent_utilisateur=commande.agent_utilisateur,
+                        statut='payee' if commande.quantite_cmd % 2 else 'brouillon',
+                    )
+                    for commande in commandes
+                ])
+
+                resultats = {}
+                with CaptureQueriesContext(connection) as requetes:
+                    with chronometre(resultats, 'stats'):
+                        stats = stats_agents_fournisseur(fournisseur)
+                mesures.append((nb_agents, len(stats), resultats['stats'], len(requetes)))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"\n👥 Statistiques par agent ({options['commandes']} commandes par agent)\n"
+        ))
+        self.stdout.write(f"  {'Agents':>8}{'Lignes':>10}{'Durée':>12}{'Requêtes SQL':>15}")
+        for nb_agents, lignes, duree, requetes in mesures:
+            self.stdout.write(f"  {nb_agents:>8}{lignes:>10}{duree:>11.3f}s{requetes:>15}")
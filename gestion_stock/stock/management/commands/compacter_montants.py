@@ -0,0 +1,31 @@
+"""
+Management command pour replier le journal des montants agents dans les instantanés.
+Usage: python manage.py compacter_montants [--lot 10000]
+
+À lancer périodiquement (cron) : les commandes ajoutent des mouvements en
+insertion seule, cette commande les additionne dans MontantAgent.
+"""
+
+from django.core.management.base import BaseCommand
+
+from stock.models import MontantAgent, MouvementMontantAgent
+
+
+class Command(BaseCommand):
+    help = 'Compacte les mouvements de montant des agents dans MontantAgent'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lot', type=int, default=10000, help='Mouvements compactés par transaction')
+
+    def handle(self, *args, **options):
+        agents = MouvementMontantAgent.objects.values_list('agent_utilisateur_id', flat=True).distinct()
+
+        total = 0
+        for agent_id in list(agents):
+            while True:
+                compactes = MontantAgent.compacter(agent_id, taille_lot=options['lot'])
+                total += compactes
+                if compactes < options['lot']:
+                    break
+
+        self.stdout.write(self.style.SUCCESS(f'\n✅ {total} mouvement(s) compacté(s)\n'))
@@ -0,0 +1,25 @@
+"""
+Management command pour regrouper les alertes fournisseurs en digests.
+Usage: python manage.py envoyer_digests [--intervalle 60]
+
+À lancer périodiquement (cron), avant `envoyer_emails` : chaque
+fournisseur ayant des produits en rupture reçoit un seul email les listant
+tous, au plus une fois par intervalle (voir stock.digests).
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from stock.digests import envoyer_digests
+
+
+class Command(BaseCommand):
+    help = 'Met en file un email récapitulatif par fournisseur pour les ruptures en attente'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalle', type=int, default=60, help='Minutes minimum entre deux digests d\'un même fournisseur')
+
+    def handle(self, *args, **options):
+        nombre = envoyer_digests(intervalle=timedelta(minutes=options['intervalle']))
+        self.stdout.write(self.style.SUCCESS(f'\n✅ {nombre} digest(s) fournisseur mis en file\n'))
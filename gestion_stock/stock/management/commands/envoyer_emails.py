@@ -0,0 +1,49 @@
+"""
+Management command pour envoyer les emails en attente dans la file (outbox).
+Usage: python manage.py envoyer_emails [--boucle] [--workers 4] [--lot 100]
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from stock.emails import traiter_file
+
+
+class Command(BaseCommand):
+    help = 'Envoie les emails en attente (une connexion SMTP, pool de threads, réessais avec délai exponentiel)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Nombre de threads d\'envoi')
+        parser.add_argument('--lot', type=int, default=100, help='Nombre d\'emails réservés par lot')
+        parser.add_argument('--max-tentatives', type=int, default=5, help='Tentatives avant abandon')
+        parser.add_argument('--delai', type=int, default=60, help='Délai de base entre deux essais (secondes)')
+        parser.add_argument('--boucle', action='store_true', help='Tourne en continu (worker)')
+        parser.add_argument('--intervalle', type=float, default=5.0, help='Pause quand la file est vide (secondes)')
+
+    def handle(self, *args, **options):
+        total = {'envoyes': 0, 'reessais': 0, 'echecs': 0}
+
+        while True:
+            bilan = traiter_file(
+                taille_lot=options['lot'],
+                workers=options['workers'],
+                max_tentatives=options['max_tentatives'],
+                delai_base=options['delai'],
+            )
+            for cle, valeur in bilan.items():
+                total[cle] += valeur
+
+            if any(bilan.values()):
+                self.stdout.write(
+                    f"📧 {bilan['envoyes']} envoyé(s), {bilan['reessais']} à réessayer, {bilan['echecs']} en échec"
+                )
+            elif not options['boucle']:
+                break
+            else:
+                time.sleep(options['intervalle'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"\n✅ File traitée: {total['envoyes']} envoyé(s), "
+            f"{total['reessais']} à réessayer, {total['echecs']} en échec\n"
+        ))
@@ -0,0 +1,35 @@
+"""
+Management command pour recalculer les suggestions de réapprovisionnement.
+Usage: python manage.py planifier_reapprovisionnement [--jours 90] [--service 0.95] [--cout-commande 50] [--taux-possession 0.25]
+
+À lancer périodiquement (cron, par exemple chaque nuit) : les suggestions
+précédentes sont remplacées (voir stock.reapprovisionnement).
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from stock.reapprovisionnement import planifier
+
+
+class Command(BaseCommand):
+    help = 'Calcule les commandes fournisseurs suggérées (point de commande, quantité économique, meilleur fournisseur)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jours', type=int, default=90, help='Historique de demande pris en compte (jours)')
+        parser.add_argument('--service', type=float, default=0.95, help='Niveau de service visé (probabilité de ne pas rompre)')
+        parser.add_argument('--cout-commande', type=float, default=50.0, help='Coût fixe d\'une commande fournisseur (€)')
+        parser.add_argument('--taux-possession', type=float, default=0.25, help='Coût de possession annuel (fraction du prix)')
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+        nombre = planifier(
+            jours=options['jours'],
+            niveau_service=options['service'],
+            cout_commande=options['cout_commande'],
+            taux_possession=options['taux_possession'],
+        )
+        duree = time.perf_counter() - debut
+
+        self.stdout.write(self.style.SUCCESS(f'\n✅ {nombre} suggestion(s) de réapprovisionnement en {duree:.2f}s\n'))
@@ -0,0 +1,25 @@
+"""
+Management command pour prendre un instantané du stock de chaque produit.
+Usage: python manage.py prendre_instantanes
+
+À lancer périodiquement (cron, par exemple chaque nuit) : le stock à une
+date se calcule depuis le dernier instantané, seuls les mouvements suivants
+sont additionnés (voir stock.mouvements).
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from stock.mouvements import prendre_instantanes
+
+
+class Command(BaseCommand):
+    help = 'Prend un instantané du stock des produits qui ont bougé depuis le précédent'
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+        nombre = prendre_instantanes()
+        duree = time.perf_counter() - debut
+
+        self.stdout.write(self.style.SUCCESS(f'\n✅ {nombre} instantané(s) de stock pris en {duree:.2f}s\n'))
@@ -0,0 +1,31 @@
+"""
+Management command pour recalculer les prévisions de demande.
+Usage: python manage.py prevoir_demande [--incremental] [--jours 1095] [--lot 2000]
+
+À lancer périodiquement : un calcul complet chaque nuit, et si besoin
+`--incremental` dans la journée pour ne recalculer que les produits ayant
+reçu de nouvelles commandes (voir stock.previsions).
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from stock.previsions import prevoir
+
+
+class Command(BaseCommand):
+    help = 'Prévoit la demande journalière et les jours avant rupture de chaque produit'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--incremental', action='store_true', help='Seulement les produits ayant de nouvelles commandes')
+        parser.add_argument('--jours', type=int, default=3 * 365, help='Historique pris en compte (jours)')
+        parser.add_argument('--lot', type=int, default=2000, help='Produits traités par lot')
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+        nombre = prevoir(jours=options['jours'], incremental=options['incremental'], taille_lot=options['lot'])
+        duree = time.perf_counter() - debut
+
+        mode = 'incrémental' if options['incremental'] else 'complet'
+        self.stdout.write(self.style.SUCCESS(f'\n✅ {nombre} prévision(s) recalculée(s) ({mode}) en {duree:.2f}s\n'))
@@ -0,0 +1,27 @@
+"""
+Management command pour supprimer les notifications traitées anciennes.
+Usage: python manage.py purger_notifications [--jours 90] [--lot 5000]
+
+Les notifications non traitées ne sont jamais supprimées. La suppression
+se fait par lots (une transaction par lot) pour ne pas bloquer la table.
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from stock.models import Notification
+
+
+class Command(BaseCommand):
+    help = 'Supprime les notifications traitées depuis plus de --jours jours'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jours', type=int, default=90, help='Rétention des notifications traitées (jours)')
+        parser.add_argument('--lot', type=int, default=5000, help='Lignes supprimées par transaction')
+
+    def handle(self, *args, **options):
+        avant = timezone.now() - timedelta(days=options['jours'])
+        nombre = Notification.objects.purger(avant, taille_lot=options['lot'])
+        self.stdout.write(self.style.SUCCESS(f'\n✅ {nombre} notification(s) traitée(s) supprimée(s)\n'))
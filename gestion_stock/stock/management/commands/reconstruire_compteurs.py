@@ -0,0 +1,26 @@
+"""
+Management command pour recalculer les compteurs de notifications.
+Usage: python manage.py reconstruire_compteurs
+
+Les compteurs non lues / non traitées sont tenus à jour par incréments ;
+cette commande les reconstruit depuis les notifications (après une
+correction par queryset.update(), ou une fois après la migration qui crée
+la table).
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from stock.compteurs import reconstruire
+
+
+class Command(BaseCommand):
+    help = 'Reconstruit les compteurs de notifications non lues / non traitées'
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+        lignes = reconstruire()
+        duree = time.perf_counter() - debut
+
+        self.stdout.write(self.style.SUCCESS(f'\n✅ {lignes} ligne(s) de compteurs reconstruite(s) en {duree:.2f}s\n'))
@@ -0,0 +1,26 @@
+"""
+Management command pour recalculer les tables d'agrégats statistiques.
+Usage: python manage.py reconstruire_statistiques
+
+Les agrégats sont tenus à jour par incréments ; cette commande les
+reconstruit depuis Commande et Facture (après un import, une correction
+par queryset.update(), un changement de prix, ou une fois après la
+migration qui crée la table).
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from stock.statistiques import reconstruire
+
+
+class Command(BaseCommand):
+    help = 'Reconstruit les statistiques journalières depuis les commandes et factures'
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+        lignes = reconstruire()
+        duree = time.perf_counter() - debut
+
+        self.stdout.write(self.style.SUCCESS(f'\n✅ {lignes} ligne(s) de statistiques reconstruite(s) en {duree:.2f}s\n'))
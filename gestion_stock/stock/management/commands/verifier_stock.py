@@ -0,0 +1,34 @@
+"""
+Management command pour contrôler Produit.quantite contre le journal du stock.
+Usage: python manage.py verifier_stock [--corriger]
+
+Produit.quantite est un cache du journal (MouvementStock) : un écart
+signale une écriture qui a contourné stock.reservations ou save(). Avec
+--corriger, le cache est réaligné sur la somme de tout le journal (pas sur
+les instantanés).
+"""
+
+from django.core.management.base import BaseCommand
+
+from stock.mouvements import reconcilier
+
+
+class Command(BaseCommand):
+    help = 'Vérifie que la quantité de chaque produit correspond au journal du stock'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corriger', action='store_true', help='Réaligne Produit.quantite sur le journal')
+
+    def handle(self, *args, **options):
+        ecarts = reconcilier(corriger=options['corriger'])
+
+        for produit_id, quantite, quantite_journal in ecarts:
+            self.stdout.write(self.style.WARNING(
+                f'⚠️ Produit #{produit_id}: quantité {quantite}, journal {quantite_journal} ({quantite_journal - quantite:+})'
+            ))
+        if not ecarts:
+            self.stdout.write(self.style.SUCCESS('\n✅ Stock conforme au journal\n'))
+        elif options['corriger']:
+            self.stdout.write(self.style.SUCCESS(f'\n✅ {len(ecarts)} produit(s) réaligné(s) sur le journal\n'))
+        else:
+            self.stdout.write(self.style.ERROR(f'\n❌ {len(ecarts)} écart(s) (relancer avec --corriger)\n'))
@@ -0,0 +1,201 @@
+"""
+Managers et QuerySets personnalisés des modèles de stock.
+
+Suppression logique (Produit, Commande, Facture) : le manager par défaut
+`objects` ne retourne que les lignes actives (is_deleted=False), ce qui vaut
+aussi pour les relations inverses (produit.commandes, prefetch_related...).
+`archives` ne retourne que les lignes supprimées et `all_objects` toutes les
+lignes (admin, reconstruction des statistiques). Les méthodes
+`supprimer_logique()` / `restaurer()` du QuerySet archivent ou restaurent un
+lot en un seul UPDATE ; `changer_statut()` fait de même pour le statut d'un
+lot de factures.
+
+Le montant d'une commande (quantite_cmd × prix_unit du produit) est calculé
+en base : `with_montant()` l'annote sur chaque ligne et `total_montant()`
+fait la somme en une requête, sans charger les commandes ni leurs produits.
+
+Notifications : `marquer_lues()` / `marquer_traitees()` mettent à jour un lot
+(drapeau et date) en un seul UPDATE, `purger()` supprime par lots les
+notifications traitées anciennes. Chaque opération en lot (et delete())
+retire d'abord ses lignes des compteurs non lues / non traitées
+(stock.compteurs), par une requête groupée.
+"""
+
+from django.db import models, transaction
+from django.db.models import ExpressionWrapper, F, FloatField, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def expression_montant(prefixe=''):
+    """
+    Expression SQL du montant d'une commande.
+
+    `prefixe` permet de l'utiliser depuis un autre modèle, par exemple
+    expression_montant('commandes__') sur Produit ou 'lignes__' sur Panier.
+    """
+    return ExpressionWrapper(
+        F(f'{prefixe}quantite_cmd') * F(f'{prefixe}code_prod__prix_unit'),
+        output_field=FloatField(),
+    )
+
+
+# ---------- Suppression logique ----------
+
+class SoftDeleteQuerySet(models.QuerySet):
+    """QuerySet des modèles à suppression logique (champ is_deleted)."""
+
+    def actifs(self):
+        return self.filter(is_deleted=False)
+
+    def supprimes(self):
+        return self.filter(is_deleted=True)
+
+    def supprimer_logique(self):
+        """Archive les lignes actives du QuerySet (un UPDATE) ; retourne leur nombre."""
+        return self._changer_etat(self.actifs(), True)
+
+    def restaurer(self):
+        """Restaure les lignes archivées du QuerySet (un UPDATE) ; retourne leur nombre."""
+        return self._changer_etat(self.supprimes(), False)
+
+    def _changer_etat(self, lignes, is_deleted):
+        with transaction.atomic():
+            self._avant_changement(lignes, signe=-1 if is_deleted else 1)
+            return lignes.update(is_deleted=is_deleted)
+
+    def _avant_changement(self, lignes, signe):
+        """
+        Appelé avant l'UPDATE d'un lot : `signe` vaut -1 pour des lignes qui
+        vont être archivées, +1 pour des lignes qui vont être restaurées.
+        """
+
+
+class SoftDeleteManager(models.Manager):
+    """Manager par défaut : lignes actives seulement."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
+class ArchivesManager(models.Manager):
+    """Lignes supprimées logiquement seulement."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=True)
+
+
+# ---------- Commandes et factures ----------
+
+class StatistiquesQuerySet(SoftDeleteQuerySet):
+    """Archivage / restauration en lot répercutés sur les agrégats StatistiqueJournaliere."""
+
+    def _avant_changement(self, lignes, signe):
+        from . import statistiques
+
+        statistiques.ajuster(lignes, signe)
+
+
+class CommandeQuerySet(StatistiquesQuerySet):
+    """QuerySet des commandes avec les montants calculés en base."""
+
+    def with_montant(self):
+        """Annote chaque commande avec `montant` (quantite_cmd × prix_unit)."""
+        return self.annotate(montant=expression_montant())
+
+    def total_montant(self):
+        """Somme des montants des commandes (une requête, 0.0 si aucune)."""
+        return self.aggregate(
+            total=Coalesce(Sum(expression_montant()), Value(0.0))
+        )['total']
+
+    async def atotal_montant(self):
+        """Variante asynchrone de total_montant()."""
+        return (await self.aaggregate(
+            total=Coalesce(Sum(expression_montant()), Value(0.0))
+        ))['total']
+
+
+class FactureQuerySet(StatistiquesQuerySet):
+    """QuerySet des factures."""
+
+    def changer_statut(self, statut):
+        """
+        Passe les factures actives du QuerySet au `statut` (un UPDATE),
+        répercuté sur les agrégats ; retourne le nombre de factures modifiées.
+        """
+        from . import statistiques
+
+        if statut not in dict(self.model.STATUT_CHOICES):
+            raise ValueError(f'Statut de facture invalide : {statut}')
+        with transaction.atomic():
+            ids = list(self.actifs().exclude(statut=statut).values_list('pk', flat=True))
+            lignes = self.model.all_objects.filter(pk__in=ids)
+            statistiques.ajuster(lignes, -1)
+            nombre = lignes.update(statut=statut)
+            statistiques.ajuster(lignes, 1)
+            return nombre
+
+
+# ---------- Notifications ----------
+
+class NotificationQuerySet(models.QuerySet):
+    """Opérations en lot sur les notifications (un UPDATE / DELETE par appel)."""
+
+    def marquer_lues(self):
+        """Marque comme lues les notifications non lues ; retourne leur nombre."""
+        from . import compteurs
+
+        with transaction.atomic():
+            lignes = self.filter(est_lue=False)
+            compteurs.ajuster(lignes, champs=['non_lues'])
+            return lignes.update(est_lue=True, date_lecture=timezone.now())
+
+    def marquer_traitees(self):
+        """Marque comme traitées les notifications non traitées ; retourne leur nombre."""
+        from . import compteurs
+
+        with transaction.atomic():
+            lignes = self.filter(est_traitee=False)
+            compteurs.ajuster(lignes, champs=['non_traitees'])
+            return lignes.update(est_traitee=True, date_traitement=timezone.now())
+
+    def delete(self):
+        """Supprime les notifications du QuerySet et les retire des compteurs."""
+        from . import compteurs
+
+        with transaction.atomic():
+            compteurs.ajuster(self)
+            return super().delete()
+
+    def purger(self, avant, taille_lot=5000):
+        """
+        Supprime les notifications traitées avant `avant`, par lots (une
+        transaction par lot). Retourne le nombre de lignes supprimées.
+        """
+        anciennes = self.filter(est_traitee=True, date_traitement__lt=avant)
+        total = 0
+        while True:
+            with transaction.atomic():
+                ids = list(anciennes.order_by('pk').values_list('pk', flat=True)[:taille_lot])
+                if not ids:
+                    return total
+                supprimees, _ = self.model.objects.filter(pk__in=ids).delete()
+            total += supprimees
+            if len(ids) < taille_lot:
+                return total
+
+
+ProduitManager = SoftDeleteManager.from_queryset(SoftDeleteQuerySet)
+ProduitArchivesManager = ArchivesManager.from_queryset(SoftDeleteQuerySet)
+ProduitToutManager = models.Manager.from_queryset(SoftDeleteQuerySet)
+
+CommandeManager = SoftDeleteManager.from_queryset(CommandeQuerySet)
+CommandeArchivesManager = ArchivesManager.from_queryset(CommandeQuerySet)
+CommandeToutManager = models.Manager.from_queryset(CommandeQuerySet)
+
+FactureManager = SoftDeleteManager.from_queryset(FactureQuerySet)
+FactureArchivesManager = ArchivesManager.from_queryset(FactureQuerySet)
+FactureToutManager = models.Manager.from_queryset(FactureQuerySet)
+
+NotificationManager = models.Manager.from_queryset(NotificationQuerySet)
@@ -0,0 +1,294 @@
+"""
+Métriques de l'application : compteurs, jauges et histogrammes en mémoire,
+exposés au format texte Prometheus par /stock/metriques/.
+
+Les métriques sont déclarées au niveau du module (voir la fin du fichier)
+et mises à jour sur les chemins chauds :
+- commandes créées (receiver post_save et paniers) et résultat de
+  passer_commande_view ;
+- réservations de stock réussies / insuffisantes (stock.reservations) ;
+- notifications et factures créées ;
+- envois d'emails de la file (durée et résultat, stock.emails) ;
+- connexions (utilisateurs et fournisseurs) ;
+- durée des vues par nom d'URL (stock.instrumentation) ;
+- abonnés au flux en direct (stock.evenements).
+
+Une mise à jour est une addition dans un dictionnaire sous verrou : rien
+n'est écrit en base, sur disque ni sur le réseau pendant la requête.
+
+Plusieurs processus (workers gunicorn, commande envoyer_emails) : avec
+STOCK_METRIQUES_DOSSIER, chaque processus écrit ses valeurs dans
+<dossier>/<pid>.json toutes les STOCK_METRIQUES_INTERVALLE secondes, depuis
+un thread démon démarré à sa première mise à jour (après un fork, le
+processus enfant démarre le sien), et à sa sortie. L'exposition additionne
+les fichiers de tous les processus (les compteurs des processus terminés
+restent acquis ; les jauges ne comptent que les processus vivants). Le dossier doit être vidé au
+démarrage du serveur. Sans dossier, seul le processus qui répond est exposé.
+"""
+
+import atexit
+import bisect
+import contextlib
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+
+_registre = {}
+_verrou = threading.Lock()
+_derniere_ecriture = 0.0
+_ecrivain_pid = None
+
+DUREES = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+# ---------- Métriques ----------
+
+class Metrique:
+    """Métrique nommée, avec des valeurs par combinaison d'étiquettes."""
+
+    type_metrique = None
+
+    def __init__(self, nom, aide, etiquettes=()):
+        self.nom = nom
+        self.aide = aide
+        self.etiquettes = tuple(etiquettes)
+        self.valeurs = {}
+        _registre[nom] = self
+
+    def cle(self, etiquettes):
+        if set(etiquettes) != set(self.etiquettes):
+            raise ValueError(f'{self.nom} : étiquettes attendues {self.etiquettes}, reçues {tuple(etiquettes)}')
+        return tuple(str(etiquettes[nom]) for nom in self.etiquettes)
+
+    def _modifier(self, fonction, etiquettes):
+        cle = self.cle(etiquettes)
+        with _verrou:
+            self.valeurs[cle] = fonction(self.valeurs.get(cle))
+        if _ecrivain_pid != os.getpid() and dossier():
+            demarrer_ecrivain()
+
+    def instantane(self):
+        """Valeurs sérialisables : [[étiquettes, valeur]]."""
+        with _verrou:
+            return [[list(cle), valeur] for cle, valeur in self.valeurs.items()]
+
+
+class Compteur(Metrique):
+    """Valeur qui ne fait qu'augmenter (événements)."""
+
+    type_metrique = 'counter'
+
+    def inc(self, valeur=1, **etiquettes):
+        self._modifier(lambda actuelle: (actuelle or 0) + valeur, etiquettes)
+
+
+class Jauge(Metrique):
+    """Valeur instantanée (additionnée entre les processus vivants)."""
+
+    type_metrique = 'gauge'
+
+    def inc(self, valeur=1, **etiquettes):
+        self._modifier(lambda actuelle: (actuelle or 0) + valeur, etiquettes)
+
+    def dec(self, valeur=1, **etiquettes):
+        self.inc(-valeur, **etiquettes)
+
+    def set(self, valeur, **etiquettes):
+        self._modifier(lambda actuelle: valeur, etiquettes)
+
+
+class Histogramme(Metrique):
+    """
+    Répartition d'observations dans des intervalles fixes (`limites`).
+
+    La valeur d'une combinaison d'étiquettes est [compte par intervalle
+    (le dernier pour +Inf), somme, nombre].
+    """
+
+    type_metrique = 'histogram'
+
+    def __init__(self, nom, aide, etiquettes=(), limites=DUREES):
+        super().__init__(nom, aide, etiquettes)
+        self.limites = tuple(limites)
+
+    def observe(self, valeur, **etiquettes):
+        indice = bisect.bisect_left(self.limites, valeur)
+
+        def ajouter(actuelle):
+            if actuelle is None:
+                actuelle = [0] * (len(self.limites) + 1) + [0.0, 0]
+            actuelle[indice] += 1
+            actuelle[-2] += valeur
+            actuelle[-1] += 1
+            return actuelle
+
+        self._modifier(ajouter, etiquettes)
+
+    @contextlib.contextmanager
+    def chronometre(self, **etiquettes):
+        """Observe la durée du bloc (en secondes) ; les étiquettes peuvent être complétées dans le bloc."""
+        debut = time.perf_counter()
+        try:
+            yield etiquettes
+        finally:
+            self.observe(time.perf_counter() - debut, **etiquettes)
+
+    def instantane(self):
+        with _verrou:
+            return [[list(cle), list(valeur)] for cle, valeur in self.valeurs.items()]
+
+
+# ---------- Processus multiples ----------
+
+def dossier():
+    """Dossier partagé des fichiers de métriques par processus, ou None."""
+    return getattr(settings, 'STOCK_METRIQUES_DOSSIER', None)
+
+
+def instantane():
+    """Valeurs de toutes les métriques de ce processus (sérialisables en JSON)."""
+    return {nom: metrique.instantane() for nom, metrique in _registre.items()}
+
+
+def intervalle():
+    """Délai entre deux écritures des valeurs de ce processus (secondes)."""
+    return getattr(settings, 'STOCK_METRIQUES_INTERVALLE', 5)
+
+
+def sauvegarder():
+    """Écrit les valeurs de ce processus dans <dossier>/<pid>.json (écriture atomique)."""
+    global _derniere_ecriture
+    if not dossier():
+        return
+    with _verrou:
+        _derniere_ecriture = time.monotonic()
+    chemin = os.path.join(dossier(), f'{os.getpid()}.json')
+    temporaire = f'{chemin}.{threading.get_ident()}.tmp'
+    os.makedirs(dossier(), exist_ok=True)
+    with open(temporaire, 'w') as fichier:
+        json.dump(instantane(), fichier)
+    os.replace(temporaire, chemin)
+
+
+def sauvegarder_si_necessaire():
+    """Sauvegarde si la dernière écriture date de plus de STOCK_METRIQUES_INTERVALLE secondes."""
+    with _verrou:
+        ecoule = time.monotonic() - _derniere_ecriture
+    if dossier() and ecoule >= intervalle():
+        sauvegarder()
+
+
+def _ecrire_periodiquement():
+    while True:
+        time.sleep(intervalle())
+        try:
+            sauvegarder_si_necessaire()
+        except OSError:
+            pass  # Dossier indisponible : nouvel essai à l'intervalle suivant
+
+
+def demarrer_ecrivain():
+    """Démarre, une fois par processus, le thread démon qui écrit les valeurs périodiquement."""
+    global _ecrivain_pid
+    with _verrou:
+        if _ecrivain_pid == os.getpid():
+            return
+        _ecrivain_pid = os.getpid()
+    threading.Thread(target=_ecrire_periodiquement, name='stock-metriques', daemon=True).start()
+
+
+atexit.register(sauvegarder)
+
+
+def _processus_vivant(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def instantanes_processus():
+    """[(pid, valeurs, vivant)] de tous les processus : ce processus en direct, les autres depuis le dossier."""
+    resultats = [(os.getpid(), instantane(), True)]
+    if not dossier() or not os.path.isdir(dossier()):
+        return resultats
+    for nom_fichier in os.listdir(dossier()):
+        pid, extension = os.path.splitext(nom_fichier)
+        if extension != '.json' or not pid.isdigit() or int(pid) == os.getpid():
+            continue
+        try:
+            with open(os.path.join(dossier(), nom_fichier)) as fichier:
+                valeurs = json.load(fichier)
+        except (OSError, ValueError):
+            continue
+        resultats.append((int(pid), valeurs, _processus_vivant(int(pid))))
+    return resultats
+
+
+def fusionner():
+    """Valeurs additionnées de tous les processus : {nom: {étiquettes: valeur}}."""
+    totaux = {nom: {} for nom in _registre}
+    for _, valeurs, vivant in instantanes_processus():
+        for nom, lignes in valeurs.items():
+            metrique = _registre.get(nom)
+            if metrique is None or (metrique.type_metrique == 'gauge' and not vivant):
+                continue
+            for etiquettes, valeur in lignes:
+                cle = tuple(etiquettes)
+                actuelle = totaux[nom].get(cle)
+                if actuelle is None:
+                    totaux[nom][cle] = valeur
+                elif isinstance(valeur, list):
+                    totaux[nom][cle] = [a + b for a, b in zip(actuelle, valeur)]
+                else:
+                    totaux[nom][cle] = actuelle + valeur
+    return totaux
+
+
+# ---------- Exposition ----------
+
+def _etiquettes(noms, valeurs, **autres):
+    paires = [*zip(noms, valeurs), *autres.items()]
+    if not paires:
+        return ''
+    echapper = lambda texte: texte.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{nom}="{echapper(valeur)}"' for nom, valeur in paires) + '}'
+
+
+def exposition():
+    """Texte au format Prometheus (version 0.0.4) des métriques de tous les processus."""
+    lignes = []
+    for nom, valeurs in fusionner().items():
+        metrique = _registre[nom]
+        lignes.append(f'# HELP {nom} {metrique.aide}')
+        lignes.append(f'# TYPE {nom} {metrique.type_metrique}')
+        for cle, valeur in sorted(valeurs.items()):
+            if metrique.type_metrique != 'histogram':
+                lignes.append(f'{nom}{_etiquettes(metrique.etiquettes, cle)} {valeur}')
+                continue
+            cumul = 0
+            for limite, compte in zip([*metrique.limites, '+Inf'], valeur):
+                cumul += compte
+                lignes.append(f'{nom}_bucket{_etiquettes(metrique.etiquettes, cle, le=str(limite))} {cumul}')
+            lignes.append(f'{nom}_sum{_etiquettes(metrique.etiquettes, cle)} {valeur[-2]}')
+            lignes.append(f'{nom}_count{_etiquettes(metrique.etiquettes, cle)} {valeur[-1]}')
+    return '\n'.join(lignes) + '\n'
+
+
+# ---------- Métriques de l'application ----------
+
+COMMANDES = Compteur('stock_commandes_total', 'Commandes créées', ['origine'])
+PASSER_COMMANDE = Compteur('stock_passer_commande_total', 'Résultats de passer_commande_view', ['resultat'])
+RESERVATIONS = Compteur('stock_reservations_total', 'Réservations de stock', ['resultat'])
+NOTIFICATIONS = Compteur('stock_notifications_total', 'Notifications créées', ['type'])
+FACTURES = Compteur('stock_factures_total', 'Factures créées automatiquement')
+EMAILS = Histogramme('stock_email_envoi_secondes', "Durée d'envoi des emails de la file", ['resultat'])
+CONNEXIONS = Compteur('stock_connexions_total', 'Tentatives de connexion', ['espace', 'resultat'])
+VUES = Histogramme('stock_vue_secondes', 'Durée des requêtes HTTP par nom d\'URL', ['vue'])
+ABONNES_FLUX = Jauge('stock_flux_abonnes', 'Abonnés connectés au flux en direct')
@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-18 09:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0012_panier'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailSortant',
+            fields=[
+                ('code_email', models.AutoField(primary_key=True, serialize=False)),
+                ('destinataire', models.EmailField(max_length=254)),
+                ('sujet', models.CharField(max_length=255)),
+                ('message', models.TextField()),
+                ('statut', models.CharField(choices=[('en_attente', 'En Attente'), ('en_cours', "En Cours d'Envoi"), ('envoye', 'Envoyé'), ('echec', 'Échec')], default='en_attente', max_length=20)),
+                ('tentatives', models.IntegerField(default=0)),
+                ('prochaine_tentative', models.DateTimeField(default=django.utils.timezone.now)),
+                ('jeton', models.CharField(blank=True, max_length=32, null=True)),
+                ('derniere_erreur', models.TextField(blank=True, null=True)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_envoi', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Emails Sortants',
+                'ordering': ['date_creation'],
+                'indexes': [models.Index(fields=['statut', 'prochaine_tentative'], name='stock_email_statut_3a3c0e_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0.1 on 2026-10-18 10:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0013_emailsortant'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MouvementMontantAgent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('montant', models.FloatField()),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('agent_utilisateur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mouvements_montant', to=settings.AUTH_USER_MODEL)),
+                ('commande', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='mouvements_montant', to='stock.commande')),
+            ],
+            options={
+                'verbose_name_plural': 'Mouvements Montants Agents',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['agent_utilisateur', 'id'], name='stock_mouve_agent_u_a11900_idx')],
+            },
+        ),
+    ]
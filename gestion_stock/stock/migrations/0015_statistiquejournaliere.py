@@ -0,0 +1,42 @@
+# Generated by Django 6.0.1 on 2026-10-18 10:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0014_mouvementmontantagent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatistiqueJournaliere',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField()),
+                ('nb_commandes', models.IntegerField(default=0)),
+                ('quantite_commandee', models.IntegerField(default=0)),
+                ('montant_commandes', models.FloatField(default=0.0)),
+                ('nb_factures_brouillon', models.IntegerField(default=0)),
+                ('nb_factures_validee', models.IntegerField(default=0)),
+                ('nb_factures_payee', models.IntegerField(default=0)),
+                ('nb_factures_annulee', models.IntegerField(default=0)),
+                ('montant_factures_brouillon', models.FloatField(default=0.0)),
+                ('montant_factures_validee', models.FloatField(default=0.0)),
+                ('montant_factures_payee', models.FloatField(default=0.0)),
+                ('montant_factures_annulee', models.FloatField(default=0.0)),
+                ('agent_utilisateur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='statistiques', to=settings.AUTH_USER_MODEL)),
+                ('fournisseur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='statistiques', to='stock.fournisseur')),
+                ('produit', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='statistiques', to='stock.produit')),
+            ],
+            options={
+                'verbose_name_plural': 'Statistiques Journalières',
+                'ordering': ['-jour'],
+                'indexes': [models.Index(fields=['jour', 'produit', 'fournisseur', 'agent_utilisateur'], name='stock_stati_jour_e17e31_idx'), models.Index(fields=['fournisseur', 'jour'], name='stock_stati_fournis_456b18_idx'), models.Index(fields=['agent_utilisateur', 'jour'], name='stock_stati_agent_u_8afe21_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0015_statistiquejournaliere'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['date_commande', 'code_cmd'], name='stock_comma_date_co_d8160e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='facture',
+            index=models.Index(fields=['date_facture', 'code_facture'], name='stock_factu_date_fa_b4b173_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historique',
+            index=models.Index(fields=['date_suppression', 'id'], name='stock_histo_date_su_077891_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produit',
+            index=models.Index(fields=['nom_prod', 'code_prod'], name='stock_produ_nom_pro_911250_idx'),
+        ),
+    ]
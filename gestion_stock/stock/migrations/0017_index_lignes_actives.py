@@ -0,0 +1,43 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0016_index_pagination_curseur'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['agent_utilisateur', 'date_commande'], name='commande_active_agent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['code_prod', 'date_commande'], name='commande_active_prod_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='facture',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['agent_utilisateur', 'date_facture'], name='facture_active_agent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='facture',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['statut', 'date_facture'], name='facture_active_statut_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produit',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['fournisseur', 'nom_prod'], name='produit_actif_fourn_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produit',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['quantite'], name='produit_actif_qte_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produitfournisseur',
+            index=models.Index(fields=['produit', '-is_principal', 'prix_fournisseur'], name='pf_produit_principal_idx'),
+        ),
+    ]
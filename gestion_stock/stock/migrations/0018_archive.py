@@ -0,0 +1,31 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:40
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0017_index_lignes_actives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Archive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type_objet', models.CharField(choices=[('produit', 'Produit'), ('commande', 'Commande'), ('facture', 'Facture'), ('historique', 'Historique')], max_length=20)),
+                ('id_objet', models.IntegerField()),
+                ('donnees', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('date_reference', models.DateTimeField()),
+                ('date_archivage', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Archives',
+                'ordering': ['-date_reference'],
+                'indexes': [models.Index(fields=['type_objet', 'date_reference'], name='stock_archi_type_ob_fde5f8_idx')],
+                'constraints': [models.UniqueConstraint(fields=('type_objet', 'id_objet'), name='archive_objet_unique')],
+            },
+        ),
+    ]
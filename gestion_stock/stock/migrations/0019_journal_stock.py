@@ -0,0 +1,56 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:15
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def ouvrir_journal(apps, schema_editor):
+    """Un mouvement initial par produit existant : le journal part du stock actuel."""
+    Produit = apps.get_model('stock', 'Produit')
+    MouvementStock = apps.get_model('stock', 'MouvementStock')
+    MouvementStock.objects.bulk_create([
+        MouvementStock(produit_id=produit_id, delta=quantite, motif='initial')
+        for produit_id, quantite in Produit.objects.exclude(quantite=0).values_list('code_prod', 'quantite')
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0018_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstantaneStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_instantane', models.DateTimeField(default=django.utils.timezone.now)),
+                ('quantite', models.IntegerField()),
+                ('dernier_mouvement_id', models.BigIntegerField(default=0)),
+                ('produit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='instantanes_stock', to='stock.produit')),
+            ],
+            options={
+                'verbose_name_plural': 'Instantanés de Stock',
+                'ordering': ['-date_instantane'],
+                'indexes': [models.Index(fields=['produit', 'date_instantane'], name='stock_insta_produit_e14621_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MouvementStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField()),
+                ('motif', models.CharField(choices=[('initial', 'Stock initial'), ('commande', 'Commande'), ('liberation', 'Libération (annulation de commande)'), ('ajustement', 'Ajustement manuel')], max_length=20)),
+                ('date_mouvement', models.DateTimeField(default=django.utils.timezone.now)),
+                ('produit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mouvements_stock', to='stock.produit')),
+            ],
+            options={
+                'verbose_name_plural': 'Mouvements de Stock',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['produit', 'date_mouvement'], name='stock_mouve_produit_7e0b62_idx'), models.Index(fields=['produit', 'id'], name='stock_mouve_produit_6ae4a6_idx')],
+            },
+        ),
+        migrations.RunPython(ouvrir_journal, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0019_journal_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SuggestionReapprovisionnement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock_actuel', models.IntegerField()),
+                ('demande_journaliere', models.FloatField()),
+                ('stock_securite', models.FloatField()),
+                ('point_commande', models.FloatField()),
+                ('quantite_economique', models.IntegerField()),
+                ('quantite_suggeree', models.IntegerField()),
+                ('prix_fournisseur', models.FloatField()),
+                ('delai_livraison', models.IntegerField()),
+                ('cout_annuel', models.FloatField()),
+                ('date_calcul', models.DateTimeField(auto_now_add=True)),
+                ('fournisseur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='suggestions_reappro', to='stock.fournisseur')),
+                ('produit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='suggestions_reappro', to='stock.produit')),
+            ],
+            options={
+                'verbose_name_plural': 'Suggestions de Réapprovisionnement',
+                'ordering': ['produit'],
+                'indexes': [models.Index(fields=['fournisseur', 'produit'], name='stock_sugge_fournis_69c280_idx')],
+            },
+        ),
+    ]
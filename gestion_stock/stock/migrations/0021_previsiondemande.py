@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-18 14:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0020_suggestionreapprovisionnement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrevisionDemande',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('methode', models.CharField(choices=[('moyenne_mobile', 'Moyenne mobile'), ('lissage', 'Lissage exponentiel'), ('croston', 'Croston (demande intermittente)')], max_length=20)),
+                ('demande_journaliere', models.FloatField()),
+                ('erreur', models.FloatField()),
+                ('stock_actuel', models.IntegerField()),
+                ('jours_avant_rupture', models.FloatField(blank=True, null=True)),
+                ('derniere_commande', models.BigIntegerField(default=0)),
+                ('date_calcul', models.DateTimeField(auto_now=True)),
+                ('produit', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='prevision', to='stock.produit')),
+            ],
+            options={
+                'verbose_name_plural': 'Prévisions de Demande',
+                'ordering': ['jours_avant_rupture'],
+                'indexes': [models.Index(fields=['jours_avant_rupture'], name='stock_previ_jours_a_8ed98c_idx')],
+            },
+        ),
+    ]
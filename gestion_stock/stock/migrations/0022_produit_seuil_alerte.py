@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0021_previsiondemande'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produit',
+            name='seuil_alerte',
+            field=models.IntegerField(default=10, help_text='Alerte « stock bas » quand le stock passe sous ce seuil'),
+        ),
+    ]
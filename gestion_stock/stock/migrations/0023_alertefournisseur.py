@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-18 15:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0022_produit_seuil_alerte'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlerteFournisseur',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantite_suggeree', models.IntegerField()),
+                ('prix_fournisseur', models.FloatField()),
+                ('delai_livraison', models.IntegerField()),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_envoi', models.DateTimeField(blank=True, null=True)),
+                ('fournisseur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alertes_digest', to='stock.fournisseur')),
+                ('produit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alertes_fournisseurs', to='stock.produit')),
+            ],
+            options={
+                'verbose_name_plural': 'Alertes Fournisseurs',
+                'ordering': ['-date_creation'],
+                'indexes': [models.Index(fields=['fournisseur', 'date_envoi'], name='stock_alert_fournis_2bfcf3_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('date_envoi__isnull', True)), fields=('fournisseur', 'produit'), name='alerte_fournisseur_attente_unique')],
+            },
+        ),
+    ]
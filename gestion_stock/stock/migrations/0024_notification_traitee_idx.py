@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-18 16:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0023_alertefournisseur'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('est_traitee', True)), fields=['date_traitement'], name='notification_traitee_idx'),
+        ),
+    ]
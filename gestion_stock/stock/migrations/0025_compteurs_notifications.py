@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-18 16:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0024_notification_traitee_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompteurNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type_notification', models.CharField(choices=[('rupture', 'Rupture de Stock'), ('alerte_basse', 'Stock Bas'), ('commande_confirmee', 'Commande Confirmée'), ('facture_payee', 'Facture Payée'), ('fournisseur_contact', 'Fournisseur Contacté')], max_length=20)),
+                ('non_lues', models.IntegerField(default=0)),
+                ('non_traitees', models.IntegerField(default=0)),
+                ('destinataire', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='compteurs_notifications', to='stock.fournisseur')),
+                ('fournisseur_produit', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='compteurs_produits', to='stock.fournisseur')),
+            ],
+            options={
+                'verbose_name_plural': 'Compteurs de Notifications',
+                'indexes': [models.Index(fields=['type_notification', 'fournisseur_produit', 'destinataire'], name='stock_compt_type_no_c913d3_idx')],
+            },
+        ),
+    ]
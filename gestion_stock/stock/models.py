@@ -5,11 +5,26 @@ Ce module définit les modèles pour gérer les produits, commandes, factures
 et leur historique (soft delete avec is_deleted).
 """
 
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
 from django.utils import timezone
-from django.db.models import Sum
+from django.db.models import Sum, F
 from django.contrib.auth.models import User
 
+from .managers import (
+    ProduitManager, ProduitArchivesManager, ProduitToutManager,
+    CommandeManager, CommandeArchivesManager, CommandeToutManager,
+    FactureManager, FactureArchivesManager, FactureToutManager,
+    NotificationManager,
+)
+
+# Condition des index partiels : la quasi-totalité des requêtes ne lit que les
+# lignes non supprimées. Sur les bases sans index partiels (MySQL/MariaDB),
+# Django ne crée pas ces index ; ceux de la pagination par curseur restent
+# donc des index complets, créés partout.
+LIGNES_ACTIVES = models.Q(is_deleted=False)
+
 
 class Produit(models.Model):
     """
@@ -21,6 +36,7 @@ class Produit(models.Model):
         description (str): Description détaillée du produit
         quantite (int): Quantité disponible en stock
         prix_unit (float): Prix unitaire du produit
+        seuil_alerte (int): Stock en dessous duquel une alerte « stock bas » est émise
         photo (ImageField): Photo du produit
         date_creation (datetime): Date de création du produit
         is_deleted (bool): Marqueur pour soft delete (historique)
@@ -31,6 +47,7 @@ class Produit(models.Model):
     description = models.TextField(blank=True, null=True)
     quantite = models.IntegerField(default=0)
     prix_unit = models.FloatField()
+    seuil_alerte = models.IntegerField(default=10, help_text="Alerte « stock bas » quand le stock passe sous ce seuil")
     photo = models.ImageField(
         upload_to='produits/%Y/%m/%d/',
         blank=True,
@@ -42,10 +59,21 @@ class Produit(models.Model):
     is_deleted = models.BooleanField(default=False)  # Soft delete pour historique
     fournisseur = models.ForeignKey('Fournisseur', on_delete=models.SET_NULL, null=True, blank=True, related_name='produits_fournis')
     
+    objects = ProduitManager()  # Produits actifs (manager par défaut)
+    archives = ProduitArchivesManager()  # Produits supprimés logiquement
+    all_objects = ProduitToutManager()  # Tous les produits
+    
     class Meta:
         ordering = ['nom_prod']  # Affichage alphabétique
         verbose_name_plural = "Produits"
         unique_together = ('fournisseur', 'nom_prod')  # Même nom possible pour différents fournisseurs
+        indexes = [
+            models.Index(fields=['nom_prod', 'code_prod']),  # Pagination par curseur
+            # Produits d'un fournisseur, par nom
+            models.Index(fields=['fournisseur', 'nom_prod'], condition=LIGNES_ACTIVES, name='produit_actif_fourn_idx'),
+            # Stock critique / ruptures (quantite__lt=10, quantite=0)
+            models.Index(fields=['quantite'], condition=LIGNES_ACTIVES, name='produit_actif_qte_idx'),
+        ]
     
     def __str__(self):
         return f"{self.nom_prod} (Quantité: {self.quantite})"
@@ -67,6 +95,52 @@ class Produit(models.Model):
         """Restaure un produit supprimé logiquement."""
         self.is_deleted = False
         self.save()
+    
+    def validate_unique(self, exclude=None):
+        """
+        Vérifie aussi l'unicité (fournisseur, nom_prod) parmi les produits
+        archivés, que le manager par défaut ignore.
+        """
+        super().validate_unique(exclude=exclude)
+        exclude = exclude or set()
+        if self.fournisseur_id is None or 'fournisseur' in exclude or 'nom_prod' in exclude:
+            return
+        doublons = Produit.archives.filter(fournisseur_id=self.fournisseur_id, nom_prod=self.nom_prod)
+        if self.pk is not None:
+            doublons = doublons.exclude(pk=self.pk)
+        if doublons.exists():
+            raise ValidationError({'nom_prod': "Un produit archivé de ce fournisseur porte déjà ce nom."})
+
+
+class Panier(models.Model):
+    """
+    Modèle représentant un panier (en-tête de commande multi-produits).
+    
+    Chaque ligne du panier est une Commande rattachée via `panier`.
+    Le panier est validé en une seule transaction et reçoit une seule facture.
+    
+    Attributs:
+        code_panier (int): Identifiant unique du panier
+        agent_utilisateur (FK): Agent qui a passé le panier
+        date_creation (datetime): Date de validation du panier
+        is_deleted (bool): Marqueur pour soft delete (historique)
+    """
+    
+    code_panier = models.AutoField(primary_key=True)
+    agent_utilisateur = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='paniers')
+    date_creation = models.DateTimeField(auto_now_add=True)
+    is_deleted = models.BooleanField(default=False)  # Soft delete pour historique
+    
+    class Meta:
+        ordering = ['-date_creation']
+        verbose_name_plural = "Paniers"
+    
+    def __str__(self):
+        return f"Panier #{self.code_panier}"
+    
+    def montant_panier(self):
+        """Calcule le montant total des lignes du panier."""
+        return self.lignes.total_montant()
 
 
 class Commande(models.Model):
@@ -78,6 +152,7 @@ class Commande(models.Model):
         code_prod (FK): Référence au produit commandé
         quantite_cmd (int): Quantité commandée
         agent_utilisateur (FK): Utilisateur qui a créé la commande
+        panier (FK): Panier dont la commande est une ligne (optionnel)
         statut_paiement (str): État du paiement (en attente, payée)
         paiement_confirme (bool): Si le fournisseur a confirmé le paiement
         date_paiement (datetime): Date du paiement confirmé
@@ -94,21 +169,38 @@ class Commande(models.Model):
     code_prod = models.ForeignKey(Produit, on_delete=models.PROTECT, related_name='commandes')
     quantite_cmd = models.IntegerField(default=1)
     agent_utilisateur = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='commandes')
+    panier = models.ForeignKey(Panier, on_delete=models.PROTECT, null=True, blank=True, related_name='lignes')
     statut_paiement = models.CharField(max_length=20, choices=STATUT_PAIEMENT_CHOICES, default='en_attente')
     paiement_confirme = models.BooleanField(default=False, help_text="Confirmé par le fournisseur")
     date_paiement = models.DateTimeField(null=True, blank=True, help_text="Date du paiement confirmé")
     date_commande = models.DateTimeField(auto_now_add=True)
     is_deleted = models.BooleanField(default=False)  # Soft delete pour historique
     
+    objects = CommandeManager()  # Commandes actives (manager par défaut)
+    archives = CommandeArchivesManager()  # Commandes supprimées logiquement
+    all_objects = CommandeToutManager()  # Toutes les commandes
+    
     class Meta:
         ordering = ['-date_commande']  # Les plus récentes d'abord
         verbose_name_plural = "Commandes"
+        indexes = [
+            models.Index(fields=['date_commande', 'code_cmd']),  # Pagination par curseur
+            # Commandes d'un agent (dashboard agent), par date
+            models.Index(fields=['agent_utilisateur', 'date_commande'], condition=LIGNES_ACTIVES, name='commande_active_agent_idx'),
+            # Commandes des produits d'un fournisseur
+            models.Index(fields=['code_prod', 'date_commande'], condition=LIGNES_ACTIVES, name='commande_active_prod_idx'),
+        ]
     
     def __str__(self):
         return f"Commande #{self.code_cmd} - {self.code_prod.nom_prod} (x{self.quantite_cmd})"
     
     def montant_commande(self):
-        """Calcule le montant total de la commande."""
+        """
+        Calcule le montant total de la commande.
+        
+        Pour une liste ou un total, préférer Commande.objects.with_montant() /
+        total_montant() qui calculent le montant en base.
+        """
         return self.quantite_cmd * self.code_prod.prix_unit
     
     def supprimer_logique(self):
@@ -137,6 +229,7 @@ class Facture(models.Model):
     Attributs:
         code_facture (int): Identifiant unique de la facture
         commande (FK): Référence à la commande associée
+        panier (FK): Référence au panier associé (facture groupée)
         montant_total (float): Montant total de la facture
         agent_utilisateur (FK): Agent qui a créé la commande
         date_facture (datetime): Date de création de la facture
@@ -153,6 +246,7 @@ class Facture(models.Model):
     
     code_facture = models.AutoField(primary_key=True)
     commande = models.OneToOneField(Commande, on_delete=models.SET_NULL, null=True, blank=True, related_name='facture')
+    panier = models.OneToOneField(Panier, on_delete=models.SET_NULL, null=True, blank=True, related_name='facture')
     montant_total = models.FloatField()
     agent_utilisateur = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='factures')
     date_facture = models.DateTimeField(auto_now_add=True)
@@ -160,9 +254,20 @@ class Facture(models.Model):
     statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='brouillon')
     is_deleted = models.BooleanField(default=False)  # Soft delete pour historique
     
+    objects = FactureManager()  # Factures actives (manager par défaut)
+    archives = FactureArchivesManager()  # Factures supprimées logiquement
+    all_objects = FactureToutManager()  # Toutes les factures
+    
     class Meta:
         ordering = ['-date_facture']  # Les plus récentes d'abord
         verbose_name_plural = "Factures"
+        indexes = [
+            models.Index(fields=['date_facture', 'code_facture']),  # Pagination par curseur
+            # Factures d'un agent, par date
+            models.Index(fields=['agent_utilisateur', 'date_facture'], condition=LIGNES_ACTIVES, name='facture_active_agent_idx'),
+            # Factures par statut (payées / impayées)
+            models.Index(fields=['statut', 'date_facture'], condition=LIGNES_ACTIVES, name='facture_active_statut_idx'),
+        ]
     
     def __str__(self):
         return f"Facture #{self.code_facture} - {self.montant_total}€ ({self.statut})"
@@ -225,6 +330,7 @@ class Historique(models.Model):
         verbose_name_plural = "Historiques"
         indexes = [
             models.Index(fields=['type_objet', 'date_suppression']),
+            models.Index(fields=['date_suppression', 'id']),  # Pagination par curseur
         ]
     
     def __str__(self):
@@ -293,6 +399,10 @@ class ProduitFournisseur(models.Model):
         unique_together = ['produit', 'fournisseur']
         ordering = ['-is_principal', 'prix_fournisseur']
         verbose_name_plural = "Produits-Fournisseurs"
+        indexes = [
+            # Fournisseurs d'un produit, principal d'abord (contact en cas de rupture)
+            models.Index(fields=['produit', '-is_principal', 'prix_fournisseur'], name='pf_produit_principal_idx'),
+        ]
     
     def __str__(self):
         return f"{self.produit.nom_prod} - {self.fournisseur.nom_fournisseur}"
@@ -335,12 +445,16 @@ class Notification(models.Model):
     date_lecture = models.DateTimeField(null=True, blank=True)
     date_traitement = models.DateTimeField(null=True, blank=True)
     
+    objects = NotificationManager()  # marquer_lues(), marquer_traitees(), purger()
+    
     class Meta:
         ordering = ['-date_creation']
         verbose_name_plural = "Notifications"
         indexes = [
             models.Index(fields=['est_lue', 'est_traitee']),
             models.Index(fields=['-date_creation']),
+            # Purge des notifications traitées (`purger_notifications`)
+            models.Index(fields=['date_traitement'], condition=models.Q(est_traitee=True), name='notification_traitee_idx'),
         ]
     
     def __str__(self):
@@ -351,24 +465,76 @@ class Notification(models.Model):
         if not self.est_lue:
             self.est_lue = True
             self.date_lecture = timezone.now()
-            self.save()
+            self.save(update_fields=['est_lue', 'date_lecture'])
     
     def marquer_comme_traitee(self):
         """Marque la notification comme traitée."""
         if not self.est_traitee:
             self.est_traitee = True
             self.date_traitement = timezone.now()
-            self.save()
+            self.save(update_fields=['est_traitee', 'date_traitement'])
+
+    def delete(self, *args, **kwargs):
+        """
+        Supprime la notification et la retire des compteurs (stock.compteurs),
+        d'après son état en base.
+        """
+        from . import compteurs
+
+        with transaction.atomic():
+            compteurs.ajuster(Notification.objects.filter(pk=self.pk))
+            return super().delete(*args, **kwargs)
+
+
+class CompteurNotification(models.Model):
+    """
+    Nombre de notifications non lues / non traitées (type × fournisseur du
+    produit × fournisseur destinataire).
+    
+    Tenu à jour par incréments (voir stock.compteurs) et reconstructible
+    avec `python manage.py reconstruire_compteurs`. Les badges additionnent
+    ces lignes au lieu de compter les notifications. Plusieurs lignes
+    peuvent exister pour une même clé : les lectures font toujours une somme.
+    
+    Attributs:
+        type_notification (str): Type des notifications comptées
+        fournisseur_produit (FK): Fournisseur du produit concerné
+        destinataire (FK): Fournisseur destinataire de la notification
+        non_lues (int): Notifications non lues
+        non_traitees (int): Notifications non traitées
+    """
+    
+    type_notification = models.CharField(max_length=20, choices=Notification.TYPE_CHOICES)
+    fournisseur_produit = models.ForeignKey(Fournisseur, on_delete=models.SET_NULL, null=True, blank=True, related_name='compteurs_produits')
+    destinataire = models.ForeignKey(Fournisseur, on_delete=models.SET_NULL, null=True, blank=True, related_name='compteurs_notifications')
+    non_lues = models.IntegerField(default=0)
+    non_traitees = models.IntegerField(default=0)
+    
+    class Meta:
+        verbose_name_plural = "Compteurs de Notifications"
+        indexes = [
+            models.Index(fields=['type_notification', 'fournisseur_produit', 'destinataire']),
+        ]
+    
+    def __str__(self):
+        return f"{self.type_notification}: {self.non_lues} non lue(s), {self.non_traitees} non traitée(s)"
 
 
 class MontantAgent(models.Model):
     """
     Modèle pour tracker le montant total accumulé par agent.
     
+    Le montant est un instantané : les nouvelles commandes n'y touchent pas,
+    elles ajoutent une ligne MouvementMontantAgent (insertion seule, donc pas
+    de contention sur cette ligne). La commande `compacter_montants` replie
+    périodiquement les mouvements dans l'instantané ; les lectures passent par
+    montant_pour() / montants_pour() qui ajoutent les mouvements pas encore
+    compactés.
+    
     Attributs:
         agent_utilisateur (FK): L'agent (utilisateur Django)
-        montant_total (float): Montant cumulé de toutes ses commandes payées
-        date_mise_a_jour (datetime): Dernière mise à jour du montant
+        montant_total (float): Montant cumulé compacté
+        date_mise_a_jour (datetime): Dernière compaction
     """
     
     agent_utilisateur = models.OneToOneField(User, on_delete=models.CASCADE, related_name='montant_commandes')
@@ -382,11 +548,448 @@ class MontantAgent(models.Model):
         return f"{self.agent_utilisateur.username} - {self.montant_total}€"
     
     def ajouter_montant(self, montant):
-        """Ajoute un montant au total de l'agent."""
-        self.montant_total += montant
-        self.save()
+        """Ajoute un montant au total de l'agent (mouvement du journal)."""
+        MouvementMontantAgent.objects.create(agent_utilisateur_id=self.agent_utilisateur_id, montant=montant)
     
     def retirer_montant(self, montant):
-        """Retire un montant du total de l'agent."""
-        self.montant_total = max(0, self.montant_total - montant)
-        self.save()
+        """Retire un montant du total de l'agent (mouvement du journal)."""
+        MouvementMontantAgent.objects.create(agent_utilisateur_id=self.agent_utilisateur_id, montant=-montant)
+    
+    def montant_courant(self):
+        """Montant à jour : instantané + mouvements non compactés."""
+        return MontantAgent.montant_pour(self.agent_utilisateur_id)
+    
+    @staticmethod
+    def montant_pour(agent_id):
+        """Montant à jour d'un agent (2 requêtes, quel que soit l'historique)."""
+        return MontantAgent.montants_pour([agent_id]).get(agent_id, 0.0)
+    
+    @staticmethod
+    def montants_pour(agent_ids):
+        """Montants à jour de plusieurs agents : {agent_id: montant}."""
+        agent_ids = list(agent_ids)
+        montants = dict.fromkeys(agent_ids, 0.0)
+        for agent_id, montant in MontantAgent.objects.filter(
+            agent_utilisateur_id__in=agent_ids
+        ).values_list('agent_utilisateur_id', 'montant_total'):
+            montants[agent_id] += montant
+        for agent_id, montant in MouvementMontantAgent.objects.filter(
+            agent_utilisateur_id__in=agent_ids
+        ).values('agent_utilisateur_id').annotate(total=Sum('montant')).values_list('agent_utilisateur_id', 'total'):
+            montants[agent_id] += montant
+        return {agent_id: max(0.0, montant) for agent_id, montant in montants.items()}
+    
+    @staticmethod
+    def compacter(agent_id, taille_lot=10000):
+        """
+        Replie jusqu'à `taille_lot` mouvements de l'agent dans l'instantané.
+        
+        Seuls les mouvements effectivement additionnés sont supprimés : un
+        mouvement inséré pendant la compaction reste dans le journal.
+        Retourne le nombre de mouvements compactés.
+        """
+        with transaction.atomic():
+            mouvements = list(
+                MouvementMontantAgent.objects.filter(agent_utilisateur_id=agent_id)
+                .order_by('id').values_list('id', 'montant')[:taille_lot]
+            )
+            if not mouvements:
+                return 0
+            total = sum(montant for _, montant in mouvements)
+            instantane, _ = MontantAgent.objects.get_or_create(agent_utilisateur_id=agent_id)
+            MontantAgent.objects.filter(pk=instantane.pk).update(
+                montant_total=F('montant_total') + total,
+                date_mise_a_jour=timezone.now(),
+            )
+            MouvementMontantAgent.objects.filter(id__in=[id_ for id_, _ in mouvements]).delete()
+        return len(mouvements)
+
+
+class MouvementMontantAgent(models.Model):
+    """
+    Variation du montant cumulé d'un agent (journal en insertion seule).
+    
+    Attributs:
+        agent_utilisateur (FK): L'agent concerné
+        montant (float): Variation (positive pour une commande)
+        commande (FK): Commande à l'origine du mouvement (optionnel)
+        date_creation (datetime): Date du mouvement
+    """
+    
+    agent_utilisateur = models.ForeignKey(User, on_delete=models.CASCADE, related_name='mouvements_montant')
+    montant = models.FloatField()
+    commande = models.ForeignKey(Commande, on_delete=models.SET_NULL, null=True, blank=True, related_name='mouvements_montant')
+    date_creation = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['id']
+        verbose_name_plural = "Mouvements Montants Agents"
+        indexes = [
+            models.Index(fields=['agent_utilisateur', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.agent_utilisateur_id}: {self.montant:+}€"
+
+
+# ==================== JOURNAL DU STOCK ====================
+
+class MouvementStock(models.Model):
+    """
+    Variation du stock d'un produit (journal en insertion seule).
+    
+    Produit.quantite est un cache de ce journal : chaque réservation,
+    libération ou modification de la quantité ajoute un mouvement (voir
+    stock.mouvements). `python manage.py verifier_stock` contrôle que le
+    cache et le journal concordent.
+    
+    Attributs:
+        produit (FK): Le produit concerné
+        delta (int): Variation de la quantité (négative pour une commande)
+        motif (str): Origine du mouvement
+        date_mouvement (datetime): Date du mouvement
+    """
+    
+    MOTIF_CHOICES = [
+        ('initial', 'Stock initial'),
+        ('commande', 'Commande'),
+        ('liberation', 'Libération (annulation de commande)'),
+        ('ajustement', 'Ajustement manuel'),
+    ]
+    
+    produit = models.ForeignKey(Produit, on_delete=models.CASCADE, related_name='mouvements_stock')
+    delta = models.IntegerField()
+    motif = models.CharField(max_length=20, choices=MOTIF_CHOICES)
+    date_mouvement = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['id']
+        verbose_name_plural = "Mouvements de Stock"
+        indexes = [
+            models.Index(fields=['produit', 'date_mouvement']),
+            models.Index(fields=['produit', 'id']),  # Mouvements postérieurs à un instantané
+        ]
+    
+    def __str__(self):
+        return f"Produit {self.produit_id}: {self.delta:+} ({self.motif})"
+
+
+class InstantaneStock(models.Model):
+    """
+    Stock d'un produit à une date, pris périodiquement (`prendre_instantanes`).
+    
+    Le stock à une date T est celui du dernier instantané antérieur à T plus
+    les mouvements qui le suivent (id > dernier_mouvement_id) jusqu'à T.
+    
+    Attributs:
+        produit (FK): Le produit concerné
+        date_instantane (datetime): Date de l'instantané
+        quantite (int): Stock après le mouvement dernier_mouvement_id
+        dernier_mouvement_id (int): Dernier mouvement compté (0 si aucun)
+    """
+    
+    produit = models.ForeignKey(Produit, on_delete=models.CASCADE, related_name='instantanes_stock')
+    date_instantane = models.DateTimeField(default=timezone.now)
+    quantite = models.IntegerField()
+    dernier_mouvement_id = models.BigIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-date_instantane']
+        verbose_name_plural = "Instantanés de Stock"
+        indexes = [
+            models.Index(fields=['produit', 'date_instantane']),
+        ]
+    
+    def __str__(self):
+        return f"Produit {self.produit_id}: {self.quantite} au {self.date_instantane}"
+
+
+# ==================== RÉAPPROVISIONNEMENT ====================
+
+class SuggestionReapprovisionnement(models.Model):
+    """
+    Commande fournisseur suggérée pour un produit (`planifier_reapprovisionnement`).
+    
+    Recalculées en bloc par stock.reapprovisionnement à partir de la demande
+    récente (StatistiqueJournaliere) et des conditions des fournisseurs
+    (ProduitFournisseur).
+    
+    Attributs:
+        produit (FK): Produit à réapprovisionner
+        fournisseur (FK): Fournisseur retenu (coût annuel le plus bas)
+        stock_actuel (int): Stock au moment du calcul
+        demande_journaliere (float): Demande moyenne (unités / jour)
+        stock_securite (float): Stock de sécurité pour le niveau de service visé
+        point_commande (float): Seuil de commande (demande pendant le délai + sécurité)
+        quantite_economique (int): Quantité économique (formule de Wilson)
+        quantite_suggeree (int): Quantité à commander
+        prix_fournisseur (float): Prix unitaire du fournisseur retenu
+        delai_livraison (int): Délai du fournisseur retenu (jours)
+        cout_annuel (float): Coût annuel estimé (achat, commandes, possession)
+        date_calcul (datetime): Date du calcul
+    """
+    
+    produit = models.ForeignKey(Produit, on_delete=models.CASCADE, related_name='suggestions_reappro')
+    fournisseur = models.ForeignKey(Fournisseur, on_delete=models.SET_NULL, null=True, blank=True, related_name='suggestions_reappro')
+    stock_actuel = models.IntegerField()
+    demande_journaliere = models.FloatField()
+    stock_securite = models.FloatField()
+    point_commande = models.FloatField()
+    quantite_economique = models.IntegerField()
+    quantite_suggeree = models.IntegerField()
+    prix_fournisseur = models.FloatField()
+    delai_livraison = models.IntegerField()
+    cout_annuel = models.FloatField()
+    date_calcul = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['produit']
+        verbose_name_plural = "Suggestions de Réapprovisionnement"
+        indexes = [
+            models.Index(fields=['fournisseur', 'produit']),
+        ]
+    
+    def __str__(self):
+        return f"{self.produit_id}: commander {self.quantite_suggeree} (fournisseur {self.fournisseur_id})"
+
+
+class PrevisionDemande(models.Model):
+    """
+    Prévision de la demande d'un produit (`prevoir_demande`).
+
+    Calculée par stock.previsions sur la série journalière des quantités
+    commandées : la méthode retenue est celle dont l'erreur est la plus
+    faible sur les derniers jours de l'historique.
+
+    Attributs:
+        produit (FK): Produit concerné (une prévision par produit)
+        methode (str): Méthode retenue (moyenne mobile, lissage, Croston)
+        demande_journaliere (float): Demande prévue (unités / jour)
+        erreur (float): Erreur absolue moyenne de la méthode sur la période de test
+        stock_actuel (int): Stock au moment du calcul
+        jours_avant_rupture (float): Stock / demande prévue (vide sans demande)
+        derniere_commande (int): Plus grand code_cmd existant lors du calcul
+        date_calcul (datetime): Date du calcul
+    """
+
+    METHODE_CHOICES = [
+        ('moyenne_mobile', 'Moyenne mobile'),
+        ('lissage', 'Lissage exponentiel'),
+        ('croston', 'Croston (demande intermittente)'),
+    ]
+
+    produit = models.OneToOneField(Produit, on_delete=models.CASCADE, related_name='prevision')
+    methode = models.CharField(max_length=20, choices=METHODE_CHOICES)
+    demande_journaliere = models.FloatField()
+    erreur = models.FloatField()
+    stock_actuel = models.IntegerField()
+    jours_avant_rupture = models.FloatField(null=True, blank=True)
+    derniere_commande = models.BigIntegerField(default=0)
+    date_calcul = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['jours_avant_rupture']
+        verbose_name_plural = "Prévisions de Demande"
+        indexes = [
+            # Produits bientôt en rupture (dashboard)
+            models.Index(fields=['jours_avant_rupture']),
+        ]
+
+    def __str__(self):
+        return f"{self.produit_id}: {self.demande_journaliere:.2f}/jour ({self.get_methode_display()})"
+
+
+class AlerteFournisseur(models.Model):
+    """
+    Rupture à signaler à un fournisseur dans son prochain digest (`envoyer_digests`).
+
+    Une ligne par fournisseur et par produit en attente (contrainte
+    partielle) : une nouvelle rupture du même produit avant l'envoi ne crée
+    rien de plus. Voir stock.digests.
+
+    Attributs:
+        fournisseur (FK): Fournisseur à contacter
+        produit (FK): Produit en rupture
+        quantite_suggeree (int): Quantité minimale de commande chez ce fournisseur
+        prix_fournisseur (float): Prix d'achat chez ce fournisseur
+        delai_livraison (int): Délai de livraison (jours)
+        date_creation (datetime): Date de la rupture
+        date_envoi (datetime): Date du digest qui l'a signalée (vide si en attente)
+    """
+
+    fournisseur = models.ForeignKey(Fournisseur, on_delete=models.CASCADE, related_name='alertes_digest')
+    produit = models.ForeignKey(Produit, on_delete=models.CASCADE, related_name='alertes_fournisseurs')
+    quantite_suggeree = models.IntegerField()
+    prix_fournisseur = models.FloatField()
+    delai_livraison = models.IntegerField()
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_envoi = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-date_creation']
+        verbose_name_plural = "Alertes Fournisseurs"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['fournisseur', 'produit'],
+                condition=models.Q(date_envoi__isnull=True),
+                name='alerte_fournisseur_attente_unique',
+            ),
+        ]
+        indexes = [
+            # Alertes en attente / dernier digest d'un fournisseur
+            models.Index(fields=['fournisseur', 'date_envoi']),
+        ]
+
+    def __str__(self):
+        return f"{self.fournisseur_id} ← {self.produit_id} ({'envoyée' if self.date_envoi else 'en attente'})"
+
+
+# ==================== FILE D'ENVOI DES EMAILS (OUTBOX) ====================
+
+class EmailSortant(models.Model):
+    """
+    Email en attente d'envoi (outbox transactionnelle).
+    
+    Les emails sont écrits dans la même transaction que la commande qui les
+    déclenche, puis envoyés par la commande `envoyer_emails` : un serveur SMTP
+    lent n'ajoute donc aucune latence au passage de commande.
+    
+    Attributs:
+        destinataire (str): Adresse email du destinataire
+        sujet (str): Sujet de l'email
+        message (str): Corps de l'email
+        statut (str): État de l'envoi (en attente, en cours, envoyé, échec)
+        tentatives (int): Nombre de tentatives d'envoi déjà faites
+        prochaine_tentative (datetime): Date à partir de laquelle l'email peut être (re)pris
+        jeton (str): Identifiant du lot d'envoi qui a réservé l'email
+        derniere_erreur (str): Dernière erreur SMTP rencontrée
+        date_creation (datetime): Date de mise en file
+        date_envoi (datetime): Date d'envoi effectif
+    """
+    
+    STATUT_CHOICES = [
+        ('en_attente', 'En Attente'),
+        ('en_cours', "En Cours d'Envoi"),
+        ('envoye', 'Envoyé'),
+        ('echec', 'Échec'),
+    ]
+    
+    code_email = models.AutoField(primary_key=True)
+    destinataire = models.EmailField()
+    sujet = models.CharField(max_length=255)
+    message = models.TextField()
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='en_attente')
+    tentatives = models.IntegerField(default=0)
+    prochaine_tentative = models.DateTimeField(default=timezone.now)
+    jeton = models.CharField(max_length=32, blank=True, null=True)
+    derniere_erreur = models.TextField(blank=True, null=True)
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_envoi = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['date_creation']
+        verbose_name_plural = "Emails Sortants"
+        indexes = [
+            models.Index(fields=['statut', 'prochaine_tentative']),
+        ]
+    
+    def __str__(self):
+        return f"Email #{self.code_email} → {self.destinataire} ({self.statut})"
+
+
+# ==================== STATISTIQUES (TABLES D'AGRÉGATS) ====================
+
+class StatistiqueJournaliere(models.Model):
+    """
+    Agrégat journalier des commandes et factures (jour × produit × fournisseur × agent).
+    
+    Tenu à jour par incréments (voir stock.statistiques) et reconstructible
+    avec `python manage.py reconstruire_statistiques`. Les tableaux de bord
+    additionnent ces lignes au lieu de parcourir tout l'historique. Plusieurs
+    lignes peuvent exister pour une même clé : les lectures font toujours
+    une somme.
+    
+    Attributs:
+        jour (date): Jour de la commande / de la facture
+        produit (FK): Produit concerné (vide pour une facture de panier)
+        fournisseur (FK): Fournisseur du produit
+        agent_utilisateur (FK): Agent de la commande / de la facture
+        nb_commandes, quantite_commandee, montant_commandes: Commandes actives
+        nb_factures_<statut>, montant_factures_<statut>: Factures actives par statut
+    """
+    
+    jour = models.DateField()
+    produit = models.ForeignKey(Produit, on_delete=models.CASCADE, null=True, blank=True, related_name='statistiques')
+    fournisseur = models.ForeignKey(Fournisseur, on_delete=models.SET_NULL, null=True, blank=True, related_name='statistiques')
+    agent_utilisateur = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='statistiques')
+    
+    nb_commandes = models.IntegerField(default=0)
+    quantite_commandee = models.IntegerField(default=0)
+    montant_commandes = models.FloatField(default=0.0)
+    
+    nb_factures_brouillon = models.IntegerField(default=0)
+    nb_factures_validee = models.IntegerField(default=0)
+    nb_factures_payee = models.IntegerField(default=0)
+    nb_factures_annulee = models.IntegerField(default=0)
+    montant_factures_brouillon = models.FloatField(default=0.0)
+    montant_factures_validee = models.FloatField(default=0.0)
+    montant_factures_payee = models.FloatField(default=0.0)
+    montant_factures_annulee = models.FloatField(default=0.0)
+    
+    class Meta:
+        ordering = ['-jour']
+        verbose_name_plural = "Statistiques Journalières"
+        indexes = [
+            models.Index(fields=['jour', 'produit', 'fournisseur', 'agent_utilisateur']),
+            models.Index(fields=['fournisseur', 'jour']),
+            models.Index(fields=['agent_utilisateur', 'jour']),
+        ]
+    
+    def __str__(self):
+        return f"{self.jour} - produit {self.produit_id} - {self.nb_commandes} commande(s)"
+
+
+# ==================== ARCHIVES (STOCKAGE FROID) ====================
+
+class Archive(models.Model):
+    """
+    Ligne déplacée hors des tables principales par `python manage.py archiver`.
+    
+    Les produits, commandes et factures supprimés logiquement et les entrées
+    d'Historique plus anciens que la durée de rétention sont copiés ici
+    (champs sérialisés en JSON) puis supprimés de leur table. Recherche et
+    restauration : voir stock.archivage.
+    
+    Attributs:
+        type_objet (str): Type de la ligne archivée (produit, commande, facture, historique)
+        id_objet (int): Clé primaire d'origine
+        donnees (JSON): Champs de la ligne (format du sérialiseur 'python' de Django)
+        date_reference (datetime): Date utilisée pour la rétention
+        date_archivage (datetime): Date du déplacement
+    """
+    
+    TYPE_CHOICES = [
+        ('produit', 'Produit'),
+        ('commande', 'Commande'),
+        ('facture', 'Facture'),
+        ('historique', 'Historique'),
+    ]
+    
+    type_objet = models.CharField(max_length=20, choices=TYPE_CHOICES)
+    id_objet = models.IntegerField()
+    donnees = models.JSONField(encoder=DjangoJSONEncoder)
+    date_reference = models.DateTimeField()
+    date_archivage = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-date_reference']
+        verbose_name_plural = "Archives"
+        constraints = [
+            models.UniqueConstraint(fields=['type_objet', 'id_objet'], name='archive_objet_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['type_objet', 'date_reference']),
+        ]
+    
+    def __str__(self):
+        return f"{self.type_objet.upper()} #{self.id_objet} archivé le {self.date_archivage}"
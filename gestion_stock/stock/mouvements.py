@@ -0,0 +1,173 @@
+"""
+Journal du stock (MouvementStock) et stock à une date.
+
+Produit.quantite reste la valeur lue par l'application, mais c'est un cache
+du journal :
+- les réservations et libérations (stock.reservations) ajoutent leurs
+  mouvements dans la transaction de l'UPDATE conditionnel ;
+- une modification de la quantité par save() (formulaires, admin, espace
+  fournisseur) ajoute un mouvement d'ajustement (signaux de stock.signals).
+
+Chaque mouvement publie aussi, au commit, le nouveau stock du produit sur le
+flux d'événements en direct (stock.evenements), s'il a des abonnés.
+
+`stock_a(produit_id, date)` lit le dernier instantané antérieur à la date
+(index produit, date_instantane) puis additionne les mouvements qui le
+suivent (index produit, id) : le coût dépend de l'intervalle entre deux
+instantanés, pas de la longueur du journal.
+
+`prendre_instantanes()` (commande `prendre_instantanes`, à lancer
+périodiquement) et `reconcilier()` (commande `verifier_stock`) traitent
+tous les produits en une requête groupée.
+
+Un instantané ne compte que les mouvements plus anciens que
+STOCK_MARGE_INSTANTANES secondes : l'ordre des id n'est pas l'ordre des
+commits, et un mouvement d'id inférieur validé après l'instantané serait
+sinon ignoré pour toujours (les lectures ne prennent que id > instantané).
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Produit, MouvementStock, InstantaneStock
+from . import evenements
+
+
+def enregistrer(deltas, motif):
+    """Ajoute un mouvement par produit ({produit_id: delta}) ; les deltas nuls sont ignorés."""
+    mouvements = [
+        MouvementStock(produit_id=produit_id, delta=delta, motif=motif)
+        for produit_id, delta in deltas.items()
+        if delta
+    ]
+    if mouvements:
+        MouvementStock.objects.bulk_create(mouvements)
+        produit_ids = [mouvement.produit_id for mouvement in mouvements]
+        evenements.publier_apres_commit(lambda: evenements.evenements_stock(produit_ids))
+
+
+# ---------- Stock à une date ----------
+
+def stock_a(produit_id, date):
+    """Stock du produit à `date` : dernier instantané antérieur + mouvements suivants."""
+    instantane = (
+        InstantaneStock.objects
+        .filter(produit_id=produit_id, date_instantane__lte=date)
+        .order_by('-date_instantane', '-id')
+        .first()
+    )
+    quantite, depuis = (instantane.quantite, instantane.dernier_mouvement_id) if instantane else (0, 0)
+    queue = MouvementStock.objects.filter(
+        produit_id=produit_id, id__gt=depuis, date_mouvement__lte=date
+    ).aggregate(total=Sum('delta'))['total']
+    return quantite + (queue or 0)
+
+
+def annoter_journal(queryset=None, jusqua_mouvement=None):
+    """
+    Annote chaque produit avec `quantite_journal` (stock selon le journal :
+    dernier instantané + mouvements suivants, jusqu'au mouvement
+    `jusqua_mouvement` inclus si fourni) et `instantane_mouvement`.
+    """
+    if queryset is None:
+        queryset = Produit.all_objects.all()
+    instantanes = InstantaneStock.objects.filter(produit=OuterRef('pk')).order_by('-date_instantane', '-id')
+    queryset = queryset.annotate(
+        instantane_quantite=Coalesce(Subquery(instantanes.values('quantite')[:1]), Value(0)),
+        instantane_mouvement=Coalesce(Subquery(instantanes.values('dernier_mouvement_id')[:1]), Value(0)),
+    )
+    queue = MouvementStock.objects.filter(produit=OuterRef('pk'), id__gt=OuterRef('instantane_mouvement'))
+    if jusqua_mouvement is not None:
+        queue = queue.filter(id__lte=jusqua_mouvement)
+    total_queue = queue.order_by().values('produit').annotate(total=Sum('delta')).values('total')
+    return queryset.annotate(
+        quantite_journal=F('instantane_quantite') + Coalesce(Subquery(total_queue), Value(0)),
+        mouvements_recents=Exists(queue),
+    )
+
+
+# ---------- Tâches périodiques ----------
+
+def marge():
+    """Âge minimal des mouvements comptés dans un instantané (secondes)."""
+    return getattr(settings, 'STOCK_MARGE_INSTANTANES', 300)
+
+
+def prendre_instantanes():
+    """
+    Prend un instantané de chaque produit qui a bougé depuis son dernier
+    instantané. Retourne le nombre d'instantanés créés.
+
+    Les mouvements sont bornés par le plus grand id des mouvements datant de
+    plus de `marge()` secondes : les transactions plus courtes que la marge
+    ont toutes été validées, aucun mouvement d'id inférieur ne peut encore
+    apparaître. L'instantané est daté de cette borne.
+    """
+    with transaction.atomic():
+        maintenant = timezone.now() - timedelta(seconds=marge())
+        dernier = MouvementStock.objects.filter(date_mouvement__lt=maintenant).aggregate(dernier=Max('id'))['dernier']
+        if dernier is None:
+            return 0
+        produits = (
+            annoter_journal(jusqua_mouvement=dernier)
+            .filter(mouvements_recents=True)
+            .values_list('pk', 'quantite_journal')
+        )
+        instantanes = InstantaneStock.objects.bulk_create([
+            InstantaneStock(
+                produit_id=produit_id,
+                date_instantane=maintenant,
+                quantite=quantite,
+                dernier_mouvement_id=dernier,
+            )
+            for produit_id, quantite in produits
+        ], batch_size=1000)
+    return len(instantanes)
+
+
+def reconcilier(corriger=False):
+    """
+    Compare Produit.quantite au journal, en une requête.
+
+    Retourne la liste des écarts (produit_id, quantite, quantite_journal).
+
+    Avec `corriger`, les produits en écart sont verrouillés (une réservation
+    concurrente attend) et leur quantité est réalignée sur la somme de tout
+    leur journal, sans passer par les instantanés : un instantané erroné ne
+    peut pas être recopié dans le cache. Seuls les écarts confirmés par le
+    journal complet sont alors retournés.
+    """
+    ecarts = list(
+        annoter_journal()
+        .exclude(quantite=F('quantite_journal'))
+        .order_by('pk')
+        .values_list('pk', 'quantite', 'quantite_journal')
+    )
+    if not corriger or not ecarts:
+        return ecarts
+
+    produit_ids = [produit_id for produit_id, _, _ in ecarts]
+    with transaction.atomic():
+        quantites = (
+            Produit.all_objects.select_for_update()
+            .filter(pk__in=produit_ids)
+            .order_by('pk')
+            .values_list('pk', 'quantite')
+        )
+        journal = dict(
+            MouvementStock.objects.filter(produit_id__in=produit_ids)
+            .order_by().values('produit').annotate(total=Sum('delta'))
+            .values_list('produit', 'total')
+        )
+        ecarts = []
+        for produit_id, quantite in quantites:
+            quantite_journal = journal.get(produit_id, 0)
+            if quantite != quantite_journal:
+                Produit.all_objects.filter(pk=produit_id).update(quantite=quantite_journal)
+                ecarts.append((produit_id, quantite, quantite_journal))
+    return ecarts
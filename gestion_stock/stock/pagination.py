@@ -0,0 +1,198 @@
+"""
+Pagination par curseur (keyset) pour les ListView.
+
+La pagination par OFFSET relit toutes les lignes qui précèdent la page
+demandée : la page 10 000 d'une grosse table Commande coûte autant que de
+la parcourir. Ici, la page suivante est demandée « après la dernière ligne
+affichée » (WHERE (date_commande, code_cmd) < (...)), ce qui suit un index
+composite quelle que soit la profondeur.
+
+Les curseurs sont opaques (valeurs de la clé signées par django.core.signing)
+et le total affiché est borné : au-delà de `compte_max` lignes, le
+paginateur indique « compte_max+ » au lieu de compter toute la table.
+
+Usage :
+
+    class CommandeListView(PaginationCurseurMixin, ListView):
+        paginate_by = 15
+        ordre_curseur = ('-date_commande', '-code_cmd')
+"""
+
+import datetime
+
+from django.core import signing
+from django.db.models import Q
+from django.http import Http404
+from django.utils.functional import cached_property
+
+SEL_CURSEUR = 'stock.pagination'
+
+
+class PageCurseur:
+    """Une page de résultats et les curseurs des pages voisines."""
+
+    def __init__(self, paginateur, object_list, has_previous, has_next):
+        self.paginator = paginateur
+        self.object_list = object_list
+        self._has_previous = has_previous
+        self._has_next = has_next
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_next(self):
+        return self._has_next
+
+    def has_other_pages(self):
+        return self._has_previous or self._has_next
+
+    @cached_property
+    def curseur_precedent(self):
+        """Curseur de la page précédente (avant la première ligne affichée)."""
+        if not self._has_previous or not self.object_list:
+            return None
+        return self.paginator.encoder('<', self.object_list[0])
+
+    @cached_property
+    def curseur_suivant(self):
+        """Curseur de la page suivante (après la dernière ligne affichée)."""
+        if not self._has_next or not self.object_list:
+            return None
+        return self.paginator.encoder('>', self.object_list[-1])
+
+
+class PaginateurCurseur:
+    """
+    Paginateur keyset sur `ordre` (champs du modèle, '-' pour décroissant).
+
+    Le dernier champ de `ordre` doit rendre la clé unique (en général la clé
+    primaire) et aucun champ ne doit être nul.
+    """
+
+    def __init__(self, queryset, par_page, ordre, compte_max=1000):
+        self.queryset = queryset
+        self.per_page = par_page
+        self.ordre = tuple(ordre)
+        self.compte_max = compte_max
+        self.champs = [champ.lstrip('-') for champ in self.ordre]
+
+    # ---------- Curseurs ----------
+
+    def encoder(self, sens, objet):
+        """Curseur opaque pointant avant ('<') ou après ('>') un objet."""
+        valeurs = []
+        for champ in self.champs:
+            valeur = getattr(objet, champ)
+            if isinstance(valeur, (datetime.date, datetime.datetime)):
+                valeur = valeur.isoformat()
+            valeurs.append(valeur)
+        return signing.dumps([sens, valeurs], salt=SEL_CURSEUR, compress=True)
+
+    @cached_property
+    def curseur_derniere(self):
+        """Curseur de la dernière page."""
+        return signing.dumps(['fin', None], salt=SEL_CURSEUR)
+
+    def decoder(self, curseur):
+        """Retourne (sens, valeurs) ; Http404 si le curseur est invalide."""
+        try:
+            sens, valeurs = signing.loads(curseur, salt=SEL_CURSEUR)
+        except (signing.BadSignature, TypeError, ValueError):
+            raise Http404("Curseur de pagination invalide")
+        if sens == 'fin':
+            return sens, None
+        if sens not in ('<', '>') or len(valeurs) != len(self.champs):
+            raise Http404("Curseur de pagination invalide")
+        modele = self.queryset.model
+        try:
+            valeurs = [
+                modele._meta.get_field(champ).to_python(valeur)
+                for champ, valeur in zip(self.champs, valeurs)
+            ]
+        except Exception:
+            raise Http404("Curseur de pagination invalide")
+        return sens, valeurs
+
+    # ---------- Requêtes ----------
+
+    def _ordre(self, inverse=False):
+        if not inverse:
+            return self.ordre
+        return tuple(champ[1:] if champ.startswith('-') else f'-{champ}' for champ in self.ordre)
+
+    def _apres(self, valeurs, inverse=False):
+        """Condition « strictement après `valeurs` » dans l'ordre (ou l'ordre inverse)."""
+        condition = Q()
+        for i, champ in enumerate(self._ordre(inverse)):
+            nom = champ.lstrip('-')
+            operateur = 'lt' if champ.startswith('-') else 'gt'
+            terme = Q(**{f'{nom}__{operateur}': valeurs[i]})
+            for precedent, valeur in zip(self.champs[:i], valeurs[:i]):
+                terme &= Q(**{precedent: valeur})
+            condition |= terme
+        return condition
+
+    def page(self, curseur=None):
+        """Retourne la PageCurseur désignée par `curseur` (première page si vide)."""
+        sens, valeurs = self.decoder(curseur) if curseur else ('>', None)
+        inverse = sens != '>'
+
+        queryset = self.queryset.order_by(*self._ordre(inverse))
+        if valeurs is not None:
+            queryset = queryset.filter(self._apres(valeurs, inverse))
+        lignes = list(queryset[:self.per_page + 1])
+        encore = len(lignes) > self.per_page
+        lignes = lignes[:self.per_page]
+
+        if not inverse:
+            return PageCurseur(self, lignes, has_previous=valeurs is not None, has_next=encore)
+        lignes.reverse()
+        return PageCurseur(self, lignes, has_previous=encore, has_next=sens != 'fin')
+
+    # ---------- Total borné ----------
+
+    @cached_property
+    def _compte_borne(self):
+        """COUNT(*) limité à compte_max + 1 lignes (une seule requête)."""
+        if self.compte_max is None:
+            return self.queryset.count()
+        return self.queryset.order_by()[:self.compte_max + 1].count()
+
+    @property
+    def count(self):
+        """Nombre de lignes, borné à compte_max (voir `tronque`)."""
+        if self.compte_max is None:
+            return self._compte_borne
+        return min(self._compte_borne, self.compte_max)
+
+    @property
+    def tronque(self):
+        """Vrai si le total réel dépasse compte_max."""
+        return self.compte_max is not None and self._compte_borne > self.compte_max
+
+
+class PaginationCurseurMixin:
+    """
+    Remplace la pagination par OFFSET d'une ListView par un keyset.
+
+    Les templates utilisent page_obj.curseur_precedent / curseur_suivant,
+    paginator.curseur_derniere, paginator.count et paginator.tronque.
+    """
+
+    ordre_curseur = None
+    parametre_curseur = 'curseur'
+    compte_max = 1000
+
+    def get_ordre_curseur(self):
+        return self.ordre_curseur
+
+    def paginate_queryset(self, queryset, page_size):
+        paginateur = PaginateurCurseur(queryset, page_size, self.get_ordre_curseur(), compte_max=self.compte_max)
+        page = paginateur.page(self.request.GET.get(self.parametre_curseur))
+        return paginateur, page, page.object_list, page.has_other_pages()
@@ -0,0 +1,49 @@
+"""
+Validation des paniers (commandes multi-produits).
+
+Un panier est validé en une seule transaction : réservation du stock de
+toutes les lignes par un seul UPDATE, insertion groupée des lignes
+(bulk_create), puis effets de bord du lot entier via stock.pipeline
+(une facture pour le panier, notifications insérées en bloc). Les lignes
+étant créées par bulk_create, le signal post_save de Commande n'est pas
+déclenché : le pipeline est appelé une seule fois pour tout le panier, et
+ajoute les lignes et la facture aux agrégats statistiques.
+"""
+
+from django.db import transaction
+
+from .models import Commande, Panier
+from .pipeline import traiter_commandes
+from .reservations import reserver_lignes
+from . import metriques
+
+
+def passer_panier(agent, quantites):
+    """
+    Valide un panier pour `agent`.
+
+    `quantites` est un dictionnaire {produit_id: quantite}. Lève
+    StockInsuffisant (et n'écrit rien) si une ligne ne peut pas être servie.
+    Retourne le Panier créé.
+    """
+    if not quantites:
+        raise ValueError("Le panier est vide")
+
+    with transaction.atomic():
+        reserver_lignes(quantites)
+
+        panier = Panier.objects.create(agent_utilisateur=agent)
+        lignes = Commande.objects.bulk_create([
+            Commande(
+                code_prod_id=produit_id,
+                quantite_cmd=quantite,
+                agent_utilisateur=agent,
+                panier=panier,
+            )
+            for produit_id, quantite in quantites.items()
+        ])
+
+        traiter_commandes(lignes, creees=True, panier=panier)
+        metriques.COMMANDES.inc(len(lignes), origine='panier')
+
+    return panier
@@ -0,0 +1,227 @@
+"""
+Pipeline des effets de bord des commandes.
+
+Remplace les trois receivers post_save de Commande (alerte de rupture,
+notification de confirmation, facture automatique) par un traitement unique :
+les produits sont chargés une seule fois, toutes les lignes à écrire
+(notifications, factures, mouvements du montant agent) sont construites en mémoire puis insérées par
+bulk_create. Le même pipeline sert pour une commande seule (signal) et pour
+toutes les lignes d'un panier.
+
+Les commandes créées et les notifications sont publiées au commit sur le
+flux d'événements en direct (stock.evenements), s'il a des abonnés.
+
+Chaque étape est chronométrée ; `ajouter_observateur` permet de brancher une
+fonction qui reçoit (etape, duree_en_secondes, nombre_de_commandes).
+"""
+
+import contextlib
+import logging
+import time
+from collections import defaultdict
+
+from .models import Produit, Facture, Notification, MouvementMontantAgent
+from . import alertes, compteurs, digests, evenements, metriques, statistiques
+
+logger = logging.getLogger(__name__)
+
+_observateurs = []
+
+
+def ajouter_observateur(fonction):
+    """Enregistre une fonction appelée après chaque étape du pipeline."""
+    _observateurs.append(fonction)
+    return fonction
+
+
+def retirer_observateur(fonction):
+    """Retire un observateur enregistré avec ajouter_observateur."""
+    if fonction in _observateurs:
+        _observateurs.remove(fonction)
+
+
+@contextlib.contextmanager
+def mesurer_etapes():
+    """
+    Cumule la durée de chaque étape pendant le bloc.
+
+        with mesurer_etapes() as mesures:
+            ...
+        print(mesures['factures'])
+    """
+    mesures = defaultdict(float)
+
+    def observateur(etape, duree, nombre):
+        mesures[etape] += duree
+
+    ajouter_observateur(observateur)
+    try:
+        yield mesures
+    finally:
+        retirer_observateur(observateur)
+
+
+class PipelineCommandes:
+    """
+    Effets de bord d'un lot de commandes enregistrées.
+
+    `creees` indique que les commandes viennent d'être créées (confirmation,
+    facture et montant agent) ; sinon seules les alertes de stock sont
+    réévaluées. Si `panier` est fourni, une seule facture est créée pour
+    tout le lot.
+    """
+
+    ETAPES = ('chargement', 'alertes', 'confirmations', 'factures', 'montants', 'ecriture', 'statistiques', 'fournisseurs', 'evenements')
+
+    def __init__(self, commandes, creees=True, panier=None):
+        self.commandes = [c for c in commandes if not c.is_deleted]
+        self.creees = creees
+        self.panier = panier
+        self.produits = {}
+        self.notifications = []
+        self.factures = []
+        self.mouvements = []
+        self.ruptures = []
+
+    def executer(self):
+        """Exécute toutes les étapes, dans l'ordre."""
+        if not self.commandes:
+            return self
+        for etape in self.ETAPES:
+            debut = time.perf_counter()
+            getattr(self, f'etape_{etape}')()
+            duree = time.perf_counter() - debut
+            for observateur in list(_observateurs):
+                observateur(etape, duree, len(self.commandes))
+        return self
+
+    # ---------- Étapes ----------
+
+    def etape_chargement(self):
+        """Charge une seule fois les produits concernés (stock à jour)."""
+        self.produits = Produit.all_objects.in_bulk({c.code_prod_id for c in self.commandes})
+        for commande in self.commandes:
+            commande.code_prod = self.produits[commande.code_prod_id]
+
+    def etape_alertes(self):
+        """
+        Prépare les alertes rupture / stock bas des produits dont les
+        commandes créées ont fait franchir un seuil (stock.alertes).
+
+        Le stock a été réservé avant l'enregistrement des commandes : le
+        stock d'avant le lot est le stock actuel plus les quantités
+        commandées. Une modification de commande ne change pas le stock.
+        """
+        if not self.creees:
+            return
+        commandees = defaultdict(int)
+        derniere_commande = {}
+        for commande in self.commandes:
+            commandees[commande.code_prod_id] += commande.quantite_cmd
+            derniere_commande[commande.code_prod_id] = commande
+
+        variations = {
+            self.produits[produit_id]: self.produits[produit_id].quantite + quantite
+            for produit_id, quantite in commandees.items()
+        }
+        for produit, niveau in alertes.a_emettre(alertes.franchissements(variations)):
+            notification = alertes.notification(produit, niveau, derniere_commande[produit.pk].date_commande)
+            if niveau == 'rupture':
+                self.ruptures.append((produit, notification))
+            self.notifications.append(notification)
+
+    def etape_confirmations(self):
+        """Prépare une notification de confirmation par commande créée."""
+        if not self.creees:
+            return
+        for commande in self.commandes:
+            self.notifications.append(Notification(
+                type_notification='commande_confirmee',
+                produit=commande.code_prod,
+                titre=f'✅ Commande confirmée: {commande.code_prod.nom_prod}',
+                message=f'Commande #{commande.code_cmd} créée avec succès.\n\nProduit: {commande.code_prod.nom_prod}\nQuantité: {commande.quantite_cmd}\nMontant: {commande.montant_commande()}€',
+            ))
+
+    def etape_factures(self):
+        """Prépare la facture de chaque commande créée (ou celle du panier)."""
+        if not self.creees:
+            return
+        if self.panier is not None:
+            self.factures.append(Facture(
+                panier=self.panier,
+                montant_total=sum(c.montant_commande() for c in self.commandes),
+                agent_utilisateur_id=self.panier.agent_utilisateur_id,
+                statut='brouillon',
+            ))
+            return
+        for commande in self.commandes:
+            self.factures.append(Facture(
+                commande=commande,
+                montant_total=commande.montant_commande(),
+                agent_utilisateur_id=commande.agent_utilisateur_id,
+                statut='brouillon',
+            ))
+
+    def etape_montants(self):
+        """Prépare un mouvement du journal des montants par commande créée."""
+        if not self.creees:
+            return
+        for commande in self.commandes:
+            if commande.agent_utilisateur_id:
+                self.mouvements.append(MouvementMontantAgent(
+                    agent_utilisateur_id=commande.agent_utilisateur_id,
+                    montant=commande.montant_commande(),
+                    commande=commande,
+                ))
+
+    def etape_ecriture(self):
+        """Insère toutes les notifications, factures et mouvements préparés."""
+        if self.mouvements:
+            MouvementMontantAgent.objects.bulk_create(self.mouvements)
+        if self.notifications:
+            Notification.objects.bulk_create(self.notifications)
+            for notification in self.notifications:
+                metriques.NOTIFICATIONS.inc(type=notification.type_notification)
+        if self.factures:
+            Facture.objects.bulk_create(self.factures)
+            metriques.FACTURES.inc(len(self.factures))
+            if logger.isEnabledFor(logging.DEBUG):
+                for facture in self.factures:
+                    origine = f"Panier #{facture.panier_id}" if facture.panier_id else f"Commande #{facture.commande_id}"
+                    logger.debug("Facture #%s créée automatiquement pour %s", facture.code_facture, origine)
+
+    def etape_statistiques(self):
+        """
+        Ajoute aux agrégats les commandes créées et leurs factures, en un seul
+        passage (une écriture par ligne d'agrégats), et aux compteurs les
+        notifications insérées par bulk_create (sans signal).
+
+        Les commandes ainsi comptées sont marquées : le receiver post_save de
+        création ne les ajoute pas une seconde fois.
+        """
+        commandes = self.commandes if self.creees else []
+        if commandes or self.factures:
+            statistiques.enregistrer([*commandes, *self.factures])
+            for commande in commandes:
+                commande._statistiques_enregistrees = True
+        if self.notifications:
+            compteurs.enregistrer(self.notifications)
+
+    def etape_fournisseurs(self):
+        """Ajoute les produits tombés en rupture au prochain digest de leurs fournisseurs."""
+        if self.ruptures:
+            digests.signaler_ruptures([produit for produit, _ in self.ruptures])
+
+    def etape_evenements(self):
+        """Publie au commit les commandes créées et les notifications (flux en direct)."""
+        commandes = self.commandes if self.creees else []
+        notifications = self.notifications
+        evenements.publier_apres_commit(lambda: (
+            [evenements.evenement_commande(commande) for commande in commandes]
+            + [evenements.evenement_notification(notification) for notification in notifications]
+        ))
+
+
+def traiter_commandes(commandes, creees=True, panier=None):
+    """Exécute le pipeline sur un lot de commandes et le retourne."""
+    return PipelineCommandes(commandes, creees=creees, panier=panier).executer()
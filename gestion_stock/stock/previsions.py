@@ -0,0 +1,225 @@
+"""
+Prévision de la demande par produit (modèle PrevisionDemande).
+
+Pour anticiper les ruptures plutôt que de les constater, `prevoir()` :
+- construit, par lots de produits, la série journalière des quantités
+  commandées (Commande, regroupées par produit et par jour en base, via
+  l'index commande_active_prod_idx) sur `jours` jours, jusqu'à hier inclus ;
+- ajuste sur chaque lot, sous forme de matrices NumPy (une ligne par
+  produit), trois modèles légers :
+  - moyenne mobile des `fenetre` derniers jours ;
+  - lissage exponentiel simple (coefficient `alpha`) ;
+  - Croston, pour la demande intermittente : lissage séparé de la taille
+    des commandes et de l'intervalle entre deux jours de commande ;
+- retient pour chaque produit le modèle dont l'erreur absolue moyenne est
+  la plus faible sur les `horizon` derniers jours (modèles ajustés sur
+  l'historique qui les précède) ;
+- enregistre la demande prévue et le nombre de jours avant rupture
+  (stock / demande prévue).
+
+Rafraîchissement incrémental (`prevoir(incremental=True)`, commande
+`prevoir_demande --incremental`) : seuls les produits ayant reçu une
+commande depuis le dernier calcul (code_cmd supérieur au plus grand
+`derniere_commande` enregistré) sont recalculés. Les suppressions logiques
+et restaurations de commandes anciennes ne sont prises en compte qu'au
+prochain calcul complet.
+"""
+
+import datetime
+
+import numpy as np
+from django.db import transaction
+from django.db.models import F, Max, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Produit, Commande, PrevisionDemande
+
+METHODES = [methode for methode, _ in PrevisionDemande.METHODE_CHOICES]
+
+
+# ---------- Séries ----------
+
+def series(produits, debut, jours):
+    """
+    Matrice (produits × jours) des quantités commandées, du jour `debut`
+    inclus au jour `debut + jours` exclu. `produits` : codes triés.
+    """
+    matrice = np.zeros((len(produits), jours))
+    if not produits:
+        return matrice
+
+    fuseau = timezone.get_current_timezone()
+    depuis = datetime.datetime.combine(debut, datetime.time.min, tzinfo=fuseau)
+    jusqua = depuis + datetime.timedelta(days=jours)
+    lignes = list(
+        Commande.objects
+        .filter(code_prod__in=produits, date_commande__gte=depuis, date_commande__lt=jusqua)
+        .annotate(jour=TruncDate('date_commande'))
+        .values('code_prod', 'jour')
+        .annotate(quantite=Sum('quantite_cmd'))
+        .order_by()
+        .values_list('code_prod', 'jour', 'quantite')
+    )
+    if not lignes:
+        return matrice
+
+    codes, dates, quantites = zip(*lignes)
+    lignes_matrice = np.searchsorted(np.asarray(produits), np.asarray(codes))
+    colonnes = np.fromiter((date.toordinal() for date in dates), dtype=np.int64, count=len(dates)) - debut.toordinal()
+    matrice[lignes_matrice, colonnes] = quantites
+    return matrice
+
+
+# ---------- Modèles (une ligne de la matrice par produit) ----------
+
+def moyenne_mobile(matrice, fenetre=28):
+    """Moyenne des `fenetre` derniers jours."""
+    return matrice[:, -fenetre:].mean(axis=1)
+
+
+def lissage_exponentiel(matrice, alpha=0.1):
+    """
+    Lissage exponentiel simple, initialisé sur le premier jour.
+
+    Le niveau final est une somme pondérée des jours (poids α(1-α)^âge) :
+    un seul produit matriciel pour tout le lot.
+    """
+    jours = matrice.shape[1]
+    poids = alpha * (1 - alpha) ** np.arange(jours - 1, -1, -1)
+    return matrice @ poids + (1 - alpha) ** jours * matrice[:, 0]
+
+
+def croston(matrice, alpha=0.1):
+    """
+    Méthode de Croston : taille moyenne des commandes / intervalle moyen
+    entre deux jours de commande, lissés à chaque jour de commande.
+
+    Taille et intervalle partent de leurs moyennes sur la série ;
+    l'intervalle qui précède le premier jour de commande, inconnu, est
+    ignoré.
+    """
+    commandes = matrice > 0
+    nombre = commandes.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        taille = np.where(nombre > 0, matrice.sum(axis=1) / nombre, 0.0)
+        intervalle = np.where(nombre > 0, matrice.shape[1] / nombre, 1.0)
+    ecart = np.ones(len(matrice))
+    initialise = np.zeros(len(matrice), dtype=bool)
+    for jour, demande in zip(matrice.T, commandes.T):
+        taille = np.where(demande, taille + alpha * (jour - taille), taille)
+        intervalle = np.where(demande & initialise, intervalle + alpha * (ecart - intervalle), intervalle)
+        initialise |= demande
+        ecart = np.where(demande, 1, ecart + 1)
+    return taille / intervalle
+
+
+def ajuster(matrice, horizon=28, fenetre=28, alpha=0.1):
+    """
+    Ajuste les trois modèles sur un lot.
+
+    Retourne (indice de la méthode retenue, demande prévue, erreur), un
+    élément par produit.
+    """
+    modeles = [
+        lambda m: moyenne_mobile(m, fenetre),
+        lambda m: lissage_exponentiel(m, alpha),
+        lambda m: croston(m, alpha),
+    ]
+    apprentissage, test = matrice[:, :-horizon], matrice[:, -horizon:]
+    erreurs = np.array([np.abs(test - modele(apprentissage)[:, None]).mean(axis=1) for modele in modeles])
+    previsions = np.array([modele(matrice) for modele in modeles])
+
+    # Égalité : la méthode la plus simple (ordre de METHODES)
+    choix = erreurs.argmin(axis=0)
+    colonnes = np.arange(matrice.shape[0])
+    return choix, previsions[choix, colonnes], erreurs[choix, colonnes]
+
+
+def jours_avant_rupture(stock, demande):
+    """Stock / demande prévue ; NaN sans demande, 0 si le stock est épuisé."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        jours = np.where(demande > 0, np.maximum(stock, 0) / demande, np.nan)
+    return jours
+
+
+# ---------- Calcul ----------
+
+def produits_a_prevoir(incremental=False, jusqua_commande=None):
+    """
+    Produits actifs à recalculer (code_prod, quantite), triés par code.
+
+    En mode incrémental, seuls ceux qui ont une commande plus récente que le
+    dernier calcul ; tous s'il n'y a encore aucune prévision.
+    """
+    produits = Produit.objects.order_by('code_prod')
+    if incremental:
+        depuis = PrevisionDemande.objects.aggregate(derniere=Max('derniere_commande'))['derniere']
+        if depuis is not None:
+            nouvelles = Commande.all_objects.filter(code_cmd__gt=depuis)
+            if jusqua_commande is not None:
+                nouvelles = nouvelles.filter(code_cmd__lte=jusqua_commande)
+            produits = produits.filter(code_prod__in=nouvelles.values('code_prod'))
+    return list(produits.values_list('code_prod', 'quantite'))
+
+
+def prevoir(jours=3 * 365, incremental=False, taille_lot=2000, horizon=28, fenetre=28, alpha=0.1):
+    """
+    Recalcule les prévisions (toutes, ou celles des produits ayant de
+    nouvelles commandes). Une transaction par lot ; retourne le nombre de
+    prévisions enregistrées.
+    """
+    if jours <= horizon:
+        raise ValueError("L'historique doit être plus long que l'horizon de test")
+
+    derniere = Commande.all_objects.aggregate(derniere=Max('code_cmd'))['derniere'] or 0
+    produits = produits_a_prevoir(incremental, jusqua_commande=derniere)
+    debut = timezone.localdate() - datetime.timedelta(days=jours)
+
+    total = 0
+    for i in range(0, len(produits), taille_lot):
+        lot = produits[i:i + taille_lot]
+        codes = [code for code, _ in lot]
+        stock = np.array([quantite for _, quantite in lot], dtype=np.float64)
+
+        choix, demande, erreur = ajuster(series(codes, debut, jours), horizon, fenetre, alpha)
+        rupture = jours_avant_rupture(stock, demande)
+
+        previsions = [
+            PrevisionDemande(
+                produit_id=code,
+                methode=METHODES[choix[j]],
+                demande_journaliere=float(demande[j]),
+                erreur=float(erreur[j]),
+                stock_actuel=int(stock[j]),
+                jours_avant_rupture=None if np.isnan(rupture[j]) else float(rupture[j]),
+                derniere_commande=derniere,
+            )
+            for j, code in enumerate(codes)
+        ]
+        with transaction.atomic():
+            PrevisionDemande.objects.filter(produit_id__in=codes).delete()
+            PrevisionDemande.objects.bulk_create(previsions, batch_size=1000)
+        total += len(previsions)
+
+    if not incremental:
+        PrevisionDemande.objects.filter(produit__is_deleted=True).delete()
+    return total
+
+
+def ruptures_prevues(jours=7):
+    """
+    Prévisions des produits en stock qui seront épuisés d'ici `jours` jours,
+    d'après leur stock actuel (Produit.quantite) et la demande prévue.
+    """
+    return (
+        PrevisionDemande.objects
+        .filter(
+            produit__is_deleted=False,
+            produit__quantite__gt=0,
+            produit__quantite__lt=F('demande_journaliere') * jours,
+        )
+        .select_related('produit')
+        .annotate(jours_restants=F('produit__quantite') / F('demande_journaliere'))
+        .order_by('jours_restants')
+    )
@@ -0,0 +1,203 @@
+"""
+Planification du réapprovisionnement (calcul vectorisé avec NumPy).
+
+`charger()` lit en quelques requêtes, dans des tableaux NumPy :
+- le stock et le prix de chaque produit actif ;
+- la demande journalière récente par produit (quantite_commandee des
+  StatistiqueJournaliere sur `jours` jours) ;
+- les conditions de chaque liaison ProduitFournisseur (prix, délai,
+  quantité minimale, principal). Un produit sans liaison mais rattaché à un
+  fournisseur (Produit.fournisseur) reçoit les conditions par défaut du
+  modèle ProduitFournisseur, au prix de vente.
+
+`calculer()` traite ensuite toutes les options (produit, fournisseur) d'un
+seul passage :
+- demande moyenne d et écart-type σ de la demande journalière ;
+- stock de sécurité z·σ·√L et point de commande d·L + stock de sécurité
+  (L : délai de livraison, z : quantile du niveau de service visé) ;
+- quantité économique de Wilson √(2·D·S / H), au moins quantite_min
+  (D : demande annuelle, S : coût d'une commande, H : coût de possession
+  annuel d'une unité, taux × prix) ;
+- coût annuel D·prix + D/Q·S + (Q/2 + stock de sécurité)·H : le fournisseur
+  retenu est celui de coût minimal, le principal en cas d'égalité.
+
+Les produits dont le stock a atteint le point de commande reçoivent une
+SuggestionReapprovisionnement ; `planifier()` remplace les suggestions
+précédentes (commande `planifier_reapprovisionnement`).
+"""
+
+from datetime import timedelta
+from statistics import NormalDist
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Produit, ProduitFournisseur, StatistiqueJournaliere, SuggestionReapprovisionnement
+
+JOURS_PAR_AN = 365
+
+
+def _colonnes(lignes, types):
+    """Transpose une liste de tuples en tableaux NumPy (un par colonne)."""
+    if not lignes:
+        return [np.empty(0, dtype=type_) for type_ in types]
+    return [np.array(colonne, dtype=type_) for colonne, type_ in zip(zip(*lignes), types)]
+
+
+def _positions(ids, valeurs):
+    """Positions de `valeurs` dans `ids` (trié) et masque des valeurs trouvées."""
+    position = np.searchsorted(ids, valeurs)
+    connus = position < len(ids)
+    connus[connus] = ids[position[connus]] == valeurs[connus]
+    return position, connus
+
+
+def charger(jours=90):
+    """Charge produits, demande et conditions fournisseurs dans des tableaux NumPy."""
+    produits = list(
+        Produit.objects
+        .order_by('code_prod')
+        .values_list('code_prod', 'quantite', 'prix_unit', 'fournisseur')
+    )
+    # Les fournisseurs (clé code_fournisseur, texte) restent des objets Python
+    ids, stock, prix_unit, fournisseur_direct = _colonnes(produits, (np.int64, np.float64, np.float64, object))
+    n = len(ids)
+
+    # Demande : une valeur par (produit, jour) ayant eu des commandes
+    depuis = timezone.localdate() - timedelta(days=jours)
+    demande = list(
+        StatistiqueJournaliere.objects
+        .filter(jour__gt=depuis, produit__isnull=False)
+        .values('produit', 'jour')
+        .annotate(quantite=Sum('quantite_commandee'))
+        .order_by()
+        .values_list('produit', 'quantite')
+    )
+    demande_produits, demande_quantites = _colonnes(demande, (np.int64, np.float64))
+    position, connus = _positions(ids, demande_produits)
+    somme = np.bincount(position[connus], weights=demande_quantites[connus], minlength=n)
+    carres = np.bincount(position[connus], weights=demande_quantites[connus] ** 2, minlength=n)
+
+    # Options fournisseurs
+    liaisons = list(
+        ProduitFournisseur.objects
+        .filter(produit__is_deleted=False)
+        .values_list('produit_id', 'fournisseur_id', 'prix_fournisseur', 'delai_livraison', 'quantite_min', 'is_principal')
+    )
+    options = _colonnes(liaisons, (np.int64, object, np.float64, np.float64, np.float64, bool))
+    position, connus = _positions(ids, options[0])
+    options = [colonne[connus] for colonne in options]
+    options[0] = position[connus]
+
+    sans_liaison = np.ones(n, dtype=bool)
+    sans_liaison[options[0]] = False
+    a_fournisseur = np.array([fournisseur is not None for fournisseur in fournisseur_direct], dtype=bool)
+    directs = np.flatnonzero(sans_liaison & a_fournisseur)
+    champ = ProduitFournisseur._meta.get_field
+    defauts = [
+        directs,
+        fournisseur_direct[directs],
+        prix_unit[directs],
+        np.full(len(directs), champ('delai_livraison').default, dtype=np.float64),
+        np.full(len(directs), champ('quantite_min').default, dtype=np.float64),
+        np.ones(len(directs), dtype=bool),
+    ]
+    produit, fournisseur, prix, delai, quantite_min, principal = [
+        np.concatenate([colonne, defaut]) for colonne, defaut in zip(options, defauts)
+    ]
+
+    return {
+        'jours': jours,
+        'ids': ids,
+        'stock': stock,
+        'demande_somme': somme,
+        'demande_carres': carres,
+        'option_produit': produit,
+        'option_fournisseur': fournisseur,
+        'option_prix': prix,
+        'option_delai': delai,
+        'option_quantite_min': quantite_min,
+        'option_principal': principal,
+    }
+
+
+def calculer(donnees, niveau_service=0.95, cout_commande=50.0, taux_possession=0.25):
+    """
+    Calcule les suggestions à partir des tableaux de `charger()`.
+
+    Retourne un dictionnaire de tableaux alignés (une entrée par produit à
+    réapprovisionner) : produit_id, fournisseur_id, stock_actuel,
+    demande_journaliere, stock_securite, point_commande,
+    quantite_economique, quantite_suggeree, prix_fournisseur,
+    delai_livraison, cout_annuel.
+    """
+    jours = donnees['jours']
+    moyenne = donnees['demande_somme'] / jours
+    ecart_type = np.sqrt(np.maximum(donnees['demande_carres'] / jours - moyenne ** 2, 0.0))
+    z = NormalDist().inv_cdf(niveau_service)
+
+    produit = donnees['option_produit']
+    prix = donnees['option_prix']
+    delai = donnees['option_delai']
+    d = moyenne[produit]
+    stock_securite = z * ecart_type[produit] * np.sqrt(delai)
+    point_commande = d * delai + stock_securite
+
+    demande_annuelle = d * JOURS_PAR_AN
+    possession = np.maximum(taux_possession * prix, 1e-9)
+    wilson = np.ceil(np.sqrt(2 * demande_annuelle * cout_commande / possession))
+    quantite = np.maximum(np.maximum(wilson, donnees['option_quantite_min']), 1)
+    cout_annuel = (
+        demande_annuelle * prix
+        + demande_annuelle / quantite * cout_commande
+        + (quantite / 2 + stock_securite) * possession
+    )
+
+    # Meilleure option par produit : coût minimal, puis fournisseur principal
+    ordre = np.lexsort((~donnees['option_principal'], cout_annuel, produit))
+    _, premieres = np.unique(produit[ordre], return_index=True)
+    meilleures = ordre[premieres]
+
+    stock = donnees['stock'][produit[meilleures]]
+    a_commander = (d[meilleures] > 0) & (stock <= point_commande[meilleures])
+    retenues = meilleures[a_commander]
+    stock = stock[a_commander]
+
+    return {
+        'produit_id': donnees['ids'][produit[retenues]],
+        'fournisseur_id': donnees['option_fournisseur'][retenues],
+        'stock_actuel': stock.astype(np.int64),
+        'demande_journaliere': d[retenues],
+        'stock_securite': stock_securite[retenues],
+        'point_commande': point_commande[retenues],
+        'quantite_economique': quantite[retenues].astype(np.int64),
+        'quantite_suggeree': np.maximum(quantite[retenues], np.ceil(point_commande[retenues] - stock)).astype(np.int64),
+        'prix_fournisseur': prix[retenues],
+        'delai_livraison': delai[retenues].astype(np.int64),
+        'cout_annuel': cout_annuel[retenues],
+    }
+
+
+def enregistrer(resultats):
+    """Remplace les suggestions par celles de `calculer()` ; retourne leur nombre."""
+    colonnes = {champ: valeurs.tolist() for champ, valeurs in resultats.items()}
+    suggestions = [
+        SuggestionReapprovisionnement(**dict(zip(colonnes, ligne)))
+        for ligne in zip(*colonnes.values())
+    ]
+    with transaction.atomic():
+        SuggestionReapprovisionnement.objects.all().delete()
+        SuggestionReapprovisionnement.objects.bulk_create(suggestions, batch_size=1000)
+    return len(suggestions)
+
+
+def planifier(jours=90, niveau_service=0.95, cout_commande=50.0, taux_possession=0.25):
+    """Recalcule toutes les suggestions ; retourne le nombre de suggestions créées."""
+    return enregistrer(calculer(
+        charger(jours),
+        niveau_service=niveau_service,
+        cout_commande=cout_commande,
+        taux_possession=taux_possession,
+    ))
@@ -0,0 +1,102 @@
+"""
+Service de réservation de stock.
+
+Ce module est le seul point d'entrée pour décrémenter ou restaurer le stock
+d'un produit. La décrémentation est conditionnelle et faite en base
+(UPDATE ... SET quantite = quantite - n WHERE quantite >= n) : deux agents
+qui commandent en même temps ne peuvent pas survendre, et seule la colonne
+quantite est réécrite.
+
+Chaque variation est aussi inscrite au journal du stock (stock.mouvements),
+dans la même transaction que l'UPDATE.
+"""
+
+from django.db import transaction
+from django.db.models import F, Q, Case, When, Value, IntegerField
+
+from .models import Produit
+from . import metriques, mouvements
+
+
+class StockInsuffisant(Exception):
+    """Levée quand une ligne d'un panier ne peut pas être réservée."""
+
+    def __init__(self, produit_id, quantite):
+        self.produit_id = produit_id
+        self.quantite = quantite
+        super().__init__(f"Stock insuffisant pour le produit #{produit_id} (demandé: {quantite})")
+
+
+def reserver_stock(produit_id, quantite):
+    """
+    Réserve `quantite` unités du produit si le stock le permet.
+
+    Retourne True si la réservation a réussi, False si le stock est
+    insuffisant (ou si le produit n'existe pas / est supprimé).
+    """
+    if quantite <= 0:
+        raise ValueError("La quantité doit être positive")
+
+    with transaction.atomic():
+        lignes_modifiees = Produit.objects.filter(
+            code_prod=produit_id,
+            quantite__gte=quantite,
+        ).update(quantite=F('quantite') - quantite)
+        if lignes_modifiees == 1:
+            mouvements.enregistrer({produit_id: -quantite}, 'commande')
+
+    metriques.RESERVATIONS.inc(resultat='reussie' if lignes_modifiees == 1 else 'insuffisante')
+    return lignes_modifiees == 1
+
+
+def liberer_stock(produit_id, quantite):
+    """
+    Remet `quantite` unités en stock (annulation ou suppression de commande).
+    """
+    if quantite <= 0:
+        raise ValueError("La quantité doit être positive")
+
+    with transaction.atomic():
+        if Produit.all_objects.filter(code_prod=produit_id).update(quantite=F('quantite') + quantite):
+            mouvements.enregistrer({produit_id: quantite}, 'liberation')
+
+
+def reserver_lignes(quantites):
+    """
+    Réserve toutes les lignes d'un panier ({produit_id: quantite}).
+
+    Toutes les lignes sont décrémentées par un seul UPDATE conditionnel :
+    si une ligne ne peut pas être servie, rien n'est réservé et
+    StockInsuffisant est levée pour le premier produit en défaut.
+    """
+    if any(quantite <= 0 for quantite in quantites.values()):
+        raise ValueError("La quantité doit être positive")
+
+    conditions = Q()
+    for produit_id, quantite in quantites.items():
+        conditions |= Q(code_prod=produit_id, quantite__gte=quantite)
+    a_retirer = Case(
+        *[When(code_prod=produit_id, then=Value(quantite)) for produit_id, quantite in quantites.items()],
+        output_field=IntegerField(),
+    )
+
+    try:
+        with transaction.atomic():
+            lignes_modifiees = Produit.objects.filter(conditions).update(
+                quantite=F('quantite') - a_retirer
+            )
+            if lignes_modifiees != len(quantites):
+                raise StockInsuffisant(None, None)
+            mouvements.enregistrer({produit_id: -quantite for produit_id, quantite in quantites.items()}, 'commande')
+        metriques.RESERVATIONS.inc(resultat='reussie')
+    except StockInsuffisant:
+        metriques.RESERVATIONS.inc(resultat='insuffisante')
+        # La réservation partielle a été annulée : on cherche la ligne en défaut
+        disponibles = dict(
+            Produit.objects.filter(code_prod__in=list(quantites))
+            .values_list('code_prod', 'quantite')
+        )
+        for produit_id in sorted(quantites):
+            if disponibles.get(produit_id, 0) < quantites[produit_id]:
+                raise StockInsuffisant(produit_id, quantites[produit_id])
+        raise
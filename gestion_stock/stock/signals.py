@@ -2,180 +2,157 @@
 Signaux Django pour automatiser les alertes et notifications.
 
 Ce module gère:
-- Création automatique d'alertes rupture de stock
-- Envoi d'emails aux fournisseurs
+- Création automatique d'alertes rupture de stock, factures et notifications
+  de commande (déléguée à stock.pipeline)
 - Mise à jour des notifications
+- Mise à jour incrémentale des agrégats statistiques (stock.statistiques)
+- Mise à jour incrémentale des compteurs de notifications (stock.compteurs)
+- Journal du stock pour les quantités modifiées par save() (stock.mouvements)
 """
 
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from django.core.mail import send_mail
-from django.conf import settings
 from django.utils import timezone
 
-from .models import Produit, Commande, Notification, ProduitFournisseur
+from .models import Produit, Commande, Facture, Notification
+from .pipeline import traiter_commandes
+from . import compteurs, metriques, mouvements, statistiques
 
 
 @receiver(post_save, sender=Commande)
-def creer_alerte_rupture_stock(sender, instance, created, **kwargs):
+def effets_commande(sender, instance, created, **kwargs):
     """
     Signal déclenché après la création/modification d'une commande.
-    Crée une notification si le stock passe sous le seuil critique.
+    
+    Un seul receiver pour tous les effets de bord (alertes de stock,
+    notification de confirmation, facture automatique, montant de l'agent) :
+    voir stock.pipeline.
     """
     if instance.is_deleted:
         return
     
-    produit = instance.code_prod
-    
-    # Vérifier si le stock est en rupture (quantité = 0)
-    if produit.quantite == 0:
-        # Créer ou récupérer la notification de rupture
-        notification, created = Notification.objects.get_or_create(
-            produit=produit,
-            type_notification='rupture',
-            est_traitee=False,
-            defaults={
-                'titre': f'⚠️ RUPTURE DE STOCK: {produit.nom_prod}',
-                'message': f'Le produit "{produit.nom_prod}" est en rupture de stock!\n\nDétails:\n- Prix unitaire: {produit.prix_unit}€\n- Dernière commande: {instance.date_commande}',
-                'fournisseur': None,
-            }
-        )
-        
-        if created:
-            # Envoyer les alertes aux fournisseurs
-            contacter_fournisseurs(produit, notification)
-    
-    # Vérifier si le stock est bas (moins de 10 unités)
-    elif produit.quantite < 10 and produit.quantite > 0:
-        notification, created = Notification.objects.get_or_create(
-            produit=produit,
-            type_notification='alerte_basse',
-            est_traitee=False,
-            defaults={
-                'titre': f'📉 STOCK BAS: {produit.nom_prod} ({produit.quantite} unités)',
-                'message': f'Le produit "{produit.nom_prod}" a un stock bas.\n\nDétails:\n- Quantité restante: {produit.quantite} unités\n- Prix unitaire: {produit.prix_unit}€',
-                'fournisseur': None,
-            }
-        )
-
-
-def contacter_fournisseurs(produit, notification):
+    traiter_commandes([instance], creees=created)
+    if created:
+        metriques.COMMANDES.inc(origine='commande')
+
+
+@receiver(pre_save, sender=Commande)
+@receiver(pre_save, sender=Facture)
+def statistiques_avant_modification(sender, instance, **kwargs):
     """
-    Contacte les fournisseurs du produit en rupture de stock.
-    Envoie un email et crée une notification.
+    Mémorise la contribution de la ligne telle qu'elle est en base, pour que
+    post_save remplace l'ancienne contribution par la nouvelle.
     """
-    # Récupérer les fournisseurs du produit
-    produits_fournisseurs = ProduitFournisseur.objects.filter(
-        produit=produit
-    ).select_related('fournisseur').order_by('-is_principal')
+    instance._statistiques_avant = None
+    if instance._state.adding or instance.pk is None:
+        return
     
-    for pf in produits_fournisseurs:
-        fournisseur = pf.fournisseur
-        
-        # Envoyer email au fournisseur
-        envoyer_email_fournisseur(produit, fournisseur, pf)
-        
-        # Créer notification de contact fournisseur
-        Notification.objects.create(
-            type_notification='fournisseur_contact',
-            produit=produit,
-            fournisseur=fournisseur,
-            titre=f'📧 Fournisseur contacté: {fournisseur.nom_fournisseur}',
-            message=f'Email envoyé à {fournisseur.email} pour commander {pf.quantite_min} unités de "{produit.nom_prod}".\n\nDélai de livraison prévu: {pf.delai_livraison} jours\nPrix fournisseur: {pf.prix_fournisseur}€/unité',
-            est_lue=False,
-        )
-
-
-def envoyer_email_fournisseur(produit, fournisseur, produit_fournisseur):
+    relations = 'code_prod' if sender is Commande else 'commande__code_prod'
+    ancien = sender.all_objects.select_related(relations).filter(pk=instance.pk).first()
+    if ancien is not None:
+        instance._statistiques_avant = statistiques.contribution(ancien)
+
+
+@receiver(post_save, sender=Commande)
+@receiver(post_save, sender=Facture)
+def statistiques_apres_enregistrement(sender, instance, created, **kwargs):
     """
-    Envoie un email au fournisseur pour signaler la rupture de stock.
+    Met à jour les agrégats statistiques après un save(). Une commande créée
+    a déjà été comptée par le pipeline (étape statistiques, avec sa facture).
     """
-    try:
-        sujet = f"⚠️ URGENCE: Rupture de stock - {produit.nom_prod}"
-        
-        message = f"""
-Bonjour {fournisseur.nom_fournisseur},
+    if created and getattr(instance, '_statistiques_enregistrees', False):
+        return
+    avant = getattr(instance, '_statistiques_avant', None)
+    statistiques.remplacer(avant, statistiques.contribution(instance))
 
-⚠️  ALERTE RUPTURE DE STOCK ⚠️
 
-Le produit suivant est en rupture de stock:
+@receiver(post_delete, sender=Commande)
+@receiver(post_delete, sender=Facture)
+def statistiques_apres_suppression(sender, instance, **kwargs):
+    """Retire des agrégats une ligne supprimée physiquement."""
+    statistiques.remplacer(statistiques.contribution(instance), None)
 
-📦 Produit: {produit.nom_prod}
-💰 Prix unitaire: {produit.prix_unit}€
-📊 Stock actuel: 0 unités
-📝 Description: {produit.description or 'N/A'}
 
-COMMANDE SUGGÉRÉE:
-- Quantité: {produit_fournisseur.quantite_min} unités
-- Prix fournisseur: {produit_fournisseur.prix_fournisseur}€/unité
-- Montant total: {produit_fournisseur.quantite_min * produit_fournisseur.prix_fournisseur}€
-- Délai de livraison: {produit_fournisseur.delai_livraison} jours
+@receiver(pre_save, sender=Notification)
+def compteurs_avant_modification(sender, instance, **kwargs):
+    """Mémorise la contribution de la notification telle qu'elle est en base."""
+    instance._compteurs_avant = None
+    if instance._state.adding or instance.pk is None:
+        return
+    
+    ancienne = Notification.objects.select_related('produit').filter(pk=instance.pk).first()
+    if ancienne is not None:
+        instance._compteurs_avant = compteurs.contribution(ancienne)
 
-⏰ Merci de confirmer la commande au plus tôt!
 
-Cordialement,
-Système de Gestion de Stock
-"""
-        
-        # Envoyer l'email
-        send_mail(
-            sujet,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [fournisseur.email],
-            fail_silently=False,
-        )
-        
-        print(f"✅ Email envoyé à {fournisseur.email}")
-        
-    except Exception as e:
-        print(f"❌ Erreur lors de l'envoi de l'email à {fournisseur.email}: {str(e)}")
+@receiver(post_save, sender=Notification)
+def compteurs_apres_enregistrement(sender, instance, created, **kwargs):
+    """Met à jour les compteurs de notifications après un save()."""
+    avant = getattr(instance, '_compteurs_avant', None)
+    compteurs.remplacer(avant, compteurs.contribution(instance))
+    if created:
+        metriques.NOTIFICATIONS.inc(type=instance.type_notification)
 
 
-@receiver(post_save, sender=Commande)
-def notification_commande_confirmee(sender, instance, created, **kwargs):
+@receiver(pre_save, sender=Produit)
+def produit_avant_modification(sender, instance, raw=False, update_fields=None, **kwargs):
     """
-    Crée une notification quand une commande est confirmée.
+    Lit une seule fois le produit tel qu'il est en base avant un save() et
+    prépare ce qu'en attendent les receivers post_save :
+    - la quantité, pour le journal du stock ;
+    - si le prix unitaire ou le fournisseur change, les contributions de ses
+      commandes et factures aux agrégats statistiques ;
+    - si le fournisseur change, les contributions de ses notifications aux
+      compteurs.
     """
-    if created and not instance.is_deleted:
-        Notification.objects.create(
-            type_notification='commande_confirmee',
-            produit=instance.code_prod,
-            titre=f'✅ Commande confirmée: {instance.code_prod.nom_prod}',
-            message=f'Commande #{instance.code_cmd} créée avec succès.\n\nProduit: {instance.code_prod.nom_prod}\nQuantité: {instance.quantite_cmd}\nMontant: {instance.montant_commande()}€',
-        )
+    instance._quantite_avant = None
+    instance._statistiques_produit_avant = None
+    instance._compteurs_produit_avant = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    
+    enregistres = lambda *champs: update_fields is None or bool(set(champs) & set(update_fields))
+    if not enregistres('quantite', 'prix_unit', 'fournisseur', 'fournisseur_id'):
+        return
+    ancien = sender.all_objects.filter(pk=instance.pk).values('quantite', 'prix_unit', 'fournisseur_id').first()
+    if ancien is None:
+        return
+    
+    if enregistres('quantite'):
+        instance._quantite_avant = ancien['quantite']
+    fournisseur_change = enregistres('fournisseur', 'fournisseur_id') and ancien['fournisseur_id'] != instance.fournisseur_id
+    prix_change = enregistres('prix_unit') and ancien['prix_unit'] != instance.prix_unit
+    if fournisseur_change or prix_change:
+        instance._statistiques_produit_avant = statistiques.contributions_produit(instance.pk, signe=-1)
+    if fournisseur_change:
+        instance._compteurs_produit_avant = compteurs.contributions_produit(instance.pk, signe=-1)
+
+
+@receiver(post_save, sender=Produit)
+def stock_apres_enregistrement(sender, instance, created, raw=False, **kwargs):
+    """Inscrit au journal le stock initial d'un produit créé ou l'écart d'une modification."""
+    if raw:
+        return
+    
+    if created:
+        mouvements.enregistrer({instance.pk: instance.quantite}, 'initial')
+        return
+    avant = getattr(instance, '_quantite_avant', None)
+    if avant is not None:
+        mouvements.enregistrer({instance.pk: instance.quantite - avant}, 'ajustement')
 
 
-# ==================== CRÉATION AUTOMATIQUE DE FACTURE ====================
+@receiver(post_save, sender=Produit)
+def statistiques_produit_apres_enregistrement(sender, instance, created, raw=False, **kwargs):
+    """Déplace les contributions du produit vers son nouveau prix / fournisseur."""
+    avant = getattr(instance, '_statistiques_produit_avant', None)
+    if avant is not None:
+        statistiques.reindexer_produit(avant, instance.pk)
 
-@receiver(post_save, sender=Commande)
-def creer_facture_automatique(sender, instance, created, **kwargs):
-    """
-    Signal pour créer automatiquement une facture quand une commande est créée.
-    """
-    from .models import Facture, MontantAgent
-    
-    if created and not instance.is_deleted:
-        # Vérifier qu'une facture n'existe pas déjà pour cette commande
-        facture_exists = Facture.objects.filter(commande=instance).exists()
-        
-        if not facture_exists:
-            # Calculer le montant
-            montant = instance.quantite_cmd * instance.code_prod.prix_unit
-            
-            # Créer la facture
-            facture = Facture.objects.create(
-                commande=instance,
-                montant_total=montant,
-                agent_utilisateur=instance.agent_utilisateur,
-                statut='brouillon'
-            )
-            
-            # Ajouter le montant au compte de l'agent
-            if instance.agent_utilisateur:
-                montant_agent, _ = MontantAgent.objects.get_or_create(
-                    agent_utilisateur=instance.agent_utilisateur
-                )
-                montant_agent.ajouter_montant(montant)
-            
-            print(f"✅ Facture #{facture.code_facture} créée automatiquement pour Commande #{instance.code_cmd}")
+
+@receiver(post_save, sender=Produit)
+def compteurs_produit_apres_enregistrement(sender, instance, created, raw=False, **kwargs):
+    """Déplace les compteurs des notifications du produit vers son nouveau fournisseur."""
+    avant = getattr(instance, '_compteurs_produit_avant', None)
+    if avant is not None:
+        compteurs.reindexer_produit(avant, instance.pk)
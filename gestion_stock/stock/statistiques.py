@@ -0,0 +1,459 @@
+"""
+Tables d'agrégats des statistiques (StatistiqueJournaliere).
+
+Chaque commande et chaque facture active contribue à une ligne
+jour × produit × fournisseur × agent. Les contributions sont appliquées par
+incréments F() :
+- à chaque save()/delete() de Commande ou Facture (signaux de stock.signals,
+  qui retirent l'ancienne contribution et ajoutent la nouvelle) ;
+- à la création de commandes, par le pipeline (stock.pipeline), qui ajoute
+  les commandes et leurs factures en un seul passage, y compris les lignes
+  de panier insérées par bulk_create (sans signal).
+
+Les archivages / restaurations en lot (queryset.supprimer_logique() et
+restaurer()) et les changements de statut de factures en lot
+(queryset.changer_statut()) ajustent les agrégats autour de leur UPDATE
+(`ajuster`). Le prix unitaire et le fournisseur d'un produit entrent dans
+les contributions de ses commandes et factures : un save() du produit qui
+les modifie déplace ces contributions (`reindexer_produit`). Les autres
+modifications faites par queryset.update() ne sont pas suivies :
+`python manage.py reconstruire_statistiques` recalcule tout depuis les
+tables brutes. Les lectures (`totaux`, `produits_les_plus_commandes`,
+`factures_par_statut`) ne lisent que les agrégats.
+
+Le module fournit aussi les statistiques par fournisseur
+(`annoter_fournisseurs`) et par agent pour un fournisseur
+(`stats_agents_fournisseur`), calculées par des requêtes groupées, et
+les répartitions par valeur (statut de facture, statut de paiement, type de
+notification) de plusieurs tables en une seule requête (`repartitions`).
+"""
+
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.contrib.auth.models import User
+from django.db.models import CharField, Count, F, FloatField, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .managers import expression_montant
+from .models import Produit, Commande, Facture, Fournisseur, Notification, StatistiqueJournaliere
+
+STATUTS_FACTURE = [statut for statut, _ in Facture.STATUT_CHOICES]
+
+CHAMPS = [
+    'nb_commandes', 'quantite_commandee', 'montant_commandes',
+    *[f'nb_factures_{statut}' for statut in STATUTS_FACTURE],
+    *[f'montant_factures_{statut}' for statut in STATUTS_FACTURE],
+]
+
+
+# ---------- Contributions ----------
+
+def contribution_commande(commande):
+    """Retourne (clé, compteurs) d'une commande, ou None si elle est supprimée."""
+    if commande.is_deleted:
+        return None
+    produit = commande.code_prod
+    cle = (
+        timezone.localdate(commande.date_commande),
+        produit.code_prod,
+        produit.fournisseur_id,
+        commande.agent_utilisateur_id,
+    )
+    return cle, {
+        'nb_commandes': 1,
+        'quantite_commandee': commande.quantite_cmd,
+        'montant_commandes': commande.montant_commande(),
+    }
+
+
+def contribution_facture(facture):
+    """Retourne (clé, compteurs) d'une facture, ou None si elle est supprimée."""
+    if facture.is_deleted or facture.statut not in STATUTS_FACTURE:
+        return None
+    produit = facture.commande.code_prod if facture.commande_id else None
+    cle = (
+        timezone.localdate(facture.date_facture),
+        produit.code_prod if produit else None,
+        produit.fournisseur_id if produit else None,
+        facture.agent_utilisateur_id,
+    )
+    return cle, {
+        f'nb_factures_{facture.statut}': 1,
+        f'montant_factures_{facture.statut}': facture.montant_total,
+    }
+
+
+def contribution(objet):
+    """Contribution d'une Commande ou d'une Facture."""
+    if isinstance(objet, Commande):
+        return contribution_commande(objet)
+    return contribution_facture(objet)
+
+
+# ---------- Écriture ----------
+
+def ajouter(deltas, contribution, signe=1):
+    """Ajoute (ou retire si signe=-1) une contribution à un dictionnaire de deltas."""
+    if contribution is None:
+        return
+    cle, compteurs = contribution
+    for champ, valeur in compteurs.items():
+        deltas[cle][champ] += signe * valeur
+
+
+def appliquer(deltas):
+    """
+    Applique les deltas {clé: Counter} aux agrégats.
+
+    Un UPDATE F() par clé ; la ligne est créée si elle n'existe pas encore.
+    """
+    with transaction.atomic():
+        for (jour, produit_id, fournisseur_id, agent_id), compteurs in deltas.items():
+            compteurs = {champ: valeur for champ, valeur in compteurs.items() if valeur}
+            if not compteurs:
+                continue
+            cle = {
+                'jour': jour,
+                'produit_id': produit_id,
+                'fournisseur_id': fournisseur_id,
+                'agent_utilisateur_id': agent_id,
+            }
+            lignes_modifiees = StatistiqueJournaliere.objects.filter(**cle).update(
+                **{champ: F(champ) + valeur for champ, valeur in compteurs.items()}
+            )
+            if not lignes_modifiees:
+                StatistiqueJournaliere.objects.create(**cle, **compteurs)
+
+
+def enregistrer(objets):
+    """Ajoute aux agrégats des commandes / factures nouvellement insérées."""
+    deltas = defaultdict(Counter)
+    for objet in objets:
+        ajouter(deltas, contribution(objet))
+    appliquer(deltas)
+
+
+def remplacer(avant, apres):
+    """Remplace une contribution par une autre (modification d'une ligne)."""
+    if avant == apres:
+        return
+    deltas = defaultdict(Counter)
+    ajouter(deltas, avant, signe=-1)
+    ajouter(deltas, apres)
+    appliquer(deltas)
+
+
+def _deltas_groupes(deltas, commandes=None, factures=None, signe=1):
+    """
+    Ajoute à `deltas` les contributions de querysets de commandes / factures,
+    calculées par des requêtes groupées (sans charger les lignes).
+    """
+    if commandes is not None:
+        commandes = (
+            commandes
+            .annotate(jour=TruncDate('date_commande'))
+            .values('jour', 'code_prod_id', 'code_prod__fournisseur_id', 'agent_utilisateur_id')
+            .annotate(nombre=Count('code_cmd'), quantite=Sum('quantite_cmd'), montant=Sum(expression_montant()))
+            .order_by()
+        )
+        for ligne in commandes:
+            cle = (ligne['jour'], ligne['code_prod_id'], ligne['code_prod__fournisseur_id'], ligne['agent_utilisateur_id'])
+            deltas[cle]['nb_commandes'] += signe * ligne['nombre']
+            deltas[cle]['quantite_commandee'] += signe * ligne['quantite']
+            deltas[cle]['montant_commandes'] += signe * ligne['montant']
+
+    if factures is not None:
+        factures = (
+            factures
+            .filter(statut__in=STATUTS_FACTURE)
+            .annotate(jour=TruncDate('date_facture'))
+            .values('jour', 'commande__code_prod_id', 'commande__code_prod__fournisseur_id', 'agent_utilisateur_id', 'statut')
+            .annotate(nombre=Count('code_facture'), montant=Sum('montant_total'))
+            .order_by()
+        )
+        for ligne in factures:
+            cle = (ligne['jour'], ligne['commande__code_prod_id'], ligne['commande__code_prod__fournisseur_id'], ligne['agent_utilisateur_id'])
+            deltas[cle][f"nb_factures_{ligne['statut']}"] += signe * ligne['nombre']
+            deltas[cle][f"montant_factures_{ligne['statut']}"] += signe * ligne['montant']
+    return deltas
+
+
+def ajuster(queryset, signe):
+    """
+    Ajoute (signe=1) ou retire (signe=-1) des agrégats les contributions d'un
+    queryset de commandes ou de factures, quel que soit leur is_deleted.
+
+    Utilisé par supprimer_logique() / restaurer() en lot, juste avant l'UPDATE.
+    """
+    deltas = defaultdict(Counter)
+    if queryset.model is Commande:
+        _deltas_groupes(deltas, commandes=queryset, signe=signe)
+    else:
+        _deltas_groupes(deltas, factures=queryset, signe=signe)
+    appliquer(deltas)
+
+
+def contributions_produit(produit_id, signe=1, deltas=None):
+    """
+    Contributions des commandes et factures actives d'un produit, telles
+    qu'elles sont en base (requêtes groupées), ajoutées à `deltas`.
+    """
+    if deltas is None:
+        deltas = defaultdict(Counter)
+    return _deltas_groupes(
+        deltas,
+        commandes=Commande.objects.filter(code_prod_id=produit_id),
+        factures=Facture.objects.filter(commande__code_prod_id=produit_id),
+        signe=signe,
+    )
+
+
+def reindexer_produit(avant, produit_id):
+    """
+    Remplace les contributions d'un produit mémorisées avant son save()
+    (`contributions_produit(..., signe=-1)`) par celles calculées après.
+    """
+    appliquer(contributions_produit(produit_id, deltas=avant))
+
+
+def reconstruire():
+    """
+    Recalcule toutes les statistiques depuis Commande et Facture.
+
+    Retourne le nombre de lignes d'agrégats créées.
+    """
+    deltas = _deltas_groupes(defaultdict(Counter), commandes=Commande.objects.all(), factures=Facture.objects.all())
+
+    with transaction.atomic():
+        StatistiqueJournaliere.objects.all().delete()
+        lignes = StatistiqueJournaliere.objects.bulk_create([
+            StatistiqueJournaliere(
+                jour=jour,
+                produit_id=produit_id,
+                fournisseur_id=fournisseur_id,
+                agent_utilisateur_id=agent_id,
+                **compteurs,
+            )
+            for (jour, produit_id, fournisseur_id, agent_id), compteurs in deltas.items()
+        ], batch_size=1000)
+    return len(lignes)
+
+
+# ---------- Lecture ----------
+
+def totaux(**filtres):
+    """
+    Somme des agrégats (filtrés par ex. par fournisseur=..., jour__gte=...).
+
+    Retourne un dictionnaire avec tous les CHAMPS, plus 'nb_factures' et
+    'montant_factures' (tous statuts).
+    """
+    agregats = StatistiqueJournaliere.objects.filter(**filtres).aggregate(
+        **{champ: Sum(champ) for champ in CHAMPS}
+    )
+    return _completer_totaux(agregats)
+
+
+async def atotaux(**filtres):
+    """Variante asynchrone de `totaux` (ORM asynchrone)."""
+    agregats = await StatistiqueJournaliere.objects.filter(**filtres).aaggregate(
+        **{champ: Sum(champ) for champ in CHAMPS}
+    )
+    return _completer_totaux(agregats)
+
+
+def _completer_totaux(agregats):
+    resultat = {champ: valeur or 0 for champ, valeur in agregats.items()}
+    resultat['nb_factures'] = sum(resultat[f'nb_factures_{statut}'] for statut in STATUTS_FACTURE)
+    resultat['montant_factures'] = sum(resultat[f'montant_factures_{statut}'] for statut in STATUTS_FACTURE)
+    return resultat
+
+
+def factures_par_statut(stats):
+    """Liste [{'statut', 'count'}] des statuts présents, à partir de totaux()."""
+    return [
+        {'statut': statut, 'count': stats[f'nb_factures_{statut}']}
+        for statut in STATUTS_FACTURE
+        if stats[f'nb_factures_{statut}']
+    ]
+
+
+def produits_les_plus_commandes(limite=5):
+    """Produits actifs les plus commandés (annotés nombre_commandes, quantite_totale)."""
+    return (
+        Produit.objects
+        .annotate(
+            nombre_commandes=Sum('statistiques__nb_commandes'),
+            quantite_totale=Sum('statistiques__quantite_commandee'),
+        )
+        .filter(nombre_commandes__gt=0)
+        .order_by('-nombre_commandes')[:limite]
+    )
+
+
+# ---------- Fournisseurs ----------
+
+def annoter_fournisseurs(queryset=None):
+    """
+    Annote chaque fournisseur avec ses statistiques, en une requête groupée :
+    produits_count (produits actifs), commandes_count, factures_count,
+    factures_payees et montant_total (somme des factures), sans les
+    commandes ni les factures supprimées.
+
+    La jointure fournisseur → produits → commandes → facture est une chaîne
+    (une facture par commande, un produit par commande) : seules les
+    lignes de produits sont répétées, d'où le DISTINCT sur leur comptage.
+    """
+    if queryset is None:
+        queryset = Fournisseur.objects.all()
+    commandes = 'produits_fournis__commandes'
+    factures = f'{commandes}__facture'
+    # Les jointures n'appliquent pas les managers par défaut : les lignes
+    # supprimées logiquement sont exclues explicitement.
+    commande_active = Q(**{f'{commandes}__is_deleted': False})
+    facture_active = Q(**{f'{factures}__is_deleted': False})
+    return queryset.annotate(
+        produits_count=Count('produits_fournis', filter=Q(produits_fournis__is_deleted=False), distinct=True),
+        commandes_count=Count(commandes, filter=commande_active),
+        factures_count=Count(factures, filter=facture_active),
+        factures_payees=Count(factures, filter=facture_active & Q(**{f'{factures}__statut': 'payee'})),
+        montant_total=Coalesce(Sum(f'{factures}__montant_total', filter=facture_active), Value(0.0), output_field=FloatField()),
+    )
+
+
+def statistiques_fournisseur(fournisseur):
+    """Statistiques d'un seul fournisseur (dictionnaire, une requête)."""
+    return annoter_fournisseurs(Fournisseur.objects.filter(pk=fournisseur.pk)).values(
+        'produits_count', 'commandes_count', 'factures_count', 'factures_payees', 'montant_total'
+    ).get()
+
+
+def stats_agents_fournisseur(fournisseur):
+    """
+    Statistiques par agent des commandes passées sur les produits d'un fournisseur.
+
+    Deux requêtes quel que soit le nombre d'agents : une requête groupée par
+    agent (montants calculés en SQL, quantite_cmd * prix_unit) puis le
+    chargement des agents. Retourne une liste de dictionnaires triée par nom
+    d'utilisateur : agent, commandes_count, montant_commandes,
+    factures_count, payees, non_payees (brouillon ou validée) et
+    montant_factures. Les commandes supprimées (manager par défaut) et leurs
+    factures sont ignorées, ainsi que les factures supprimées.
+    """
+    facture_active = Q(facture__is_deleted=False)
+    lignes = (
+        Commande.objects
+        .filter(code_prod__fournisseur=fournisseur, agent_utilisateur__isnull=False)
+        .values('agent_utilisateur')
+        .annotate(
+            commandes_count=Count('code_cmd'),
+            montant_commandes=Coalesce(Sum(expression_montant()), Value(0.0)),
+            factures_count=Count('facture', filter=facture_active),
+            payees=Count('facture', filter=facture_active & Q(facture__statut='payee')),
+            non_payees=Count('facture', filter=facture_active & Q(facture__statut__in=['brouillon', 'validee'])),
+            montant_factures=Coalesce(Sum('facture__montant_total', filter=facture_active), Value(0.0)),
+        )
+        .order_by()
+    )
+    lignes = list(lignes)
+
+    agents = User.objects.in_bulk([ligne['agent_utilisateur'] for ligne in lignes])
+    stats = []
+    for ligne in lignes:
+        ligne['agent'] = agents[ligne.pop('agent_utilisateur')]
+        stats.append(ligne)
+    stats.sort(key=lambda ligne: ligne['agent'].username)
+    return stats
+
+
+# ---------- Répartitions ----------
+
+# Nom -> (modèle, champ réparti, montant sommé ou None, lookups des portées)
+REPARTITIONS = {
+    'factures': (Facture, 'statut', 'montant_total', {
+        'agent': 'agent_utilisateur',
+        'fournisseur': 'commande__code_prod__fournisseur',
+    }),
+    'commandes': (Commande, 'statut_paiement', expression_montant(), {
+        'agent': 'agent_utilisateur',
+        'fournisseur': 'code_prod__fournisseur',
+    }),
+    'notifications': (Notification, 'type_notification', None, {
+        'fournisseur': 'produit__fournisseur',
+    }),
+}
+
+
+def _requete_repartition(nom, queryset=None, **portee):
+    """Requête groupée d'une répartition : (source, valeur, nombre, montant) par valeur."""
+    modele, champ, montant, lookups = REPARTITIONS[nom]
+    if set(portee) - set(lookups):
+        raise ValueError(f'Portée invalide pour {nom} : {portee}')
+    if queryset is None:
+        queryset = modele.objects.all()
+    queryset = queryset.filter(**{lookups[cle]: valeur for cle, valeur in portee.items()})
+    return (
+        queryset.order_by()
+        .values(valeur=F(champ))
+        .annotate(
+            source=Value(nom, output_field=CharField()),
+            nombre=Count('pk'),
+            montant=Coalesce(Sum(montant), Value(0.0)) if montant is not None else Value(0.0, output_field=FloatField()),
+        )
+        .values('source', 'valeur', 'nombre', 'montant')
+    )
+
+
+def _plan_repartitions(demandes):
+    premiere, *autres = [_requete_repartition(nom, **portee) for nom, portee in demandes.items()]
+    return premiere.union(*autres, all=True) if autres else premiere
+
+
+def _resultats_repartitions(demandes, lignes):
+    resultats = {}
+    for nom in demandes:
+        modele, champ, _, _ = REPARTITIONS[nom]
+        resultats[nom] = {
+            valeur: {'nombre': 0, 'montant': 0.0}
+            for valeur, _ in modele._meta.get_field(champ).choices
+        }
+    for ligne in lignes:
+        resultats[ligne['source']][ligne['valeur']] = {'nombre': ligne['nombre'], 'montant': ligne['montant']}
+    return {
+        nom: {
+            'nombre': sum(compteurs['nombre'] for compteurs in par_valeur.values()),
+            'montant': sum(compteurs['montant'] for compteurs in par_valeur.values()),
+            'par_valeur': par_valeur,
+        }
+        for nom, par_valeur in resultats.items()
+    }
+
+
+def repartitions(**demandes):
+    """
+    Nombre et montant par valeur (statut, type...) de plusieurs sources de
+    REPARTITIONS, en une seule requête (UNION ALL des requêtes groupées).
+
+    Chaque demande est un dictionnaire de portée : agent=..., fournisseur=...
+    (si la source le permet) et/ou queryset=... (lignes de départ, manager
+    par défaut sinon). Par exemple :
+
+        repartitions(factures={'agent': user}, commandes={})
+
+    Retourne {source: {'nombre', 'montant', 'par_valeur': {valeur: {'nombre', 'montant'}}}},
+    avec toutes les valeurs possibles du champ (0 si absentes) ; le montant
+    vaut 0.0 pour les notifications.
+    """
+    return _resultats_repartitions(demandes, _plan_repartitions(demandes))
+
+
+async def arepartitions(**demandes):
+    """Variante asynchrone de `repartitions` (ORM asynchrone)."""
+    return _resultats_repartitions(demandes, [ligne async for ligne in _plan_repartitions(demandes)])
+
+
+def repartition(nom, **portee):
+    """Répartition d'une seule source (voir `repartitions`)."""
+    return repartitions(**{nom: portee})[nom]
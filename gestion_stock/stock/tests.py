@@ -1,3 +1,1229 @@
-from django.test import TestCase
+"""
+Tests de la logique métier de l'application stock.
+"""
+import asyncio
+import contextlib
+import json
+import os
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
+from stock.emails import mettre_en_file, traiter_file
+from stock.instrumentation import BudgetRequetesDepasse, MesureRequetes, empreinte
+from stock.models import Produit, Commande, Facture, Fournisseur, ProduitFournisseur, AlerteFournisseur, EmailSortant, Notification, MontantAgent, MouvementMontantAgent, Historique, Archive, StatistiqueJournaliere, MouvementStock, InstantaneStock
+from stock.pagination import PaginateurCurseur
+from stock.paniers import passer_panier
+from stock.pipeline import PipelineCommandes, mesurer_etapes
+from stock.reservations import reserver_stock, liberer_stock, StockInsuffisant
+from stock.views import CommandeListView
+from stock import archivage, compteurs, digests, evenements, metriques, mouvements, statistiques
+
+
+class ReservationStockTests(TestCase):
+    """Tests du service de réservation de stock."""
+
+    def setUp(self):
+        """Préparation."""
+        self.produit = Produit.objects.create(nom_prod="Produit", quantite=5, prix_unit=10.0)
+
+    def test_reservation_decremente_le_stock(self):
+        """Une réservation possible décrémente le stock en base."""
+        self.assertTrue(reserver_stock(self.produit.code_prod, 3))
+        self.produit.refresh_from_db()
+        self.assertEqual(self.produit.quantite, 2)
+
+    def test_reservation_refusee_si_stock_insuffisant(self):
+        """Une réservation impossible ne modifie pas le stock."""
+        self.assertFalse(reserver_stock(self.produit.code_prod, 6))
+        self.produit.refresh_from_db()
+        self.assertEqual(self.produit.quantite, 5)
+
+    def test_liberation_restaure_le_stock(self):
+        """La libération remet les unités en stock."""
+        reserver_stock(self.produit.code_prod, 5)
+        liberer_stock(self.produit.code_prod, 2)
+        self.produit.refresh_from_db()
+        self.assertEqual(self.produit.quantite, 2)
+
+    def test_passer_commande_stock_insuffisant(self):
+        """La vue agent ne crée pas de commande si le stock manque."""
+        User.objects.create_user(username='agent', password='agent123')
+        client = Client()
+        client.login(username='agent', password='agent123')
+
+        url = reverse('stock:passer_commande', args=[self.produit.code_prod])
+        client.post(url, {'quantite': 4})
+        client.post(url, {'quantite': 4})
+
+        self.produit.refresh_from_db()
+        self.assertEqual(self.produit.quantite, 1)
+        self.assertEqual(Commande.objects.filter(code_prod=self.produit).count(), 1)
+
+    def test_supprimer_commande_restaure_le_stock(self):
+        """La vue de suppression libère le stock, archive la commande et l'inscrit à l'historique."""
+        User.objects.create_user(username='admin', password='admin123', is_staff=True)
+        self.client.login(username='admin', password='admin123')
+        reserver_stock(self.produit.code_prod, 3)
+        commande = Commande.objects.create(code_prod=self.produit, quantite_cmd=3)
+
+        reponse = self.client.post(reverse('stock:commande_delete', args=[commande.pk]))
+
+        self.assertRedirects(reponse, reverse('stock:commande_list'), fetch_redirect_response=False)
+        self.produit.refresh_from_db()
+        self.assertEqual(self.produit.quantite, 5)
+        self.assertTrue(Commande.all_objects.get(pk=commande.pk).is_deleted)
+        historique = Historique.objects.get(type_objet='commande', id_objet=commande.pk)
+        self.assertEqual(historique.donnees_supprimees['quantite_cmd'], 3)
+        self.assertFalse(Commande.objects.filter(code_prod=self.produit).exists())
+
+
+class PanierTests(TestCase):
+    """Tests des paniers multi-produits."""
+
+    def setUp(self):
+        """Préparation."""
+        self.agent = User.objects.create_user(username='agent', password='agent123')
+        self.produits = [
+            Produit.objects.create(nom_prod=f"Produit {i}", quantite=10, prix_unit=2.0)
+            for i in range(3)
+        ]
+
+    def test_panier_une_facture_pour_toutes_les_lignes(self):
+        """Un panier crée une ligne par produit et une seule facture."""
+        panier = passer_panier(self.agent, {p.code_prod: 4 for p in self.produits})
+
+        self.assertEqual(panier.lignes.count(), 3)
+        self.assertEqual(Facture.objects.count(), 1)
+        self.assertEqual(panier.facture.montant_total, 24.0)
+        for produit in self.produits:
+            produit.refresh_from_db()
+            self.assertEqual(produit.quantite, 6)
+
+    def test_panier_tout_ou_rien(self):
+        """Si une ligne est impossible, aucune ligne n'est réservée."""
+        quantites = {p.code_prod: 4 for p in self.produits}
+        quantites[self.produits[1].code_prod] = 11
+
+        with self.assertRaises(StockInsuffisant) as erreur:
+            passer_panier(self.agent, quantites)
+
+        self.assertEqual(erreur.exception.produit_id, self.produits[1].code_prod)
+        self.assertFalse(Commande.objects.exists())
+        for produit in self.produits:
+            produit.refresh_from_db()
+            self.assertEqual(produit.quantite, 10)
+
+
+class PipelineCommandesTests(TestCase):
+    """Tests du pipeline des effets de bord des commandes."""
+
+    def setUp(self):
+        """Préparation."""
+        cache.clear()
+        self.agent = User.objects.create_user(username='agent', password='agent123')
+        self.produit = Produit.objects.create(nom_prod="Produit", quantite=0, prix_unit=3.0)
+
+    def test_effets_d_une_commande_creee(self):
+        """Une commande créée produit facture, confirmation, alerte et montant agent."""
+        with mesurer_etapes() as mesures:
+            commande = Commande.objects.create(
+                code_prod=self.produit, quantite_cmd=2, agent_utilisateur=self.agent
+            )
+
+        self.assertEqual(set(mesures), set(PipelineCommandes.ETAPES))
+        self.assertEqual(commande.facture.montant_total, 6.0)
+        types = set(Notification.objects.values_list('type_notification', flat=True))
+        self.assertEqual(types, {'commande_confirmee', 'rupture'})
+        self.assertEqual(MontantAgent.montant_pour(self.agent.pk), 6.0)
+
+    def test_modification_ne_duplique_pas(self):
+        """Une modification ne recrée ni facture, ni alerte déjà ouverte."""
+        commande = Commande.objects.create(code_prod=self.produit, quantite_cmd=1)
+        commande.quantite_cmd = 3
+        commande.save()
+
+        self.assertEqual(Facture.objects.count(), 1)
+        self.assertEqual(Notification.objects.filter(type_notification='rupture').count(), 1)
+
+    def test_factures_journalisees_en_debug(self):
+        """Les factures créées sont journalisées au niveau DEBUG, pas sur la sortie standard."""
+        with self.assertLogs('stock.pipeline', level='DEBUG') as journal:
+            commande = Commande.objects.create(code_prod=self.produit, quantite_cmd=1)
+
+        self.assertEqual(journal.output, [
+            f"DEBUG:stock.pipeline:Facture #{commande.facture.code_facture} créée automatiquement pour Commande #{commande.pk}"
+        ])
+
+
+class AlertesStockTests(TestCase):
+    """Alertes au franchissement du seuil, regroupées par fenêtre."""
+
+    def setUp(self):
+        """Préparation : seuil d'alerte à 5."""
+        cache.clear()
+        self.produit = Produit.objects.create(nom_prod="Produit", quantite=10, prix_unit=3.0, seuil_alerte=5)
+
+    def commander(self, quantite):
+        """Réserve puis enregistre une commande, comme les vues (rappels de commit exécutés)."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(reserver_stock(self.produit.code_prod, quantite))
+            Commande.objects.create(code_prod=self.produit, quantite_cmd=quantite)
+
+    def alertes(self):
+        return list(
+            Notification.objects.filter(type_notification__in=['alerte_basse', 'rupture'])
+            .order_by('code_notification').values_list('type_notification', flat=True)
+        )
+
+    def test_alerte_au_franchissement(self):
+        """Une alerte par niveau franchi, rien tant que le stock reste du même côté."""
+        self.commander(3)
+        self.assertEqual(self.alertes(), [])
+        self.commander(3)
+        self.assertEqual(self.alertes(), ['alerte_basse'])
+
+        # Sous le seuil sans changer de niveau : aucune requête sur les notifications
+        self.assertTrue(reserver_stock(self.produit.code_prod, 1))
+        with CaptureQueriesContext(connection) as requetes:
+            Commande.objects.create(code_prod=self.produit, quantite_cmd=1)
+        self.assertFalse([q for q in requetes.captured_queries if 'stock_notification' in q['sql'] and 'SELECT' in q['sql']])
+
+        self.commander(3)
+        self.assertEqual(self.alertes(), ['alerte_basse', 'rupture'])
+
+    def test_regroupement_par_fenetre(self):
+        """Un nouveau franchissement dans la fenêtre ne recrée pas l'alerte, même traitée."""
+        self.commander(6)
+        Notification.objects.update(est_traitee=True)
+        liberer_stock(self.produit.code_prod, 6)
+
+        self.commander(6)
+        self.assertEqual(self.alertes(), ['alerte_basse'])
+
+        cache.clear()
+        liberer_stock(self.produit.code_prod, 6)
+        self.commander(6)
+        self.assertEqual(self.alertes(), ['alerte_basse', 'alerte_basse'])
+
+    def test_commande_annulee_ne_reserve_pas_la_fenetre(self):
+        """Un franchissement annulé par rollback laisse alerter le suivant."""
+        with self.captureOnCommitCallbacks(execute=True), contextlib.suppress(RuntimeError), transaction.atomic():
+            self.assertTrue(reserver_stock(self.produit.code_prod, 6))
+            Commande.objects.create(code_prod=self.produit, quantite_cmd=6)
+            raise RuntimeError('annulation')
+        self.assertEqual(self.alertes(), [])
+
+        self.commander(6)
+        self.assertEqual(self.alertes(), ['alerte_basse'])
+
+
+class DigestFournisseursTests(TestCase):
+    """Un email récapitulatif par fournisseur et par intervalle."""
+
+    def setUp(self):
+        """Préparation : 30 produits d'un même fournisseur, dont 10 aussi chez un second."""
+        cache.clear()
+        self.agent = User.objects.create_user(username='agent')
+        self.grossiste = Fournisseur.objects.create(code_fournisseur='G', nom_fournisseur='Grossiste', email='g@test.com')
+        self.second = Fournisseur.objects.create(code_fournisseur='S', nom_fournisseur='Second', email='s@test.com')
+        self.produits = [Produit.objects.create(nom_prod=f"Produit {i:02}", quantite=2, prix_unit=1.0) for i in range(30)]
+        for i, produit in enumerate(self.produits):
+            ProduitFournisseur.objects.create(produit=produit, fournisseur=self.grossiste, prix_fournisseur=0.5, quantite_min=10)
+            if i < 10:
+                ProduitFournisseur.objects.create(produit=produit, fournisseur=self.second, prix_fournisseur=0.6)
+
+    def test_un_digest_par_fournisseur(self):
+        """30 ruptures : 2 emails et 2 notifications au lieu de 40 de chaque."""
+        passer_panier(self.agent, {produit.code_prod: 2 for produit in self.produits})
+        self.assertEqual(AlerteFournisseur.objects.filter(date_envoi__isnull=True).count(), 40)
+        self.assertFalse(EmailSortant.objects.exists())
+
+        # Réapprovisionné avant l'envoi : retiré du digest
+        Produit.objects.filter(pk=self.produits[0].pk).update(quantite=5)
+
+        self.assertEqual(digests.envoyer_digests(), 2)
+        email = EmailSortant.objects.get(destinataire='g@test.com')
+        self.assertEqual(email.message.count('📦'), 29)
+        self.assertNotIn('Produit 00', email.message)
+        self.assertEqual(EmailSortant.objects.count(), 2)
+        self.assertEqual(Notification.objects.filter(type_notification='fournisseur_contact').count(), 2)
+
+    def test_intervalle(self):
+        """Les ruptures suivantes attendent l'intervalle du fournisseur."""
+        passer_panier(self.agent, {self.produits[0].code_prod: 2})
+        self.assertEqual(digests.envoyer_digests(), 2)
+        self.assertEqual(digests.envoyer_digests(), 0)
+
+        passer_panier(self.agent, {self.produits[20].code_prod: 2})
+        self.assertEqual(digests.envoyer_digests(), 0)
+        self.assertEqual(digests.envoyer_digests(intervalle=timedelta(0)), 1)
+        self.assertEqual(EmailSortant.objects.filter(destinataire='g@test.com').count(), 2)
+
+
+class NotificationsEnLotTests(TestCase):
+    """Marquage et purge des notifications en une requête."""
+
+    def setUp(self):
+        """Préparation : 3 notifications sur un produit, 2 sur un autre."""
+        cache.clear()
+        self.fournisseur = Fournisseur.objects.create(code_fournisseur='F', nom_fournisseur='Fournisseur', email='f@test.com')
+        self.produit = Produit.objects.create(nom_prod="Produit", quantite=10, prix_unit=1.0)
+        self.autre = Produit.objects.create(nom_prod="Autre", quantite=10, prix_unit=1.0)
+        Notification.objects.bulk_create(
+            [Notification(type_notification='rupture', produit=self.produit, fournisseur=self.fournisseur, titre='t', message='m') for _ in range(3)]
+            + [Notification(type_notification='rupture', produit=self.autre, titre='t', message='m') for _ in range(2)]
+        )
+
+    def test_marquer_en_une_requete(self):
+        """Un seul UPDATE, dates renseignées, les lignes déjà marquées ne comptent pas."""
+        with CaptureQueriesContext(connection) as requetes:
+            self.assertEqual(Notification.objects.filter(produit=self.produit).marquer_lues(), 3)
+        self.assertEqual(len([q for q in requetes.captured_queries if q['sql'].startswith('UPDATE "stock_notification"')]), 1)
+        self.assertFalse([q for q in requetes.captured_queries if q['sql'].startswith('SELECT') and 'COUNT' not in q['sql']])
+        self.assertEqual(Notification.objects.filter(est_lue=True, date_lecture__isnull=False).count(), 3)
+        self.assertEqual(Notification.objects.marquer_lues(), 2)
+        self.assertEqual(Notification.objects.marquer_traitees(), 5)
+
+    def test_marquer_lues_par_fournisseur(self):
+        """L'endpoint marque les notifications d'un fournisseur ; refusé aux agents."""
+        client = Client()
+        url = reverse('stock:marquer_notifications_lues')
+        client.force_login(User.objects.create_user(username='agent'))
+        self.assertEqual(client.post(url, {'produit': self.produit.pk}).status_code, 403)
+
+        client.force_login(User.objects.create_user(username='admin', is_staff=True))
+        self.assertEqual(client.post(url).status_code, 400)
+        reponse = client.post(url, {'fournisseur': self.fournisseur.pk})
+        self.assertEqual(reponse.json(), {'modifiees': 3})
+        self.assertEqual(Notification.objects.filter(est_lue=False, produit=self.autre).count(), 2)
+
+    def test_purge(self):
+        """Seules les notifications traitées avant la date sont supprimées, par lots."""
+        Notification.objects.filter(produit=self.produit).marquer_traitees()
+        Notification.objects.filter(produit=self.autre).update(
+            est_traitee=True, date_traitement=timezone.now() + timedelta(days=1)
+        )
+        self.assertEqual(Notification.objects.purger(timezone.now() + timedelta(seconds=1), taille_lot=2), 3)
+        self.assertEqual(Notification.objects.count(), 2)
+
+
+class CompteursNotificationsTests(TestCase):
+    """Compteurs de notifications non lues / non traitées (stock.compteurs)."""
+
+    def setUp(self):
+        """Préparation : un produit du fournisseur F, une rupture et deux contacts."""
+        cache.clear()
+        self.fournisseur = Fournisseur.objects.create(code_fournisseur='F', nom_fournisseur='Fournisseur', email='f@test.com')
+        self.produit = Produit.objects.create(nom_prod="Produit", quantite=0, prix_unit=1.0, fournisseur=self.fournisseur)
+        self.rupture = self.notifier('rupture')
+        self.contacts = [self.notifier('fournisseur_contact', fournisseur=self.fournisseur) for _ in range(2)]
+
+    def notifier(self, type_notification, **champs):
+        return Notification.objects.create(type_notification=type_notification, produit=self.produit, titre='t', message='m', **champs)
+
+    def verifier(self, non_lues, non_traitees, **portee):
+        """Compare les totaux servis à ceux recalculés depuis les notifications."""
+        totaux = compteurs.totaux(**portee)
+        self.assertEqual((totaux['non_lues'], totaux['non_traitees']), (non_lues, non_traitees))
+        cache.clear()
+        compteurs.reconstruire()
+        self.assertEqual(compteurs.totaux(**portee), totaux)
+
+    def test_increments(self):
+        """Création, marquage unitaire et en lot, suppression : les totaux suivent."""
+        self.verifier(3, 3)
+        self.verifier(2, 2, destinataire=self.fournisseur.pk)
+        self.assertEqual(compteurs.totaux()['par_type']['rupture'], {'non_lues': 1, 'non_traitees': 1})
+
+        self.rupture.marquer_comme_lue()
+        self.verifier(2, 3)
+        Notification.objects.filter(fournisseur=self.fournisseur).marquer_traitees()
+        self.verifier(2, 1, fournisseur_produit=self.fournisseur.pk)
+        self.contacts[0].delete()
+        self.verifier(1, 1)
+        Notification.objects.all().delete()
+        self.verifier(0, 0)
+
+    def test_changement_de_fournisseur(self):
+        """Changer le fournisseur d'un produit déplace les compteurs de ses notifications."""
+        autre = Fournisseur.objects.create(code_fournisseur='A', nom_fournisseur='Autre', email='a@test.com')
+        self.verifier(3, 3, fournisseur_produit=self.fournisseur.pk)
+
+        self.produit.fournisseur = autre
+        self.produit.save()
+
+        self.verifier(0, 0, fournisseur_produit=self.fournisseur.pk)
+        self.verifier(3, 3, fournisseur_produit=autre.pk)
+        self.verifier(2, 2, destinataire=self.fournisseur.pk)
+
+    def test_save_produit_une_lecture(self):
+        """Un save() du produit ne relit sa ligne qu'une fois pour tous les receivers."""
+        self.produit.nom_prod = "Renommé"
+        with CaptureQueriesContext(connection) as requetes:
+            self.produit.save()
+        lectures = [q for q in requetes.captured_queries if q['sql'].startswith('SELECT') and 'FROM "stock_produit"' in q['sql']]
+        self.assertEqual(len(lectures), 1)
+
+    def test_pipeline_et_cache(self):
+        """Les notifications du pipeline sont comptées ; la lecture suivante vient du cache."""
+        self.produit.quantite = 5
+        self.produit.save()
+        Commande.objects.create(code_prod=self.produit, quantite_cmd=5)
+        self.verifier(5, 5)
+
+        compteurs.totaux()
+        with self.assertNumQueries(0):
+            self.assertEqual(compteurs.totaux()['non_lues'], 5)
+
+    def test_endpoint(self):
+        """Un fournisseur ne voit que ses compteurs ; refusé aux agents."""
+        client = Client()
+        url = reverse('stock:compteurs_notifications')
+        client.force_login(User.objects.create_user(username='agent'))
+        self.assertEqual(client.get(url).status_code, 403)
+
+        utilisateur = User.objects.create_user(username='fournisseur')
+        utilisateur.groups.create(name='Fournisseur')
+        self.fournisseur.user = utilisateur
+        self.fournisseur.save()
+        client.force_login(utilisateur)
+        self.assertEqual(client.get(url).json()['non_lues'], 2)
+
+        client.force_login(User.objects.create_user(username='admin', is_staff=True))
+        self.assertEqual(client.get(url).json()['non_lues'], 3)
+        self.assertEqual(client.get(url, {'fournisseur': 'F'}).json()['par_type']['fournisseur_contact']['non_lues'], 2)
+
+
+class EvenementsTests(TestCase):
+    """Flux d'événements en direct (stock.evenements)."""
+
+    def setUp(self):
+        """Préparation : un produit du fournisseur F et un agent."""
+        cache.clear()
+        self.fournisseur = Fournisseur.objects.create(code_fournisseur='F', nom_fournisseur='Fournisseur', email='f@test.com')
+        self.produit = Produit.objects.create(nom_prod="Produit", quantite=5, prix_unit=1.0, fournisseur=self.fournisseur)
+        self.agent = User.objects.create_user(username='agent')
+
+    def abonner(self, boucle, **filtres):
+        abonnement = evenements.abonner(boucle=boucle, **filtres)
+        self.addCleanup(evenements.desabonner, abonnement)
+        return abonnement
+
+    def test_publication_filtree_au_commit(self):
+        """Le pipeline et le journal du stock publient au commit, filtrés par abonné."""
+        boucle = asyncio.new_event_loop()
+        self.addCleanup(boucle.close)
+        tous = self.abonner(boucle)
+        fournisseur = self.abonner(boucle, fournisseur='F')
+        autre = self.abonner(boucle, fournisseur='G')
+        agent = self.abonner(boucle, agent=self.agent.pk)
+
+        with self.captureOnCommitCallbacks(execute=True) as rappels:
+            reserver_stock(self.produit.code_prod, 5)
+            Commande.objects.create(code_prod=self.produit, quantite_cmd=5, agent_utilisateur=self.agent)
+            self.assertTrue(tous.file.empty())
+        self.assertTrue(rappels)
+        boucle.run_until_complete(asyncio.sleep(0))
+
+        def recus(abonnement):
+            evts = []
+            while not abonnement.file.empty():
+                evts.append(abonnement.file.get_nowait())
+            return evts
+
+        evts = recus(tous)
+        self.assertEqual([evt['type'] for evt in evts][:2], ['stock', 'commande'])
+        self.assertEqual(evts[0]['donnees']['quantite'], 0)
+        self.assertIn('rupture', [evt['donnees'].get('type_notification') for evt in evts])
+        self.assertEqual(len(recus(fournisseur)), len(evts))
+        self.assertEqual(recus(autre), [])
+        self.assertEqual([evt['type'] for evt in recus(agent)], ['stock', 'commande'])
+
+    def test_sans_abonne_aucune_publication(self):
+        """Sans abonné, rien n'est programmé au commit."""
+        with self.captureOnCommitCallbacks() as rappels:
+            reserver_stock(self.produit.code_prod, 1)
+            Commande.objects.create(code_prod=self.produit, quantite_cmd=1)
+        self.assertFalse([rappel for rappel in rappels if getattr(rappel, '__module__', '') == 'stock.evenements'])
+        self.assertEqual(evenements.abonnes(), 0)
+
+    def test_wsgi_refuse(self):
+        """Sous WSGI, le flux n'est pas servi."""
+        client = Client()
+        client.force_login(self.agent)
+        self.assertEqual(client.get(reverse('stock:flux_evenements')).status_code, 501)
+
+    async def test_flux_asgi(self):
+        """Le flux envoie les événements de l'abonné et se désabonne à la déconnexion."""
+        utilisateur = await User.objects.acreate(username='admin', is_staff=True)
+        await self.async_client.aforce_login(utilisateur)
+        reponse = await self.async_client.get(reverse('stock:flux_evenements'))
+        self.assertEqual(reponse['Content-Type'], 'text/event-stream')
+
+        contenu = aiter(reponse.streaming_content)
+        self.assertEqual(await anext(contenu), b'retry: 5000\n\n')
+        self.assertEqual(evenements.abonnes(), 1)
+        evenements.publier([evenements.evenement('stock', {'produit': 1, 'quantite': 3}, fournisseurs=['F'])])
+        self.assertRegex(await anext(contenu), rb'^id: \d+\nevent: stock\ndata: \{"produit": 1, "quantite": 3\}\n\n$')
+
+        # Déconnexion du client : le serveur annule la lecture en cours
+        lecture = asyncio.ensure_future(anext(contenu))
+        await asyncio.sleep(0)
+        lecture.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await lecture
+        self.assertEqual(evenements.abonnes(), 0)
+
+
+class VariantesAsynchronesTests(TestCase):
+    """Les vues asynchrones (ASGI) retournent les mêmes données que les vues synchrones."""
+
+    def setUp(self):
+        """Préparation : un fournisseur, un agent et deux commandes."""
+        cache.clear()
+        self.admin = User.objects.create_user(username='admin', is_staff=True)
+        self.agent = User.objects.create_user(username='agent')
+        self.utilisateur_fournisseur = User.objects.create_user(username='fournisseur')
+        self.utilisateur_fournisseur.groups.create(name='Fournisseur')
+        fournisseur = Fournisseur.objects.create(
+            code_fournisseur='F', nom_fournisseur='Fournisseur', email='f@test.com', user=self.utilisateur_fournisseur
+        )
+        produit = Produit.objects.create(nom_prod="Produit", quantite=3, prix_unit=2.0, fournisseur=fournisseur)
+        Produit.objects.create(nom_prod="Épuisé", quantite=0, prix_unit=1.0)
+        for quantite in (1, 2):
+            Commande.objects.create(code_prod=produit, quantite_cmd=quantite, agent_utilisateur=self.agent)
+
+    @staticmethod
+    def donnees(contexte, cles):
+        """Valeurs comparables du contexte : clés primaires pour les listes."""
+        return {
+            cle: [objet.pk for objet in contexte[cle]] if hasattr(contexte[cle], '__len__') and not isinstance(contexte[cle], dict) else contexte[cle]
+            for cle in cles
+        }
+
+    async def comparer(self, utilisateur, synchrone, asynchrone, cles):
+        await sync_to_async(self.client.force_login)(utilisateur)
+        await self.async_client.aforce_login(utilisateur)
+        attendu = await sync_to_async(self.client.get)(reverse(synchrone))
+        obtenu = await self.async_client.get(reverse(asynchrone))
+        self.assertEqual(obtenu.status_code, 200)
+        self.assertEqual(self.donnees(obtenu.context, cles), self.donnees(attendu.context, cles))
+
+    async def test_dashboards(self):
+        """Même contexte pour les trois dashboards."""
+        await self.comparer(self.admin, 'stock:dashboard', 'stock:dashboard_async', [
+            'total_produits', 'total_commandes', 'total_factures', 'factures_impayees',
+            'dernieres_commandes', 'produits_rupture', 'compteurs_notifications',
+        ])
+        await self.comparer(self.agent, 'stock:agent_dashboard', 'stock:agent_dashboard_async', [
+            'produits', 'commandes', 'factures', 'montant_total_commandes', 'montant_total_factures',
+            'montant_agent', 'nombre_commandes', 'nombre_factures',
+        ])
+        await self.comparer(self.utilisateur_fournisseur, 'stock:fournisseur_dashboard', 'stock:fournisseur_dashboard_async', [
+            'produits', 'commandes', 'factures', 'total_produits', 'total_commandes',
+            'montant_total_commandes', 'montant_payees', 'montant_non_payees', 'compteurs_notifications',
+        ])
+
+    async def test_graphiques(self):
+        """Même JSON ; refusé aux non-administrateurs."""
+        await self.async_client.aforce_login(self.agent)
+        url = reverse('stock:agent_graphs_data_async', args=[self.agent.pk])
+        self.assertEqual((await self.async_client.get(url)).status_code, 403)
+
+        await sync_to_async(self.client.force_login)(self.admin)
+        await self.async_client.aforce_login(self.admin)
+        attendu = await sync_to_async(self.client.get)(reverse('stock:agent_graphs_data', args=[self.agent.pk]))
+        self.assertEqual((await self.async_client.get(url)).json(), attendu.json())
+        self.assertEqual((await self.async_client.get(reverse('stock:agent_graphs_data_async', args=[self.admin.pk]))).status_code, 404)
+
+
+class InstrumentationTests(TestCase):
+    """Mesure des requêtes SQL par requête HTTP et budgets par nom d'URL."""
+
+    def setUp(self):
+        """Préparation : un administrateur et quelques commandes de plusieurs agents."""
+        self.admin = User.objects.create_superuser(username='admin', email='admin@test.com', password='admin123')
+        self.agent = User.objects.create_user(username='agent0')
+        for i in range(4):
+            agent = User.objects.create_user(username=f'agent{i + 1}')
+            fournisseur = Fournisseur.objects.create(code_fournisseur=f'F{i}', nom_fournisseur=f'F{i}', email=f'f{i}@test.com')
+            produit = Produit.objects.create(nom_prod=f"Produit {i}", quantite=10, prix_unit=2.0, fournisseur=fournisseur)
+            Commande.objects.create(code_prod=produit, quantite_cmd=1, agent_utilisateur=agent)
+        self.client.force_login(self.admin)
+
+    def test_server_timing_et_journal(self):
+        """Nombre de requêtes et temps SQL dans l'en-tête Server-Timing et la ligne de journal."""
+        with self.assertLogs('stock.requetes', 'INFO') as journal, CaptureQueriesContext(connection) as requetes:
+            reponse = self.client.get(reverse('stock:commande_list'))
+
+        self.assertRegex(reponse['Server-Timing'], rf'^sql;dur=[\d.]+;desc="{len(requetes)} requetes, \d+ doublons", total;dur=[\d.]+$')
+        ligne = json.loads(journal.records[-1].getMessage())
+        self.assertEqual((ligne['vue'], ligne['statut'], ligne['requetes']), ('stock:commande_list', 200, len(requetes)))
+        self.assertEqual(len(ligne['plus_lentes']), 3)
+
+    async def test_vue_asynchrone(self):
+        """Les requêtes de l'ORM asynchrone (autre thread) sont comptées."""
+        await self.async_client.aforce_login(self.admin)
+        reponse = await self.async_client.get(reverse('stock:dashboard_async'))
+        nombre = int(reponse['Server-Timing'].split('desc="')[1].split()[0])
+        # Au-delà de la session et de l'utilisateur : les requêtes du dashboard
+        self.assertGreater(nombre, 2)
+
+    def test_doublons(self):
+        """Les requêtes identiques aux paramètres près ont la même empreinte."""
+        self.assertEqual(
+            empreinte('SELECT * FROM "t" WHERE "id" IN (%s, %s, %s) LIMIT 21'),
+            empreinte('SELECT * FROM "t" WHERE "id" IN (%s, %s) LIMIT 21'),
+        )
+        mesure = MesureRequetes()
+        for sql in ('SELECT a WHERE id = %s', 'SELECT a WHERE id = %s', 'SELECT b'):
+            mesure(lambda *args: None, sql, (1,), False, {})
+        self.assertEqual(mesure.doublons(), [('SELECT a WHERE id = %s', 2)])
+
+    @override_settings(STOCK_BUDGETS_STRICTS=True)
+    def test_budgets(self):
+        """Les pages avec un budget le respectent (un N+1 le dépasserait avec plusieurs lignes)."""
+        for nom_url in settings.STOCK_BUDGETS_REQUETES:
+            with self.subTest(nom_url):
+                args = [self.agent.pk] if nom_url == 'stock:agent_graphs_data' else []
+                self.assertEqual(self.client.get(reverse(nom_url, args=args)).status_code, 200)
+
+        with override_settings(STOCK_BUDGETS_REQUETES={'stock:commande_list': 1}), self.assertLogs('stock.requetes', 'WARNING'):
+            with self.assertRaises(BudgetRequetesDepasse):
+                self.client.get(reverse('stock:commande_list'))
+
+
+class MetriquesTests(TestCase):
+    """Métriques des chemins chauds et exposition au format Prometheus."""
+
+    def setUp(self):
+        """Préparation : un agent et un produit."""
+        self.agent = User.objects.create_user(username='agent', password='agent123')
+        self.produit = Produit.objects.create(nom_prod="Produit", quantite=5, prix_unit=2.0)
+
+    @staticmethod
+    def valeurs(*metriques_etiquettes):
+        """Valeurs actuelles de (métrique, étiquettes) dans ce processus."""
+        return [metrique.valeurs.get(metrique.cle(etiquettes), 0) for metrique, etiquettes in metriques_etiquettes]
+
+    def test_passer_commande(self):
+        """Une commande passée et une commande refusée mettent à jour leurs compteurs."""
+        suivies = [
+            (metriques.PASSER_COMMANDE, {'resultat': 'creee'}),
+            (metriques.PASSER_COMMANDE, {'resultat': 'stock_insuffisant'}),
+            (metriques.COMMANDES, {'origine': 'commande'}),
+            (metriques.RESERVATIONS, {'resultat': 'reussie'}),
+            (metriques.RESERVATIONS, {'resultat': 'insuffisante'}),
+            (metriques.FACTURES, {}),
+            (metriques.NOTIFICATIONS, {'type': 'commande_confirmee'}),
+        ]
+        avant = self.valeurs(*suivies)
+        self.client.force_login(self.agent)
+        url = reverse('stock:passer_commande', args=[self.produit.code_prod])
+        self.client.post(url, {'quantite': 3})
+        self.client.post(url, {'quantite': 3})
+
+        ecarts = [apres - avant for apres, avant in zip(self.valeurs(*suivies), avant)]
+        self.assertEqual(ecarts, [1, 1, 1, 1, 1, 1, Notification.objects.filter(type_notification='commande_confirmee').count()])
+        self.assertGreater(self.valeurs((metriques.VUES, {'vue': 'stock:passer_commande'}))[0][-1], 0)
+
+    def test_connexions(self):
+        """Les connexions réussies et échouées sont comptées."""
+        suivies = [(metriques.CONNEXIONS, {'espace': 'utilisateurs', 'resultat': resultat}) for resultat in ('reussie', 'echec')]
+        avant = self.valeurs(*suivies)
+        self.client.post(reverse('login'), {'username': 'agent', 'password': 'faux'})
+        self.client.post(reverse('login'), {'username': 'agent', 'password': 'agent123'})
+        self.assertEqual([apres - avant for apres, avant in zip(self.valeurs(*suivies), avant)], [1, 1])
+
+    def test_exposition(self):
+        """Texte Prometheus réservé aux administrateurs ou au jeton du collecteur."""
+        url = reverse('stock:metriques')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        with override_settings(STOCK_METRIQUES_JETON='secret'):
+            self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer faux').status_code, 403)
+            reponse = self.client.get(url, HTTP_AUTHORIZATION='Bearer secret')
+
+        self.assertEqual(reponse.status_code, 200)
+        texte = reponse.content.decode()
+        self.assertIn('# TYPE stock_commandes_total counter', texte)
+        self.assertIn('# TYPE stock_vue_secondes histogram', texte)
+        self.assertRegex(texte, r'stock_vue_secondes_bucket\{vue="stock:metriques",le="\+Inf"\} \d+')
+
+    def test_plusieurs_processus(self):
+        """Les compteurs de tous les processus sont additionnés, les jauges des processus terminés ignorées."""
+        with tempfile.TemporaryDirectory() as dossier, override_settings(STOCK_METRIQUES_DOSSIER=dossier):
+            metriques.sauvegarder()
+            self.assertTrue(os.path.exists(os.path.join(dossier, f'{os.getpid()}.json')))
+
+            # Un worker terminé (pid inexistant) : ses compteurs restent acquis
+            with open(os.path.join(dossier, '999999999.json'), 'w') as fichier:
+                json.dump({
+                    'stock_factures_total': [[[], 40]],
+                    'stock_flux_abonnes': [[[], 7]],
+                }, fichier)
+            factures, = self.valeurs((metriques.FACTURES, {}))
+            abonnes, = self.valeurs((metriques.ABONNES_FLUX, {}))
+            totaux = metriques.fusionner()
+
+        self.assertEqual(totaux['stock_factures_total'][()], factures + 40)
+        self.assertEqual(totaux['stock_flux_abonnes'].get((), 0), abonnes)
+
+    def test_ecriture_periodique_hors_requete(self):
+        """Une mise à jour n'écrit rien elle-même ; le thread démon écrit le fichier du processus."""
+        with tempfile.TemporaryDirectory() as dossier, override_settings(STOCK_METRIQUES_DOSSIER=dossier, STOCK_METRIQUES_INTERVALLE=0.01):
+            chemin = os.path.join(dossier, f'{os.getpid()}.json')
+            metriques.FACTURES.inc()
+            self.assertEqual(metriques._ecrivain_pid, os.getpid())
+
+            limite = time.monotonic() + 5
+            while not os.path.exists(chemin) and time.monotonic() < limite:
+                time.sleep(0.01)
+            self.assertTrue(os.path.exists(chemin))
+
+
+class MontantAgentTests(TestCase):
+    """Tests du journal des montants agents."""
+
+    def setUp(self):
+        """Préparation."""
+        self.agent = User.objects.create_user(username='agent', password='agent123')
+
+    def test_compaction_conserve_le_total(self):
+        """La compaction replie les mouvements dans l'instantané sans changer le total."""
+        montant = MontantAgent(agent_utilisateur=self.agent)
+        montant.ajouter_montant(10.0)
+        montant.ajouter_montant(5.0)
+        montant.retirer_montant(3.0)
+        self.assertEqual(MontantAgent.montant_pour(self.agent.pk), 12.0)
+
+        self.assertEqual(MontantAgent.compacter(self.agent.pk, taille_lot=2), 2)
+        self.assertEqual(MontantAgent.montant_pour(self.agent.pk), 12.0)
+        MontantAgent.compacter(self.agent.pk)
+
+        self.assertFalse(MouvementMontantAgent.objects.exists())
+        self.assertEqual(MontantAgent.objects.get(agent_utilisateur=self.agent).montant_total, 12.0)
+
+
+class StatistiquesTests(TestCase):
+    """Tests des tables d'agrégats statistiques."""
+
+    def setUp(self):
+        """Préparation."""
+        self.agent = User.objects.create_user(username='agent', password='agent123')
+        self.produits = [
+            Produit.objects.create(nom_prod=f"Produit {i}", quantite=50, prix_unit=2.0)
+            for i in range(2)
+        ]
+
+    def test_increments_identiques_a_la_reconstruction(self):
+        """Les agrégats tenus par incréments correspondent à une reconstruction complète."""
+        commande = Commande.objects.create(code_prod=self.produits[0], quantite_cmd=3, agent_utilisateur=self.agent)
+        Commande.objects.create(code_prod=self.produits[1], quantite_cmd=1, agent_utilisateur=self.agent)
+        passer_panier(self.agent, {p.code_prod: 2 for p in self.produits})
+
+        commande.quantite_cmd = 5
+        commande.save()
+        commande.facture.valider_facture()
+        Commande.objects.filter(code_prod=self.produits[1], panier=None).get().supprimer_logique()
+
+        stats = statistiques.totaux()
+        self.assertEqual(stats['nb_commandes'], 3)
+        self.assertEqual(stats['quantite_commandee'], 9)
+        self.assertEqual(stats['nb_factures_validee'], 1)
+        self.assertEqual(stats['nb_factures'], 3)
+
+        statistiques.reconstruire()
+        self.assertEqual(statistiques.totaux(), stats)
+
+    def agregats(self):
+        """Lignes d'agrégats non nulles, comparables à une reconstruction."""
+        return sorted(
+            (ligne['jour'], ligne['produit_id'], ligne['fournisseur_id'], ligne['agent_utilisateur_id'],
+             ligne['nb_commandes'], ligne['montant_commandes'], ligne['nb_factures_brouillon'], ligne['nb_factures_validee'])
+            for ligne in StatistiqueJournaliere.objects.values()
+            if ligne['nb_commandes'] or ligne['nb_factures_brouillon'] or ligne['nb_factures_validee']
+        )
+
+    def test_changement_de_prix_ou_de_fournisseur(self):
+        """Modifier le prix ou le fournisseur d'un produit déplace ses contributions."""
+        fournisseur = Fournisseur.objects.create(code_fournisseur='F', nom_fournisseur='Fournisseur', email='f@test.com')
+        Commande.objects.create(code_prod=self.produits[0], quantite_cmd=3, agent_utilisateur=self.agent)
+
+        produit = self.produits[0]
+        produit.prix_unit = 4.0
+        produit.fournisseur = fournisseur
+        produit.save()
+
+        self.assertEqual(statistiques.totaux(fournisseur=fournisseur)['nb_commandes'], 1)
+        self.assertEqual(statistiques.totaux(fournisseur=fournisseur)['nb_factures'], 1)
+        self.assertEqual(statistiques.totaux()['montant_commandes'], 12.0)
+        attendus = self.agregats()
+        statistiques.reconstruire()
+        self.assertEqual(self.agregats(), attendus)
+
+    def test_changer_statut_en_lot(self):
+        """changer_statut() met à jour les agrégats et refuse un statut inconnu."""
+        for produit in self.produits:
+            Commande.objects.create(code_prod=produit, quantite_cmd=1, agent_utilisateur=self.agent)
+
+        self.assertEqual(Facture.objects.changer_statut('validee'), 2)
+
+        stats = statistiques.totaux()
+        self.assertEqual((stats['nb_factures_brouillon'], stats['nb_factures_validee']), (0, 2))
+        with self.assertRaises(ValueError):
+            Facture.objects.changer_statut('envoyee')
+        self.assertEqual(Facture.objects.filter(statut='validee').count(), 2)
+
+    def test_commande_une_ecriture_d_agregats(self):
+        """Une commande et sa facture mettent à jour leur ligne d'agrégats en une seule écriture."""
+        Commande.objects.create(code_prod=self.produits[0], quantite_cmd=1, agent_utilisateur=self.agent)
+        with CaptureQueriesContext(connection) as requetes:
+            Commande.objects.create(code_prod=self.produits[0], quantite_cmd=2, agent_utilisateur=self.agent)
+
+        ecritures = [q for q in requetes.captured_queries if 'stock_statistiquejournaliere' in q['sql']]
+        self.assertEqual(len(ecritures), 1)
+        stats = statistiques.totaux()
+        self.assertEqual((stats['nb_commandes'], stats['quantite_commandee'], stats['nb_factures']), (2, 3, 2))
+
+    def test_statistiques_view_lit_les_agregats(self):
+        """La page statistiques ne parcourt pas les commandes."""
+        Commande.objects.create(code_prod=self.produits[0], quantite_cmd=3, agent_utilisateur=self.agent)
+        client = Client()
+        client.login(username='agent', password='agent123')
+
+        reponse = client.get(reverse('stock:statistiques_list'))
+
+        self.assertEqual(reponse.context['total_commandes'], 1)
+        self.assertEqual(reponse.context['valeur_stock_totale'], 200.0)
+        self.assertEqual(list(reponse.context['produits_top']), [self.produits[0]])
+
+
+class MontantCommandeTests(TestCase):
+    """Tests des montants de commande calculés en base."""
+
+    def test_montants_en_une_requete(self):
+        """with_montant() et total_montant() ne chargent pas les produits."""
+        produits = [Produit.objects.create(nom_prod=f"Produit {i}", quantite=10, prix_unit=1.5 + i) for i in range(3)]
+        for produit in produits:
+            Commande.objects.create(code_prod=produit, quantite_cmd=2)
+
+        with self.assertNumQueries(1):
+            montants = sorted(commande.montant for commande in Commande.objects.with_montant())
+        with self.assertNumQueries(1):
+            total = Commande.objects.total_montant()
+
+        self.assertEqual(montants, [3.0, 5.0, 7.0])
+        self.assertEqual(total, 15.0)
+        self.assertEqual(Commande.objects.none().total_montant(), 0.0)
+
+
+class PaginationCurseurTests(TestCase):
+    """Tests de la pagination par curseur des listes."""
+
+    def setUp(self):
+        """Préparation : 35 commandes (3 pages de 15)."""
+        User.objects.create_user(username='agent', password='agent123')
+        self.client = Client()
+        self.client.login(username='agent', password='agent123')
+        produit = Produit.objects.create(nom_prod="Produit", quantite=100, prix_unit=1.0)
+        self.commandes = Commande.objects.bulk_create([
+            Commande(code_prod=produit, quantite_cmd=1) for _ in range(35)
+        ])
+
+    def page(self, curseur=None):
+        """Charge une page de la liste des commandes."""
+        donnees = {'curseur': curseur} if curseur else {}
+        return self.client.get(reverse('stock:commande_list'), donnees).context
+
+    def test_parcours_complet_sans_doublon(self):
+        """Les pages suivantes puis précédentes couvrent toutes les commandes une seule fois."""
+        pages = [self.page()]
+        while pages[-1]['page_obj'].has_next():
+            pages.append(self.page(pages[-1]['page_obj'].curseur_suivant))
+
+        vues = [c.code_cmd for page in pages for c in page['commandes']]
+        attendu = [c.code_cmd for c in Commande.objects.order_by('-date_commande', '-code_cmd')]
+        self.assertEqual(vues, attendu)
+        self.assertEqual([len(page['commandes']) for page in pages], [15, 15, 5])
+
+        precedente = self.page(pages[-1]['page_obj'].curseur_precedent)
+        self.assertEqual(list(precedente['commandes']), list(pages[1]['commandes']))
+        derniere = self.page(pages[0]['paginator'].curseur_derniere)
+        self.assertEqual([c.code_cmd for c in derniere['commandes']], attendu[-15:])
+
+    def test_curseur_invalide_et_total_borne(self):
+        """Un curseur modifié donne une 404 ; le total est borné à compte_max."""
+        reponse = self.client.get(reverse('stock:commande_list'), {'curseur': 'falsifie'})
+        self.assertEqual(reponse.status_code, 404)
+
+        paginateur = PaginateurCurseur(Commande.objects.all(), 15, ('-date_commande', '-code_cmd'), compte_max=20)
+        self.assertEqual((paginateur.count, paginateur.tronque), (20, True))
+
+
+class StatistiquesFournisseursTests(TestCase):
+    """Tests des statistiques par fournisseur."""
+
+    def setUp(self):
+        """Préparation."""
+        User.objects.create_user(username='admin', password='admin123', is_staff=True)
+        self.client = Client()
+        self.client.login(username='admin', password='admin123')
+
+    def creer_fournisseurs(self, nombre):
+        """Crée `nombre` fournisseurs avec deux produits et une commande payée chacun."""
+        for i in range(Fournisseur.objects.count(), Fournisseur.objects.count() + nombre):
+            fournisseur = Fournisseur.objects.create(
+                code_fournisseur=f'F{i:03}', nom_fournisseur=f'Fournisseur {i}', email=f'f{i}@test.com'
+            )
+            produits = [
+                Produit.objects.create(nom_prod=f"Produit {j}", quantite=20, prix_unit=5.0, fournisseur=fournisseur)
+                for j in range(2)
+            ]
+            commande = Commande.objects.create(code_prod=produits[0], quantite_cmd=2)
+            Facture.objects.filter(commande=commande).update(statut='payee')
+
+    def requetes_liste(self):
+        """Nombre de requêtes SQL de la liste des fournisseurs."""
+        with CaptureQueriesContext(connection) as requetes:
+            reponse = self.client.get(reverse('stock:fournisseur_list'))
+        self.assertEqual(reponse.status_code, 200)
+        return len(requetes), reponse
+
+    def test_nombre_de_requetes_constant(self):
+        """Le coût de la page ne dépend pas du nombre de fournisseurs affichés."""
+        self.creer_fournisseurs(2)
+        requetes_2, _ = self.requetes_liste()
+        self.creer_fournisseurs(6)
+        requetes_8, reponse = self.requetes_liste()
+
+        self.assertEqual(requetes_2, requetes_8)
+        fournisseur = reponse.context['fournisseurs'][0]
+        self.assertEqual(fournisseur.produits_count, 2)
+        self.assertEqual(fournisseur.commandes_count, 1)
+        self.assertEqual(fournisseur.factures_count, 1)
+        self.assertEqual(fournisseur.factures_payees, 1)
+        self.assertEqual(fournisseur.montant_total, 10.0)
+
+    def test_stats_agents_en_deux_requetes(self):
+        """Les statistiques par agent coûtent deux requêtes, montants calculés en SQL."""
+        fournisseur = Fournisseur.objects.create(code_fournisseur='F', nom_fournisseur='F', email='f@test.com')
+        produit = Produit.objects.create(nom_prod="Produit", quantite=20, prix_unit=2.5, fournisseur=fournisseur)
+        agents = [User.objects.create_user(username=f'agent{i}') for i in range(3)]
+        for agent in agents:
+            Commande.objects.create(code_prod=produit, quantite_cmd=2, agent_utilisateur=agent)
+        Facture.objects.filter(agent_utilisateur=agents[0]).update(statut='payee')
+
+        with self.assertNumQueries(2):
+            stats = statistiques.stats_agents_fournisseur(fournisseur)
+
+        self.assertEqual([stat['agent'] for stat in stats], agents)
+        self.assertEqual(stats[0]['montant_commandes'], 5.0)
+        self.assertEqual((stats[0]['payees'], stats[0]['non_payees']), (1, 0))
+        self.assertEqual((stats[1]['payees'], stats[1]['non_payees']), (0, 1))
+
+
+class RepartitionsTests(TestCase):
+    """Tests des répartitions par statut / type (statistiques.repartitions)."""
+
+    def setUp(self):
+        """Préparation : deux fournisseurs, deux agents, trois commandes."""
+        self.admin = User.objects.create_user(username='admin', is_staff=True)
+        self.agents = [User.objects.create_user(username=f'agent{i}') for i in range(2)]
+        self.fournisseurs = [
+            Fournisseur.objects.create(code_fournisseur=f'F{i}', nom_fournisseur=f'F{i}', email=f'f{i}@test.com')
+            for i in range(2)
+        ]
+        produits = [
+            Produit.objects.create(nom_prod=f"Produit {i}", quantite=20, prix_unit=2.0, fournisseur=fournisseur)
+            for i, fournisseur in enumerate(self.fournisseurs)
+        ]
+        commandes = [
+            Commande.objects.create(code_prod=produits[0], quantite_cmd=1, agent_utilisateur=self.agents[0]),
+            Commande.objects.create(code_prod=produits[0], quantite_cmd=2, agent_utilisateur=self.agents[1]),
+            Commande.objects.create(code_prod=produits[1], quantite_cmd=3, agent_utilisateur=self.agents[0]),
+        ]
+        commandes[0].confirmer_paiement()
+        Facture.objects.filter(commande=commandes[0]).changer_statut('payee')
+        Facture.objects.filter(commande=commandes[2]).changer_statut('validee')
+
+    def test_une_requete(self):
+        """Plusieurs sources, chacune avec sa portée, en une seule requête."""
+        with self.assertNumQueries(1):
+            resultats = statistiques.repartitions(
+                factures={'fournisseur': self.fournisseurs[0]},
+                commandes={'agent': self.agents[0]},
+                notifications={},
+            )
+
+        factures = resultats['factures']
+        self.assertEqual((factures['nombre'], factures['montant']), (2, 6.0))
+        self.assertEqual(factures['par_valeur']['payee'], {'nombre': 1, 'montant': 2.0})
+        self.assertEqual(factures['par_valeur']['brouillon'], {'nombre': 1, 'montant': 4.0})
+        self.assertEqual(factures['par_valeur']['annulee'], {'nombre': 0, 'montant': 0.0})
+        self.assertEqual(resultats['commandes']['par_valeur']['payee'], {'nombre': 1, 'montant': 2.0})
+        self.assertEqual(resultats['commandes']['par_valeur']['en_attente'], {'nombre': 1, 'montant': 6.0})
+        self.assertEqual(resultats['notifications']['nombre'], Notification.objects.count())
+        self.assertEqual(statistiques.repartition('commandes', fournisseur='F1')['nombre'], 1)
+        with self.assertRaises(ValueError):
+            statistiques.repartition('notifications', agent=self.agents[0])
+
+    def test_graphiques_agent(self):
+        """Le JSON des graphiques est calculé en une requête, après le chargement de l'agent."""
+        self.client.force_login(self.admin)
+        url = reverse('stock:agent_graphs_data', args=[self.agents[0].pk])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as requetes:
+            donnees = self.client.get(url).json()
+
+        self.assertEqual(sum('UNION ALL' in requete['sql'] for requete in requetes), 1)
+        self.assertFalse([requete for requete in requetes if 'stock_statistique' in requete['sql']])
+        self.assertEqual(donnees['commandes_total'], 3)
+        self.assertEqual(donnees['factures']['total'], 3)
+        self.assertEqual(donnees['factures']['stats'], {'brouillon': 1, 'validee': 1, 'payee': 1, 'annulee': 0})
+        self.assertEqual(donnees['chart_data']['montants_by_status']['data'], [4.0, 6.0, 2.0, 0.0])
+
+    def test_liste_factures(self):
+        """La liste des factures compte les brouillons et validées comme non payées."""
+        self.client.force_login(self.admin)
+        reponse = self.client.get(reverse('stock:facture_list'))
+        self.assertEqual((reponse.context['payees'], reponse.context['non_payees']), (1, 2))
+        self.assertEqual(reponse.context['montant_total'], 12.0)
+        self.assertEqual(reponse.context['total_factures'], 3)
+
+    def test_totaux_des_listes_non_bornes(self):
+        """Les cartes des listes viennent des agrégats, pas du compte borné de la pagination."""
+        self.client.force_login(self.admin)
+        with mock.patch.object(CommandeListView, 'compte_max', 2):
+            reponse = self.client.get(reverse('stock:commande_list'))
+        self.assertTrue(reponse.context['paginator'].tronque)
+        self.assertEqual(reponse.context['total_commandes'], 3)
+        self.assertEqual(reponse.context['montant_total'], 12.0)
+
+
+class SuppressionLogiqueTests(TestCase):
+    """Tests des managers de suppression logique."""
+
+    def setUp(self):
+        """Préparation."""
+        self.agent = User.objects.create_user(username='agent')
+        self.produit = Produit.objects.create(nom_prod="Produit", quantite=50, prix_unit=2.0)
+        self.commandes = [
+            Commande.objects.create(code_prod=self.produit, quantite_cmd=i + 1, agent_utilisateur=self.agent)
+            for i in range(3)
+        ]
+
+    def test_managers(self):
+        """objects ignore les lignes supprimées, y compris via les relations inverses."""
+        self.commandes[0].supprimer_logique()
+
+        self.assertEqual(Commande.objects.count(), 2)
+        self.assertEqual(Commande.archives.get(), self.commandes[0])
+        self.assertEqual(Commande.all_objects.count(), 3)
+        self.assertEqual(self.produit.commandes.count(), 2)
+        produit = Produit.objects.prefetch_related('commandes').get()
+        self.assertEqual(len(produit.commandes.all()), 2)
+
+    def test_archivage_en_lot_un_seul_update(self):
+        """supprimer_logique() / restaurer() en lot : un UPDATE, agrégats à jour."""
+        stats = statistiques.totaux()
+
+        with CaptureQueriesContext(connection) as requetes:
+            self.assertEqual(Commande.objects.filter(quantite_cmd__lt=3).supprimer_logique(), 2)
+        self.assertEqual(sum(r['sql'].startswith('UPDATE "stock_commande"') for r in requetes), 1)
+        self.assertEqual(statistiques.totaux()['nb_commandes'], 1)
+        self.assertEqual(statistiques.totaux()['quantite_commandee'], 3)
+
+        self.assertEqual(Commande.all_objects.restaurer(), 2)
+        self.assertEqual(statistiques.totaux(), stats)
+        statistiques.reconstruire()
+        self.assertEqual(statistiques.totaux(), stats)
+
+    def test_nom_unique_parmi_les_archives(self):
+        """Un nouveau produit ne peut pas reprendre le nom d'un produit archivé du même fournisseur."""
+        fournisseur = Fournisseur.objects.create(code_fournisseur='F', nom_fournisseur='F', email='f@test.com')
+        Produit.objects.create(nom_prod="Archivé", prix_unit=1.0, fournisseur=fournisseur).supprimer_logique()
+
+        with self.assertRaises(ValidationError):
+            Produit(nom_prod="Archivé", prix_unit=1.0, fournisseur=fournisseur).validate_unique()
+
+
+class ArchivageTests(TestCase):
+    """Tests de l'archivage froid."""
+
+    def setUp(self):
+        """Préparation : une commande supprimée (et sa facture) sur un produit supprimé, un historique."""
+        self.produit = Produit.objects.create(nom_prod="Ancien", quantite=5, prix_unit=2.0)
+        self.commande = Commande.objects.create(code_prod=self.produit, quantite_cmd=1)
+        self.facture = self.commande.facture
+        Facture.objects.filter(pk=self.facture.pk).supprimer_logique()
+        Commande.objects.filter(pk=self.commande.pk).supprimer_logique()
+        Produit.objects.filter(pk=self.produit.pk).supprimer_logique()
+        Notification.objects.all().delete()  # Une notification (PROTECT) bloque l'archivage du produit
+        self.historique = Historique.objects.create(type_objet='produit', id_objet=self.produit.pk, donnees_supprimees={'nom_prod': 'Ancien'})
+
+    def test_archivage_puis_restauration(self):
+        """Les lignes mortes quittent les tables principales et restent lisibles."""
+        stats = statistiques.totaux()
+        Produit.objects.create(nom_prod="Actif", quantite=5, prix_unit=2.0)
+
+        resultats = archivage.archiver(timezone.now() + timedelta(days=1))
+
+        self.assertEqual(resultats, {'historique': 1, 'facture': 1, 'commande': 1, 'produit': 1})
+        self.assertEqual(Produit.all_objects.get().nom_prod, "Actif")
+        self.assertFalse(Commande.all_objects.exists())
+        self.assertEqual(statistiques.totaux(), stats)
+        produit = archivage.trouver('produit', self.produit.pk)
+        self.assertTrue(produit.est_archive)
+        self.assertEqual(produit.nom_prod, "Ancien")
+        self.assertEqual(archivage.rechercher('produit', nom_prod__icontains='anc').count(), 1)
+
+        self.assertEqual(archivage.restaurer(Archive.objects.all()), 4)
+        self.assertFalse(Archive.objects.exists())
+        commande = Commande.archives.get()
+        self.assertEqual((commande.code_prod_id, commande.date_commande), (self.produit.pk, self.commande.date_commande))
+        self.assertFalse(archivage.trouver('facture', self.facture.pk).est_archive)
+
+    def test_retention_et_references(self):
+        """Les lignes récentes et les lignes encore référencées restent en place."""
+        self.assertEqual(set(archivage.archiver(timezone.now() - timedelta(days=1)).values()), {0})
+
+        Facture.archives.restaurer()
+        resultats = archivage.archiver(timezone.now() + timedelta(days=1), types=['commande', 'produit'])
+        self.assertEqual(resultats, {'commande': 0, 'produit': 0})
+
+
+class JournalStockTests(TestCase):
+    """Tests du journal du stock et du stock à une date."""
+
+    def setUp(self):
+        """Préparation."""
+        self.agent = User.objects.create_user(username='agent')
+        self.produit = Produit.objects.create(nom_prod="Produit", quantite=10, prix_unit=1.0)
+
+    def test_journal_suit_le_cache(self):
+        """Réservations, libérations, paniers et modifications passent par le journal."""
+        reserver_stock(self.produit.code_prod, 3)
+        liberer_stock(self.produit.code_prod, 1)
+        passer_panier(self.agent, {self.produit.code_prod: 2})
+        self.produit.refresh_from_db()
+        self.produit.quantite = 20
+        self.produit.save()
+
+        self.assertEqual(
+            list(self.produit.mouvements_stock.values_list('motif', 'delta')),
+            [('initial', 10), ('commande', -3), ('liberation', 1), ('commande', -2), ('ajustement', 14)],
+        )
+        self.assertEqual(mouvements.reconcilier(), [])
+
+        Produit.objects.update(quantite=0)
+        self.assertEqual(mouvements.reconcilier(corriger=True), [(self.produit.code_prod, 0, 20)])
+        self.produit.refresh_from_db()
+        self.assertEqual(self.produit.quantite, 20)
+
+    def test_correction_depuis_le_journal_complet(self):
+        """Un instantané erroné est signalé mais jamais recopié dans la quantité."""
+        reserver_stock(self.produit.code_prod, 3)
+        InstantaneStock.objects.create(produit=self.produit, date_instantane=timezone.now(), quantite=4, dernier_mouvement_id=0)
+
+        self.assertEqual(mouvements.reconcilier(), [(self.produit.code_prod, 7, 11)])
+        self.assertEqual(mouvements.reconcilier(corriger=True), [])
+        self.produit.refresh_from_db()
+        self.assertEqual(self.produit.quantite, 7)
+
+    def test_instantane_ignore_les_mouvements_recents(self):
+        """Les mouvements plus récents que la marge restent hors de l'instantané."""
+        reserver_stock(self.produit.code_prod, 3)
+        self.assertEqual(mouvements.prendre_instantanes(), 0)
+
+        MouvementStock.objects.update(date_mouvement=timezone.now() - timedelta(hours=1))
+        reserver_stock(self.produit.code_prod, 2)
+        self.assertEqual(mouvements.prendre_instantanes(), 1)
+        instantane = InstantaneStock.objects.get()
+        self.assertEqual(instantane.quantite, 7)
+        self.assertEqual(mouvements.stock_a(self.produit.code_prod, timezone.now()), 5)
+
+    @override_settings(STOCK_MARGE_INSTANTANES=0)
+    def test_stock_a_une_date(self):
+        """Instantané + mouvements suivants donnent le stock à n'importe quelle date."""
+        t0 = timezone.now()
+        reserver_stock(self.produit.code_prod, 3)
+        t1 = timezone.now()
+        self.assertEqual(mouvements.prendre_instantanes(), 1)
+        self.assertEqual(mouvements.prendre_instantanes(), 0)
+        reserver_stock(self.produit.code_prod, 2)
+        t2 = timezone.now()
+
+        with self.assertNumQueries(2):
+            self.assertEqual(mouvements.stock_a(self.produit.code_prod, t2), 5)
+        self.assertEqual(mouvements.stock_a(self.produit.code_prod, t1), 7)
+        self.assertEqual(mouvements.stock_a(self.produit.code_prod, t0), 10)
+        self.assertEqual(mouvements.stock_a(self.produit.code_prod, t0 - timedelta(days=1)), 0)
+
+
+class BackendEnPanne(BaseEmailBackend):
+    """Backend email qui échoue toujours (serveur SMTP indisponible)."""
+
+    def send_messages(self, email_messages):
+        raise ConnectionError("SMTP indisponible")
+
+
+class ConnexionEnPanne(BaseEmailBackend):
+    """Backend email dont la connexion échoue (serveur SMTP injoignable)."""
+
+    def open(self):
+        raise ConnectionError("Connexion SMTP refusée")
+
+
+class FileEmailsTests(TransactionTestCase):
+    """Tests de la file d'envoi des emails."""
+
+    def test_envoi_de_la_file(self):
+        """Les emails en attente sont envoyés et marqués comme envoyés."""
+        for i in range(3):
+            mettre_en_file(f'fournisseur{i}@test.com', 'Sujet', 'Message')
+
+        bilan = traiter_file(workers=2)
+
+        self.assertEqual(bilan['envoyes'], 3)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(EmailSortant.objects.filter(statut='envoye').count(), 3)
+
+    @override_settings(EMAIL_BACKEND='stock.tests.BackendEnPanne')
+    def test_echec_replanifie_puis_abandonne(self):
+        """Un envoi en échec est replanifié, puis abandonné après max_tentatives."""
+        email = mettre_en_file('fournisseur@test.com', 'Sujet', 'Message')
+
+        self.assertEqual(traiter_file(max_tentatives=2)['reessais'], 1)
+        email.refresh_from_db()
+        self.assertEqual(email.statut, 'en_attente')
+        self.assertEqual(email.tentatives, 1)
+        self.assertEqual(traiter_file(max_tentatives=2)['reessais'], 0)
+
+        EmailSortant.objects.update(prochaine_tentative=email.date_creation)
+        self.assertEqual(traiter_file(max_tentatives=2)['echecs'], 1)
+
+    @override_settings(EMAIL_BACKEND='stock.tests.ConnexionEnPanne')
+    def test_connexion_impossible_replanifie_le_lot(self):
+        """Si la connexion SMTP échoue, le lot réservé est replanifié avec l'erreur."""
+        for i in range(2):
+            mettre_en_file(f'fournisseur{i}@test.com', 'Sujet', 'Message')
+
+        self.assertEqual(traiter_file(max_tentatives=3)['reessais'], 2)
+        for email in EmailSortant.objects.all():
+            self.assertEqual((email.statut, email.tentatives), ('en_attente', 1))
+            self.assertEqual(email.derniere_erreur, 'Connexion SMTP refusée')
+            self.assertGreater(email.prochaine_tentative, email.date_creation)
@@ -0,0 +1,100 @@
+"""
+Tests des index : les requêtes fréquentes des vues ne doivent pas parcourir
+toute la table (EXPLAIN). Un test échoue si une requête retombe sur un
+parcours complet, par exemple après la suppression d'un index ou un
+changement de filtre qui ne correspond plus à un index partiel.
+"""
+import re
+import unittest
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+
+from stock.models import Produit, Commande, Facture, Fournisseur, ProduitFournisseur
+from stock.pagination import PaginateurCurseur
+
+
+@unittest.skipUnless(connection.vendor in ('sqlite', 'postgresql'), "EXPLAIN analysé pour SQLite et PostgreSQL")
+class IndexRequetesFrequentesTests(TestCase):
+    """Chaque requête fréquente doit être servie par un index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Préparation."""
+        cls.agent = User.objects.create_user(username='agent', password='agent123')
+        cls.fournisseur = Fournisseur.objects.create(code_fournisseur='F1', nom_fournisseur='F1', email='f1@test.com')
+        cls.produit = Produit.objects.create(nom_prod="Produit", quantite=5, prix_unit=2.0, fournisseur=cls.fournisseur)
+        ProduitFournisseur.objects.create(produit=cls.produit, fournisseur=cls.fournisseur, prix_fournisseur=1.0)
+        Commande.objects.create(code_prod=cls.produit, quantite_cmd=1, agent_utilisateur=cls.agent)
+
+    def setUp(self):
+        """Sur PostgreSQL, interdit le Seq Scan que le planificateur préfère sur une petite table."""
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def assertUtiliseUnIndex(self, queryset):
+        """Échoue si le plan d'exécution contient un parcours complet de table."""
+        plan = queryset.explain()
+        if connection.vendor == 'sqlite':
+            # « SCAN table » sans « USING ... INDEX » = parcours complet
+            complets = [ligne for ligne in plan.splitlines() if re.search(r'\bSCAN \w+$', ligne.strip())]
+        else:
+            complets = [ligne for ligne in plan.splitlines() if 'Seq Scan' in ligne]
+        self.assertFalse(complets, f"Parcours complet dans le plan :\n{plan}")
+
+    # ---------- Produits ----------
+
+    def test_liste_des_produits(self):
+        self.assertUtiliseUnIndex(Produit.objects.filter(is_deleted=False).order_by('nom_prod', 'code_prod')[:11])
+
+    def test_produits_d_un_fournisseur(self):
+        self.assertUtiliseUnIndex(
+            Produit.objects.filter(is_deleted=False, fournisseur=self.fournisseur).order_by('nom_prod')
+        )
+
+    def test_stock_critique(self):
+        self.assertUtiliseUnIndex(Produit.objects.filter(is_deleted=False, quantite__lt=10).order_by('quantite'))
+
+    def test_fournisseurs_d_un_produit(self):
+        self.assertUtiliseUnIndex(ProduitFournisseur.objects.filter(produit=self.produit))
+
+    # ---------- Commandes ----------
+
+    def test_liste_des_commandes(self):
+        self.assertUtiliseUnIndex(
+            Commande.objects.filter(is_deleted=False).order_by('-date_commande', '-code_cmd')[:16]
+        )
+
+    def test_page_suivante_des_commandes(self):
+        commandes = Commande.objects.filter(is_deleted=False)
+        paginateur = PaginateurCurseur(commandes, 15, ('-date_commande', '-code_cmd'))
+        derniere = commandes.get()
+        condition = paginateur._apres([derniere.date_commande, derniere.code_cmd])
+        self.assertUtiliseUnIndex(commandes.filter(condition).order_by('-date_commande', '-code_cmd')[:16])
+
+    def test_commandes_d_un_agent(self):
+        self.assertUtiliseUnIndex(
+            Commande.objects.filter(is_deleted=False, agent_utilisateur=self.agent).order_by('-date_commande')
+        )
+
+    def test_commandes_d_un_fournisseur(self):
+        self.assertUtiliseUnIndex(
+            Commande.objects.filter(is_deleted=False, code_prod__fournisseur=self.fournisseur)
+        )
+
+    # ---------- Factures ----------
+
+    def test_liste_des_factures(self):
+        self.assertUtiliseUnIndex(
+            Facture.objects.filter(is_deleted=False).order_by('-date_facture', '-code_facture')[:16]
+        )
+
+    def test_factures_d_un_agent(self):
+        self.assertUtiliseUnIndex(
+            Facture.objects.filter(is_deleted=False, agent_utilisateur=self.agent).order_by('-date_facture')
+        )
+
+    def test_factures_par_statut(self):
+        self.assertUtiliseUnIndex(Facture.objects.filter(is_deleted=False, statut='payee'))
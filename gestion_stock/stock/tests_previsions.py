@@ -0,0 +1,76 @@
+"""
+Tests des prévisions de demande (stock.previsions).
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.test import TestCase
+from django.utils import timezone
+
+from stock.models import Produit, Commande, PrevisionDemande
+from stock.previsions import croston, lissage_exponentiel, prevoir, ruptures_prevues
+
+
+class ModelesTests(TestCase):
+    """Modèles vectorisés, sur plusieurs produits à la fois."""
+
+    def test_demande_reguliere_et_intermittente(self):
+        """Demande constante : tous les modèles la retrouvent ; Croston lisse l'intermittence."""
+        matrice = np.zeros((2, 40))
+        matrice[0] = 2
+        matrice[1, ::4] = 4
+
+        np.testing.assert_allclose(lissage_exponentiel(matrice[:1]), [2.0])
+        np.testing.assert_allclose(croston(matrice), [2.0, 1.0])
+        np.testing.assert_allclose(croston(np.zeros((1, 10))), [0.0])
+
+
+class PrevisionTests(TestCase):
+    """Calcul complet, incrémental et ruptures prévues."""
+
+    def setUp(self):
+        """Préparation : 2 unités par jour pour `regulier`, 6 tous les 3 jours pour `intermittent`."""
+        self.regulier = Produit.objects.create(nom_prod="Vis", quantite=10, prix_unit=1.0)
+        self.intermittent = Produit.objects.create(nom_prod="Écrou", quantite=100, prix_unit=1.0)
+        self.sans_commande = Produit.objects.create(nom_prod="Clou", quantite=5, prix_unit=1.0)
+
+        maintenant = timezone.now()
+        for jour in range(1, 61):
+            self.commander(self.regulier, 2, maintenant - timedelta(days=jour))
+            if jour % 3 == 0:
+                self.commander(self.intermittent, 6, maintenant - timedelta(days=jour))
+
+    def commander(self, produit, quantite, date):
+        """Commande datée, sans passer par les signaux de réservation."""
+        commande, = Commande.objects.bulk_create([Commande(code_prod=produit, quantite_cmd=quantite)])
+        Commande.objects.filter(pk=commande.pk).update(date_commande=date)
+
+    def test_prevoir(self):
+        """Demande prévue, méthode retenue et jours avant rupture."""
+        self.assertEqual(prevoir(jours=60, horizon=14), 3)
+
+        prevision = PrevisionDemande.objects.get(produit=self.regulier)
+        self.assertAlmostEqual(prevision.demande_journaliere, 2.0)
+        self.assertAlmostEqual(prevision.erreur, 0.0)
+        self.assertAlmostEqual(prevision.jours_avant_rupture, 5.0)
+
+        prevision = PrevisionDemande.objects.get(produit=self.intermittent)
+        self.assertAlmostEqual(prevision.demande_journaliere, 2.0, places=1)
+
+        prevision = PrevisionDemande.objects.get(produit=self.sans_commande)
+        self.assertEqual(prevision.demande_journaliere, 0.0)
+        self.assertIsNone(prevision.jours_avant_rupture)
+
+        self.assertEqual([p.produit for p in ruptures_prevues(jours=7)], [self.regulier])
+
+    def test_rafraichissement_incremental(self):
+        """Seuls les produits ayant une nouvelle commande sont recalculés."""
+        self.assertEqual(prevoir(jours=60, horizon=14, incremental=True), 3)
+        self.assertEqual(prevoir(jours=60, horizon=14, incremental=True), 0)
+
+        self.commander(self.intermittent, 1, timezone.now())
+        self.assertEqual(prevoir(jours=60, horizon=14, incremental=True), 1)
+        self.assertEqual(
+            PrevisionDemande.objects.get(produit=self.intermittent).derniere_commande,
+            Commande.objects.latest('code_cmd').pk,
+        )
@@ -0,0 +1,63 @@
+"""
+Tests du planificateur de réapprovisionnement (stock.reapprovisionnement).
+"""
+import math
+from datetime import timedelta
+from statistics import NormalDist
+
+from django.test import TestCase
+from django.utils import timezone
+
+from stock.models import Produit, Fournisseur, ProduitFournisseur, StatistiqueJournaliere, SuggestionReapprovisionnement
+from stock.reapprovisionnement import planifier
+
+
+class PlanificationTests(TestCase):
+    """Point de commande, quantité économique et choix du fournisseur."""
+
+    def setUp(self):
+        """Préparation : 3 unités par jour un jour sur trois (d = 1, σ = √2 sur 90 jours)."""
+        self.principal = Fournisseur.objects.create(code_fournisseur='P', nom_fournisseur='Principal', email='p@test.com')
+        self.moins_cher = Fournisseur.objects.create(code_fournisseur='M', nom_fournisseur='Moins cher', email='m@test.com')
+
+        self.produit = Produit.objects.create(nom_prod="Vis", quantite=5, prix_unit=20.0)
+        ProduitFournisseur.objects.create(
+            produit=self.produit, fournisseur=self.principal,
+            prix_fournisseur=10.0, delai_livraison=4, quantite_min=10, is_principal=True,
+        )
+        ProduitFournisseur.objects.create(
+            produit=self.produit, fournisseur=self.moins_cher,
+            prix_fournisseur=8.0, delai_livraison=9, quantite_min=1,
+        )
+        self.bien_fourni = Produit.objects.create(nom_prod="Écrou", quantite=1000, prix_unit=1.0, fournisseur=self.principal)
+        self.direct = Produit.objects.create(nom_prod="Clou", quantite=0, prix_unit=2.0, fournisseur=self.principal)
+        Produit.objects.create(nom_prod="Sans demande", quantite=0, prix_unit=2.0, fournisseur=self.principal)
+
+        aujourd_hui = timezone.localdate()
+        StatistiqueJournaliere.objects.bulk_create([
+            StatistiqueJournaliere(jour=aujourd_hui - timedelta(days=3 * i), produit=produit, quantite_commandee=3)
+            for i in range(30)
+            for produit in (self.produit, self.bien_fourni, self.direct)
+        ])
+
+    def test_suggestions(self):
+        """Seuls les produits sous leur point de commande reçoivent une suggestion."""
+        self.assertEqual(planifier(jours=90), 2)
+
+        z = NormalDist().inv_cdf(0.95)
+        suggestion = SuggestionReapprovisionnement.objects.get(produit=self.produit)
+        # Le moins cher reste le moins coûteux malgré un stock de sécurité plus grand
+        self.assertEqual(suggestion.fournisseur, self.moins_cher)
+        self.assertAlmostEqual(suggestion.demande_journaliere, 1.0)
+        self.assertAlmostEqual(suggestion.stock_securite, z * math.sqrt(2) * 3)
+        self.assertAlmostEqual(suggestion.point_commande, 9 + z * math.sqrt(2) * 3)
+        self.assertEqual(suggestion.quantite_economique, math.ceil(math.sqrt(2 * 365 * 50 / (0.25 * 8))))
+        self.assertEqual(suggestion.quantite_suggeree, suggestion.quantite_economique)
+
+        # Sans liaison ProduitFournisseur : fournisseur direct, conditions par défaut
+        suggestion = SuggestionReapprovisionnement.objects.get(produit=self.direct)
+        self.assertEqual((suggestion.fournisseur, suggestion.delai_livraison), (self.principal, 7))
+
+        # Un nouveau calcul remplace le précédent
+        self.assertEqual(planifier(jours=90), 2)
+        self.assertEqual(SuggestionReapprovisionnement.objects.count(), 2)
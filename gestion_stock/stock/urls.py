@@ -70,6 +70,7 @@ urlpatterns = [
     
     path('agent/dashboard/', views.agent_dashboard_view, name='agent_dashboard'),
     path('agent/commande/<int:produit_id>/', views.passer_commande_view, name='passer_commande'),
+    path('agent/panier/', views.passer_panier_view, name='passer_panier'),
     
     # ==================== ROUTES POUR FOURNISSEUR DASHBOARD ====================
     
@@ -84,6 +85,23 @@ urlpatterns = [
     path('fournisseur/facture/<int:facture_id>/details/', views.detailler_facture_fournisseur_view, name='detailler_facture_fournisseur'),
     path('fournisseur/commande/<int:commande_id>/marquer-payee/', views.marquer_commande_payee_view, name='marquer_commande_payee'),
     
+    # ==================== ROUTES POUR LES NOTIFICATIONS ====================
+    
+    path('notifications/marquer-lues/', views.marquer_notifications_lues_view, name='marquer_notifications_lues'),
+    path('notifications/compteurs/', views.compteurs_notifications_view, name='compteurs_notifications'),
+    path('evenements/', views.flux_evenements_view, name='flux_evenements'),
+    
+    # ==================== VARIANTES ASYNCHRONES (ASGI) ====================
+    
+    path('async/dashboard/', views.dashboard_async_view, name='dashboard_async'),
+    path('async/agent/dashboard/', views.agent_dashboard_async_view, name='agent_dashboard_async'),
+    path('async/fournisseur/dashboard/', views.fournisseur_dashboard_async_view, name='fournisseur_dashboard_async'),
+    path('async/agents/<int:pk>/graphiques/', views.agent_graphs_data_async, name='agent_graphs_data_async'),
+    
+    # ==================== MÉTRIQUES ====================
+    
+    path('metriques/', views.metriques_view, name='metriques'),
+    
     # ==================== ROUTES POUR LA GESTION DES FOURNISSEURS (ADMIN) ====================
     
     path('fournisseurs/', views.FournisseurListView.as_view(), name='fournisseur_list'),
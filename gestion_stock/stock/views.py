@@ -4,27 +4,40 @@ Vues pour la gestion de stock.
 Ce module contient toutes les Class-Based Views pour le CRUD complet
 des produits, commandes et factures, ainsi que les vues d'authentification
 et de dashboard avec routage basé sur les rôles.
+
+Les dashboards et les données JSON des graphiques ont aussi une variante
+asynchrone (section VARIANTES ASYNCHRONES), servie sous ASGI : leurs
+requêtes indépendantes sont lancées ensemble avec l'ORM asynchrone.
 """
 
+import asyncio
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.views.generic.base import View, TemplateView
 from django.urls import reverse_lazy
-from django.db.models import Sum, Count, Q
+from django.db.models import Sum, Count, Q, F, FloatField
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User, Group
 from django.contrib.auth.password_validation import get_password_validators
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from asgiref.sync import sync_to_async
 from django.db import transaction
 from django.views.decorators.csrf import csrf_protect
 from django.utils.decorators import method_decorator
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.mixins import UserPassesTestMixin
-from django.utils.crypto import get_random_string
+from django.utils.crypto import constant_time_compare, get_random_string
 
-from .models import Produit, Commande, Facture, Historique, Fournisseur, MontantAgent
+from .models import Produit, Commande, Facture, Historique, Fournisseur, MontantAgent, Notification
+from .reservations import reserver_stock, liberer_stock, StockInsuffisant
+from .pagination import PaginationCurseurMixin
+from .paniers import passer_panier
+from . import compteurs, evenements, metriques, statistiques
+from .previsions import ruptures_prevues
 
 
 # ==================== MIXINS ====================
@@ -60,6 +73,7 @@ def login_view(request):
         remember_me = request.POST.get('remember_me')
         
         user = authenticate(request, username=username, password=password)
+        metriques.CONNEXIONS.inc(espace='utilisateurs', resultat='reussie' if user is not None else 'echec')
         
         if user is not None:
             login(request, user)
@@ -143,10 +157,10 @@ def statistiques_view(request):
         return redirect('admin:index')
     
     context = {
-        'total_produits': Produit.objects.filter(is_deleted=False).count(),
-        'produits_critiques': Produit.objects.filter(is_deleted=False, quantite__lt=10).count(),
-        'total_commandes': Commande.objects.filter(is_deleted=False).count(),
-        'total_factures': Facture.objects.filter(is_deleted=False).count(),
+        'total_produits': Produit.objects.count(),
+        'produits_critiques': Produit.objects.filter(quantite__lt=10).count(),
+        'total_commandes': Commande.objects.count(),
+        'total_factures': Facture.objects.count(),
     }
     return render(request, 'stock/statistiques.html', context)
 
@@ -168,7 +182,7 @@ def historique_view(request):
 
 @method_decorator(login_required(login_url='login'), name='dispatch')
 @method_decorator(login_required(login_url='login'), name='dispatch')
-class ProduitListView(ListView):
+class ProduitListView(PaginationCurseurMixin, ListView):
     """
     Liste les produits selon le rôle :
     - FOURNISSEUR: Voir SEULEMENT ses propres produits
@@ -178,6 +192,7 @@ class ProduitListView(ListView):
     template_name = 'stock/produit_list.html'
     context_object_name = 'produits'
     paginate_by = 10
+    ordre_curseur = ('nom_prod', 'code_prod')
     
     def get_queryset(self):
         """Retourne les produits selon le rôle de l'utilisateur."""
@@ -188,14 +203,13 @@ class ProduitListView(ListView):
             try:
                 fournisseur = self.request.user.fournisseur
                 return Produit.objects.filter(
-                    fournisseur=fournisseur,
-                    is_deleted=False
+                    fournisseur=fournisseur
                 ).order_by('nom_prod')
             except:
                 return Produit.objects.none()
         
         # Sinon (agent/admin), afficher TOUS les produits
-        return Produit.objects.filter(is_deleted=False).order_by('nom_prod')
+        return Produit.objects.order_by('nom_prod')
     
     def get_context_data(self, **kwargs):
         """Ajoute les infos d'édition au contexte pour les fournisseurs."""
@@ -203,9 +217,8 @@ class ProduitListView(ListView):
         user_groups = self.request.user.groups.values_list('name', flat=True)
         context['is_fournisseur'] = 'Fournisseur' in user_groups
         
-        # Calculer le total de stock
-        produits = self.get_queryset()
-        context['total_stock'] = sum(p.quantite for p in produits) if produits else 0
+        # Calculer le total de stock (en base)
+        context['total_stock'] = self.object_list.aggregate(total=Sum('quantite'))['total'] or 0
         
         return context
 
@@ -225,7 +238,7 @@ class ProduitDetailView(DetailView):
         context = super().get_context_data(**kwargs)
         produit = self.get_object()
         # Récupère les commandes non supprimées pour ce produit
-        context['commandes'] = produit.commandes.filter(is_deleted=False).order_by('-date_commande')
+        context['commandes'] = produit.commandes.order_by('-date_commande')
         context['nombre_commandes'] = context['commandes'].count()
         context['quantite_totale_commandee'] = context['commandes'].aggregate(
             total=Sum('quantite_cmd')
@@ -298,7 +311,7 @@ class ProduitDeleteView(DeleteView):
 # ==================== VUES POUR LES COMMANDES ====================
 
 @method_decorator(login_required(login_url='login'), name='dispatch')
-class CommandeListView(ListView):
+class CommandeListView(PaginationCurseurMixin, ListView):
     """
     Liste toutes les commandes non supprimées.
     - Fournisseur: Voir uniquement ses commandes (produits)
@@ -309,11 +322,12 @@ class CommandeListView(ListView):
     template_name = 'stock/commande_list.html'
     context_object_name = 'commandes'
     paginate_by = 15
+    ordre_curseur = ('-date_commande', '-code_cmd')
     
     def get_queryset(self):
         """Retourne les commandes non supprimées, les plus récentes d'abord."""
         user_groups = self.request.user.groups.values_list('name', flat=True)
-        queryset = Commande.objects.filter(is_deleted=False).select_related('code_prod').order_by('-date_commande')
+        queryset = Commande.objects.select_related('code_prod').order_by('-date_commande')
         
         # Si l'utilisateur est un fournisseur, filtrer par ses produits
         if 'Fournisseur' in user_groups:
@@ -331,7 +345,9 @@ class CommandeListView(ListView):
     def get_queryset(self):
         """Retourne les commandes non supprimées, les plus récentes d'abord."""
         user_groups = self.request.user.groups.values_list('name', flat=True)
-        queryset = Commande.objects.filter(is_deleted=False).select_related('code_prod').order_by('-date_commande')
+        queryset = Commande.objects.select_related('code_prod').with_montant().order_by('-date_commande')
+        # Filtres des agrégats statistiques équivalents à ceux de la liste
+        self.portee_statistiques = {}
         
         # Si l'utilisateur est un fournisseur, filtrer par ses produits
         if 'Fournisseur' in user_groups:
@@ -339,58 +355,30 @@ class CommandeListView(ListView):
                 fournisseur = self.request.user.fournisseur
                 # Récupérer les commandes contenant les produits de ce fournisseur
                 queryset = queryset.filter(code_prod__fournisseur=fournisseur)
+                self.portee_statistiques = {'fournisseur': fournisseur}
             except:
                 queryset = Commande.objects.none()
+                self.portee_statistiques = {'pk__in': []}
         
         return queryset
     
     def get_context_data(self, **kwargs):
-        """Ajoute les statistiques au contexte."""
+        """Ajoute les statistiques au contexte (agrégats, pas le compte borné de la pagination)."""
         context = super().get_context_data(**kwargs)
-        commandes = self.get_queryset()
-        context['total_commandes'] = commandes.count()
-        context['montant_total'] = sum(cmd.montant_commande() for cmd in commandes)
+        stats = statistiques.totaux(**self.portee_statistiques)
+        context['total_commandes'] = stats['nb_commandes']
+        context['montant_total'] = stats['montant_commandes']
         
-        # Statistiques par agent (si FOURNISSEUR)
+        # Statistiques par agent (si FOURNISSEUR), en une requête groupée
         user_groups = self.request.user.groups.values_list('name', flat=True)
         if 'Fournisseur' in user_groups:
-            # Récupérer les agents qui ont commandé les produits de ce fournisseur
             try:
                 fournisseur = self.request.user.fournisseur
-                # Récupérer tous les agents uniques qui ont commandé les produits de ce fournisseur
-                agents_with_commandes = Commande.objects.filter(
-                    code_prod__fournisseur=fournisseur,
-                    is_deleted=False
-                ).values_list('agent_utilisateur', flat=True).distinct()
-                
-                agents_stats = []
-                for agent_id in agents_with_commandes:
-                    agent = User.objects.get(id=agent_id)
-                    
-                    # Commandes de cet agent pour ce fournisseur
-                    agent_commandes = Commande.objects.filter(
-                        agent_utilisateur=agent,
-                        code_prod__fournisseur=fournisseur,
-                        is_deleted=False
-                    )
-                    agent_commandes_count = agent_commandes.count()
-                    
-                    # Factures de cet agent pour ce fournisseur
-                    agent_factures = Facture.objects.filter(
-                        commande__agent_utilisateur=agent,
-                        commande__code_prod__fournisseur=fournisseur,
-                        is_deleted=False
-                    )
-                    agent_factures_count = agent_factures.count()
-                    
-                    agents_stats.append({
-                        'agent': agent,
-                        'commandes_count': agent_commandes_count if agent_commandes_count > 0 else 0,
-                        'factures_count': agent_factures_count if agent_factures_count > 0 else 0,
-                        'montant_total': sum(cmd.montant_commande() for cmd in agent_commandes) if agent_commandes_count > 0 else 0
-                    })
-                
-                context['agents_stats'] = agents_stats
+                context['agents_stats'] = [
+                    dict(stat, montant_total=stat['montant_commandes'])
+                    for stat in statistiques.stats_agents_fournisseur(fournisseur)
+                    if stat['commandes_count']
+                ]
             except:
                 context['agents_stats'] = []
         
@@ -430,29 +418,30 @@ class CommandeCreateView(CreateView):
     def get_context_data(self, **kwargs):
         """Ajoute les produits disponibles au contexte."""
         context = super().get_context_data(**kwargs)
-        context['produits'] = Produit.objects.filter(is_deleted=False, quantite__gt=0).order_by('nom_prod')
+        context['produits'] = Produit.objects.filter(quantite__gt=0).order_by('nom_prod')
         return context
     
     @transaction.atomic
     def form_valid(self, form):
         """
-        Valide la commande et déduit la quantité du stock.
+        Réserve le stock puis enregistre la commande.
         La facture est créée automatiquement via le signal Django.
         """
-        form.instance.agent_utilisateur = self.request.user
-        response = super().form_valid(form)
         produit = form.cleaned_data['code_prod']
         quantite = form.cleaned_data['quantite_cmd']
         
-        # Vérification du stock disponible
-        if quantite > produit.quantite:
+        if quantite <= 0:
+            messages.error(self.request, "La quantité doit être positive.")
+            return redirect('stock:commande_create')
+        
+        # Réservation atomique du stock (décrément conditionnel en base)
+        if not reserver_stock(produit.code_prod, quantite):
+            produit.refresh_from_db(fields=['quantite'])
             messages.error(self.request, f"Stock insuffisant ! Disponible: {produit.quantite}")
-            self.object.delete()
             return redirect('stock:commande_create')
         
-        # Déduction du stock
-        produit.quantite -= quantite
-        produit.save()
+        form.instance.agent_utilisateur = self.request.user
+        response = super().form_valid(form)
         
         messages.success(
             self.request, 
@@ -486,16 +475,19 @@ class CommandeDeleteView(DeleteView):
     success_url = reverse_lazy('stock:commande_list')
     
     @transaction.atomic
-    def delete(self, request, *args, **kwargs):
-        """Effectue la suppression logique et restaure le stock."""
-        self.object = self.get_object()
+    def form_valid(self, form):
+        """
+        Effectue la suppression logique et restaure le stock.
+        
+        DeleteView.post() passe par form_valid() (Django ≥ 4.0) : c'est ici,
+        et non dans delete(), que la suppression doit être redéfinie.
+        """
         produit = self.object.code_prod
         quantite_cmd = self.object.quantite_cmd
         code_cmd = self.object.code_cmd
         
         # Restauration du stock
-        produit.quantite += quantite_cmd
-        produit.save()
+        liberer_stock(produit.code_prod, quantite_cmd)
         
         # Enregistrement dans l'historique
         Historique.objects.create(
@@ -510,13 +502,13 @@ class CommandeDeleteView(DeleteView):
         
         # Suppression logique
         self.object.supprimer_logique()
-        messages.success(request, f"Commande #{code_cmd} supprimée et stock restauré !")
+        messages.success(self.request, f"Commande #{code_cmd} supprimée et stock restauré !")
         return redirect(self.success_url)
 
 
 # ==================== VUES POUR LES FACTURES ====================
 
-class FactureListView(ListView):
+class FactureListView(PaginationCurseurMixin, ListView):
     """
     Liste toutes les factures non supprimées.
     - Fournisseur: Voir uniquement les factures de ses produits
@@ -527,67 +519,51 @@ class FactureListView(ListView):
     template_name = 'stock/facture_list.html'
     context_object_name = 'factures'
     paginate_by = 15
+    ordre_curseur = ('-date_facture', '-code_facture')
     
     def get_queryset(self):
         """Retourne les factures non supprimées, les plus récentes d'abord."""
         user_groups = self.request.user.groups.values_list('name', flat=True)
-        queryset = Facture.objects.filter(is_deleted=False).select_related('commande').order_by('-date_facture')
+        queryset = Facture.objects.select_related('commande__code_prod').order_by('-date_facture')
+        # Filtres des agrégats statistiques équivalents à ceux de la liste
+        self.portee_statistiques = {}
         
         # Si l'utilisateur est un fournisseur, filtrer par ses produits
         if 'Fournisseur' in user_groups:
             try:
                 fournisseur = self.request.user.fournisseur
                 queryset = queryset.filter(commande__code_prod__fournisseur=fournisseur)
+                self.portee_statistiques = {'fournisseur': fournisseur}
             except:
                 queryset = Facture.objects.none()
+                self.portee_statistiques = {'pk__in': []}
         # Si l'utilisateur est un AGENT, filtrer par ses factures uniquement
         elif 'Gestionnaire Stock' in user_groups or 'Responsable Commandes' in user_groups:
             queryset = queryset.filter(agent_utilisateur=self.request.user)
+            self.portee_statistiques = {'agent_utilisateur': self.request.user}
         # Sinon (Admin): voir toutes les factures
         
         return queryset
     
     def get_context_data(self, **kwargs):
-        """Ajoute les statistiques au contexte."""
+        """Ajoute les statistiques au contexte (agrégats, pas le compte borné de la pagination)."""
         context = super().get_context_data(**kwargs)
-        factures = self.get_queryset()
-        context['total_factures'] = factures.count()
-        context['montant_total'] = factures.aggregate(Sum('montant_total'))['montant_total__sum'] or 0
-        context['payees'] = factures.filter(statut='payee').count() if factures.count() > 0 else 0
-        context['non_payees'] = factures.filter(statut='non_payee').count() if factures.count() > 0 else 0
+        stats = statistiques.totaux(**self.portee_statistiques)
+        context['total_factures'] = stats['nb_factures']
+        context['montant_total'] = stats['montant_factures']
+        context['payees'] = stats['nb_factures_payee']
+        context['non_payees'] = stats['nb_factures_brouillon'] + stats['nb_factures_validee']
         
-        # Statistiques par agent (si FOURNISSEUR)
+        # Statistiques par agent (si FOURNISSEUR), en une requête groupée
         user_groups = self.request.user.groups.values_list('name', flat=True)
         if 'Fournisseur' in user_groups:
             try:
                 fournisseur = self.request.user.fournisseur
-                agents_with_factures = Facture.objects.filter(
-                    commande__code_prod__fournisseur=fournisseur,
-                    is_deleted=False
-                ).values_list('commande__agent_utilisateur', flat=True).distinct()
-                
-                agents_stats = []
-                for agent_id in agents_with_factures:
-                    if agent_id:
-                        agent = User.objects.get(id=agent_id)
-                        agent_factures = Facture.objects.filter(
-                            commande__agent_utilisateur=agent,
-                            commande__code_prod__fournisseur=fournisseur,
-                            is_deleted=False
-                        )
-                        agent_factures_count = agent_factures.count()
-                        agent_payees = agent_factures.filter(statut='payee').count() if agent_factures_count > 0 else 0
-                        agent_non_payees = agent_factures.filter(statut='non_payee').count() if agent_factures_count > 0 else 0
-                        
-                        agents_stats.append({
-                            'agent': agent,
-                            'factures_count': agent_factures_count if agent_factures_count > 0 else 0,
-                            'payees': agent_payees if agent_payees > 0 else 0,
-                            'non_payees': agent_non_payees if agent_non_payees > 0 else 0,
-                            'montant_total': agent_factures.aggregate(Sum('montant_total'))['montant_total__sum'] or 0
-                        })
-                
-                context['agents_stats'] = agents_stats
+                context['agents_stats'] = [
+                    dict(stat, montant_total=stat['montant_factures'])
+                    for stat in statistiques.stats_agents_fournisseur(fournisseur)
+                    if stat['factures_count']
+                ]
             except:
                 context['agents_stats'] = []
         
@@ -609,7 +585,7 @@ class FactureDetailView(DetailView):
     def get_queryset(self):
         """Filtrer les factures accessibles à l'utilisateur."""
         user_groups = self.request.user.groups.values_list('name', flat=True)
-        queryset = Facture.objects.filter(is_deleted=False)
+        queryset = Facture.objects.all()
         
         # Si l'utilisateur est un fournisseur, filtrer par ses produits
         if 'Fournisseur' in user_groups:
@@ -640,7 +616,6 @@ class FactureCreateView(AdminOnlyMixin, CreateView):
         context = super().get_context_data(**kwargs)
         # Commandes qui n'ont pas encore de facture
         commandes_disponibles = Commande.objects.filter(
-            is_deleted=False,
             facture__isnull=True
         ).select_related('code_prod')
         context['commandes_disponibles'] = commandes_disponibles
@@ -735,7 +710,7 @@ class FactureDeleteView(DeleteView):
 
 # ==================== VUES POUR L'HISTORIQUE ====================
 
-class HistoriqueListView(ListView):
+class HistoriqueListView(PaginationCurseurMixin, ListView):
     """
     Liste tout l'historique des suppressions.
     """
@@ -743,6 +718,7 @@ class HistoriqueListView(ListView):
     template_name = 'stock/historique_list.html'
     context_object_name = 'historiques'
     paginate_by = 20
+    ordre_curseur = ('-date_suppression', '-id')
     
     def get_queryset(self):
         """Retourne les historiques, les plus récents d'abord."""
@@ -751,8 +727,8 @@ class HistoriqueListView(ListView):
     def get_context_data(self, **kwargs):
         """Ajoute les statistiques au contexte."""
         context = super().get_context_data(**kwargs)
-        historiques = self.get_queryset()
-        context['total_historiques'] = historiques.count()
+        historiques = self.object_list
+        context['total_historiques'] = context['paginator'].count
         context['stats'] = historiques.values('type_objet').annotate(count=Count('id'))
         return context
 
@@ -769,42 +745,28 @@ class StatistiquesView(TemplateView):
         """Prépare toutes les statistiques."""
         context = super().get_context_data(**kwargs)
         
-        # Statistiques générales
-        context['total_produits'] = Produit.objects.filter(is_deleted=False).count()
-        context['total_commandes'] = Commande.objects.filter(is_deleted=False).count()
-        context['total_factures'] = Facture.objects.filter(is_deleted=False).count()
+        # Statistiques générales (tables d'agrégats)
+        stats = statistiques.totaux()
+        context['total_produits'] = Produit.objects.count()
+        context['total_commandes'] = stats['nb_commandes']
+        context['total_factures'] = stats['nb_factures']
         
-        # Valeur du stock
-        produits = Produit.objects.filter(is_deleted=False)
-        context['valeur_stock_totale'] = sum(p.total_valeur_stock() for p in produits)
+        # Valeur du stock (calculée en base)
+        context['valeur_stock_totale'] = Produit.objects.aggregate(
+            total=Sum(F('quantite') * F('prix_unit'), output_field=FloatField())
+        )['total'] or 0
         
         # Montant total des factures
-        factures = Facture.objects.filter(is_deleted=False)
-        context['montant_total_factures'] = factures.aggregate(Sum('montant_total'))['montant_total__sum'] or 0
+        context['montant_total_factures'] = stats['montant_factures']
         
         # Produits les plus commandés
-        produits_top = (
-            Produit.objects
-            .filter(is_deleted=False, commandes__is_deleted=False)
-            .annotate(
-                nombre_commandes=Count('commandes'),
-                quantite_totale=Sum('commandes__quantite_cmd')
-            )
-            .order_by('-nombre_commandes')[:5]
-        )
-        context['produits_top'] = produits_top
+        context['produits_top'] = statistiques.produits_les_plus_commandes(5)
         
         # Factures par statut
-        context['factures_par_statut'] = (
-            Facture.objects
-            .filter(is_deleted=False)
-            .values('statut')
-            .annotate(count=Count('code_facture'))
-        )
+        context['factures_par_statut'] = statistiques.factures_par_statut(stats)
         
         # Stock critique (quantité < 10)
         context['stock_critique'] = Produit.objects.filter(
-            is_deleted=False,
             quantite__lt=10
         ).order_by('quantite')
         
@@ -823,26 +785,28 @@ class DashboardView(TemplateView):
         """Prépare les données pour le dashboard."""
         context = super().get_context_data(**kwargs)
         
-        # Nombre d'éléments
-        context['total_produits'] = Produit.objects.filter(is_deleted=False).count()
-        context['total_commandes'] = Commande.objects.filter(is_deleted=False).count()
-        context['total_factures'] = Facture.objects.filter(is_deleted=False).count()
+        # Nombre d'éléments (tables d'agrégats)
+        stats = statistiques.totaux()
+        context['total_produits'] = Produit.objects.count()
+        context['total_commandes'] = stats['nb_commandes']
+        context['total_factures'] = stats['nb_factures']
         
         # Dernières commandes
-        context['dernieres_commandes'] = Commande.objects.filter(
-            is_deleted=False
-        ).select_related('code_prod').order_by('-date_commande')[:5]
+        context['dernieres_commandes'] = Commande.objects.select_related('code_prod').order_by('-date_commande')[:5]
         
         # Produits en rupture
         context['produits_rupture'] = Produit.objects.filter(
-            is_deleted=False,
             quantite=0
         ).order_by('nom_prod')
         
+        # Ruptures prévues dans la semaine (stock.previsions)
+        context['ruptures_prevues'] = ruptures_prevues(jours=7)[:5]
+        
         # Factures non payées
-        context['factures_impayees'] = Facture.objects.filter(
-            is_deleted=False
-        ).exclude(statut='payee').count()
+        context['factures_impayees'] = stats['nb_factures'] - stats['nb_factures_payee']
+        
+        # Notifications non lues / non traitées (stock.compteurs)
+        context['compteurs_notifications'] = compteurs.totaux()
         
         return context
 
@@ -858,7 +822,7 @@ class AgentListView(AdminOnlyMixin, ListView):
     
     def get_queryset(self):
         # Afficher tous les utilisateurs sauf les admins
-        return User.objects.filter(is_staff=False).order_by('username')
+        return User.objects.filter(is_staff=False).prefetch_related('groups').order_by('username')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -1036,8 +1000,6 @@ class AgentReportView(AdminOnlyMixin, TemplateView):
 def agent_graphs_data(request, pk):
     """Retourne les données JSON pour les graphiques d'un agent"""
     from django.http import JsonResponse
-    from stock.models import Commande, Facture
-    from django.db.models import Sum
     
     # Vérifier que l'utilisateur est admin
     if not request.user.is_staff:
@@ -1048,40 +1010,34 @@ def agent_graphs_data(request, pk):
     except User.DoesNotExist:
         return JsonResponse({'error': 'Agent not found'}, status=404)
     
-    # Données globales (on compte toutes les commandes/factures)
-    commandes = Commande.objects.filter(is_deleted=False)
-    factures = Facture.objects.filter(is_deleted=False)
+    # Données globales (on compte toutes les commandes/factures), en une requête
+    return JsonResponse(donnees_graphiques_agent(agent, statistiques.repartitions(**REPARTITIONS_GRAPHIQUES)))
+
+
+# Répartitions lues par les graphiques d'un agent (voir statistiques.repartitions)
+REPARTITIONS_GRAPHIQUES = {'factures': {}, 'commandes': {}}
+
+
+def donnees_graphiques_agent(agent, repartitions):
+    """Données JSON des graphiques d'un agent, à partir de statistiques.repartitions()."""
+    factures = repartitions['factures']
     
     # Compter par statut de facture
     factures_stats = {
-        'brouillon': factures.filter(statut='brouillon').count(),
-        'validee': factures.filter(statut='validee').count(),
-        'payee': factures.filter(statut='payee').count(),
-        'annulee': factures.filter(statut='annulee').count(),
+        statut: compteurs['nombre'] for statut, compteurs in factures['par_valeur'].items()
     }
     
-    # Montants totaux par statut - avec gestion d'erreur
-    try:
-        factures_montants = {
-            'brouillon': float(factures.filter(statut='brouillon').aggregate(Sum('montant_total'))['montant_total__sum'] or 0),
-            'validee': float(factures.filter(statut='validee').aggregate(Sum('montant_total'))['montant_total__sum'] or 0),
-            'payee': float(factures.filter(statut='payee').aggregate(Sum('montant_total'))['montant_total__sum'] or 0),
-            'annulee': float(factures.filter(statut='annulee').aggregate(Sum('montant_total'))['montant_total__sum'] or 0),
-        }
-    except (TypeError, ValueError):
-        factures_montants = {
-            'brouillon': 0.0,
-            'validee': 0.0,
-            'payee': 0.0,
-            'annulee': 0.0,
-        }
+    # Montants totaux par statut
+    factures_montants = {
+        statut: float(compteurs['montant']) for statut, compteurs in factures['par_valeur'].items()
+    }
     
-    data = {
+    return {
         'agent_username': agent.username,
         'agent_full_name': agent.get_full_name() or agent.username,
-        'commandes_total': commandes.count(),
+        'commandes_total': repartitions['commandes']['nombre'],
         'factures': {
-            'total': factures.count(),
+            'total': factures['nombre'],
             'stats': factures_stats,
             'montants': factures_montants,
         },
@@ -1108,8 +1064,6 @@ def agent_graphs_data(request, pk):
             },
         }
     }
-    
-    return JsonResponse(data)
 
 # ==================== DASHBOARDS AGENT ET FOURNISSEUR ====================
 
@@ -1127,29 +1081,24 @@ def agent_dashboard_view(request):
         return redirect('admin:index')
     
     # Récupérer les produits disponibles (pas supprimés)
-    produits = Produit.objects.filter(is_deleted=False)
+    produits = Produit.objects.select_related('fournisseur')
     
     # Récupérer les commandes de cet agent (avec relations optimisées)
     commandes_agent = Commande.objects.filter(
-        agent_utilisateur=request.user, 
-        is_deleted=False
-    ).select_related('code_prod', 'code_prod__fournisseur').order_by('-date_cmd')
+        agent_utilisateur=request.user
+    ).select_related('code_prod', 'code_prod__fournisseur').with_montant().order_by('-date_commande')
     
     # Récupérer les factures de cet agent (avec relations optimisées)
     factures_agent = Facture.objects.filter(
-        agent_utilisateur=request.user, 
-        is_deleted=False
+        agent_utilisateur=request.user
     ).select_related('commande', 'commande__code_prod', 'commande__code_prod__fournisseur').order_by('-date_facture')
     
     # Calculer les statistiques
-    montant_total_commandes = sum([cmd.montant_commande() for cmd in commandes_agent])
+    montant_total_commandes = commandes_agent.total_montant()
     montant_total_factures = factures_agent.aggregate(Sum('montant_total'))['montant_total__sum'] or 0
     
-    # Récupérer ou créer le montant de l'agent
-    try:
-        montant_agent = MontantAgent.objects.get(agent_utilisateur=request.user)
-    except MontantAgent.DoesNotExist:
-        montant_agent = MontantAgent.objects.create(agent_utilisateur=request.user, montant_total=0.0)
+    # Montant de l'agent : instantané + mouvements pas encore compactés
+    montant_agent = MontantAgent.montant_pour(request.user.pk)
     
     context = {
         'produits': produits,
@@ -1174,7 +1123,7 @@ def passer_commande_view(request, produit_id):
     if request.user.is_staff:
         return redirect('admin:index')
     
-    produit = get_object_or_404(Produit, code_prod=produit_id, is_deleted=False)
+    produit = get_object_or_404(Produit, code_prod=produit_id)
     
     if request.method == 'POST':
         quantite = request.POST.get('quantite', 1)
@@ -1183,29 +1132,29 @@ def passer_commande_view(request, produit_id):
             if quantite <= 0:
                 raise ValueError("La quantité doit être positive")
         except (ValueError, TypeError):
+            metriques.PASSER_COMMANDE.inc(resultat='quantite_invalide')
             messages.error(request, "Quantité invalide")
             return redirect('stock:agent_dashboard')
         
-        # Vérifier que la quantité demandée est disponible
-        if quantite > produit.quantite:
-            messages.error(request, f"Stock insuffisant. Disponible: {produit.quantite}")
-            return redirect('stock:agent_dashboard')
-        
         try:
             # Créer la commande (la facture sera créée automatiquement par le signal)
             with transaction.atomic():
-                # 1. Créer la commande
+                # 1. Réserver le stock (décrément conditionnel en base)
+                if not reserver_stock(produit.code_prod, quantite):
+                    metriques.PASSER_COMMANDE.inc(resultat='stock_insuffisant')
+                    produit.refresh_from_db(fields=['quantite'])
+                    messages.error(request, f"Stock insuffisant. Disponible: {produit.quantite}")
+                    return redirect('stock:agent_dashboard')
+                
+                # 2. Créer la commande
                 commande = Commande.objects.create(
                     code_prod=produit,
                     quantite_cmd=quantite,
                     agent_utilisateur=request.user
                 )
                 
-                # 2. Réduire la quantité en stock
-                produit.quantite -= quantite
-                produit.save()
-                
                 # Succès
+                metriques.PASSER_COMMANDE.inc(resultat='creee')
                 messages.success(
                     request,
                     f'✓ Commande #{commande.code_cmd} créée avec succès! '
@@ -1213,6 +1162,7 @@ def passer_commande_view(request, produit_id):
                 )
         
         except Exception as e:
+            metriques.PASSER_COMMANDE.inc(resultat='erreur')
             messages.error(request, f"Erreur lors de la création de la commande: {str(e)}")
             return redirect('stock:agent_dashboard')
         
@@ -1221,6 +1171,63 @@ def passer_commande_view(request, produit_id):
     return render(request, 'stock/passer_commande.html', {'produit': produit})
 
 
+@login_required(login_url='login')
+def passer_panier_view(request):
+    """
+    Vue pour passer un panier de plusieurs produits en une seule requête.
+    Toutes les lignes sont réservées dans une même transaction et une seule
+    facture est générée pour le panier.
+    """
+    if request.user.is_staff:
+        return redirect('admin:index')
+    
+    if request.method == 'POST':
+        # Les champs du formulaire sont nommés quantite_<code_prod>
+        quantites = {}
+        for champ, valeur in request.POST.items():
+            if not champ.startswith('quantite_'):
+                continue
+            try:
+                produit_id = int(champ[len('quantite_'):])
+                quantite = int(valeur or 0)
+                if quantite < 0:
+                    raise ValueError("La quantité doit être positive")
+            except (ValueError, TypeError):
+                messages.error(request, "Quantité invalide")
+                return redirect('stock:passer_panier')
+            if quantite:
+                quantites[produit_id] = quantite
+        
+        if not quantites:
+            messages.error(request, "Votre panier est vide.")
+            return redirect('stock:passer_panier')
+        
+        try:
+            panier = passer_panier(request.user, quantites)
+        except StockInsuffisant as e:
+            produit = Produit.objects.filter(code_prod=e.produit_id).first()
+            if produit:
+                messages.error(request, f"Stock insuffisant pour {produit.nom_prod}. Disponible: {produit.quantite}")
+            else:
+                messages.error(request, "Produit introuvable.")
+            return redirect('stock:passer_panier')
+        except Exception as e:
+            messages.error(request, f"Erreur lors de la création du panier: {str(e)}")
+            return redirect('stock:passer_panier')
+        
+        messages.success(
+            request,
+            f'✓ Panier #{panier.code_panier} validé: {len(quantites)} produit(s). '
+            f'Facture générée automatiquement: {panier.facture.montant_total}€'
+        )
+        return redirect('stock:agent_dashboard')
+    
+    produits = Produit.objects.filter(
+        quantite__gt=0
+    ).select_related('fournisseur').order_by('nom_prod')
+    return render(request, 'stock/passer_panier.html', {'produits': produits})
+
+
 def home_view(request):
     """
     Vue d'accueil principale du portail.
@@ -1233,54 +1240,33 @@ def fournisseur_login_view(request):
     """
     Vue de login pour les fournisseurs (sans authentification Django requise).
     """
-    print(f"\n=== FOURNISSEUR LOGIN REQUEST ===")
-    print(f"Méthode: {request.method}")
-    print(f"POST data: {request.POST}")
-    
     if request.method == 'POST':
         nom_fournisseur = request.POST.get('nom_fournisseur', '').strip()
         mot_de_passe = request.POST.get('mot_de_passe', '').strip()
         
-        print(f"\nDEBUG Login")
-        print(f"  Nom reçu: '{nom_fournisseur}'")
-        print(f"  Mdp reçu: '{mot_de_passe}'")
-        print(f"  Longueur nom: {len(nom_fournisseur)}")
-        print(f"  Longueur mdp: {len(mot_de_passe)}")
-        
         try:
             # Chercher le fournisseur (case-insensitive)
             fournisseur = Fournisseur.objects.get(nom_fournisseur__iexact=nom_fournisseur)
-            print(f"\n✓ Fournisseur trouvé: {fournisseur.nom_fournisseur}")
-            print(f"  Code: {fournisseur.code_fournisseur}")
-            print(f"  Mdp en BD: '{fournisseur.mot_de_passe}'")
             
             # Vérifier le mot de passe
             if fournisseur.mot_de_passe:
                 mdp_bd = fournisseur.mot_de_passe.strip()
-                print(f"  Comparaison: '{mot_de_passe}' == '{mdp_bd}'")
-                print(f"  Match: {mot_de_passe == mdp_bd}")
                 
                 if mdp_bd == mot_de_passe:
                     # Stocker le code fournisseur dans la session
                     request.session['fournisseur_id'] = fournisseur.code_fournisseur
-                    print(f"✓ LOGIN RÉUSSI")
+                    metriques.CONNEXIONS.inc(espace='fournisseurs', resultat='reussie')
                     messages.success(request, f"Bienvenue {fournisseur.nom_fournisseur}!")
                     return redirect('stock:fournisseur_dashboard')
                 else:
-                    print(f"✗ Mot de passe ne correspond pas")
                     messages.error(request, "Mot de passe incorrect.")
             else:
-                print(f"✗ Mot de passe vide en BD")
                 messages.error(request, "Mot de passe non configuré.")
         
         except Fournisseur.DoesNotExist:
-            print(f"✗ Fournisseur '{nom_fournisseur}' non trouvé")
-            # Afficher tous les noms disponibles
-            noms = Fournisseur.objects.values_list('nom_fournisseur', flat=True)
-            print(f"  Fournisseurs disponibles: {list(noms)}")
             messages.error(request, "Nom du fournisseur non trouvé.")
+        metriques.CONNEXIONS.inc(espace='fournisseurs', resultat='echec')
     
-    print(f"=== FIN FOURNISSEUR LOGIN ===\n")
     return render(request, 'stock/fournisseur_login.html')
     
     return render(request, 'stock/fournisseur_login.html')
@@ -1319,26 +1305,25 @@ def fournisseur_dashboard_view(request):
         return redirect('login')
     
     # Récupérer les produits du fournisseur
-    produits_fournisseur = Produit.objects.filter(fournisseur=fournisseur, is_deleted=False)
+    produits_fournisseur = Produit.objects.filter(fournisseur=fournisseur)
     
     # Récupérer les commandes pour les produits du fournisseur
     commandes_fournisseur = Commande.objects.filter(
-        code_prod__fournisseur=fournisseur,
-        is_deleted=False
-    ).select_related('code_prod', 'agent_utilisateur')
+        code_prod__fournisseur=fournisseur
+    ).select_related('code_prod', 'agent_utilisateur').with_montant()
     
     # Récupérer les factures associées
     factures_fournisseur = Facture.objects.filter(
-        commande__code_prod__fournisseur=fournisseur,
-        is_deleted=False
-    ).select_related('commande', 'agent_utilisateur')
+        commande__code_prod__fournisseur=fournisseur
+    ).select_related('commande', 'commande__code_prod', 'agent_utilisateur')
     
-    # Statistiques
+    # Statistiques (tables d'agrégats)
+    stats = statistiques.totaux(fournisseur=fournisseur)
     total_produits = produits_fournisseur.count()
-    total_commandes = commandes_fournisseur.count()
-    montant_total_commandes = sum([cmd.montant_commande() for cmd in commandes_fournisseur])
-    montant_payees = factures_fournisseur.filter(statut='payee').aggregate(Sum('montant_total'))['montant_total__sum'] or 0
-    montant_non_payees = factures_fournisseur.filter(statut__in=['brouillon', 'validee']).aggregate(Sum('montant_total'))['montant_total__sum'] or 0
+    total_commandes = stats['nb_commandes']
+    montant_total_commandes = stats['montant_commandes']
+    montant_payees = stats['montant_factures_payee']
+    montant_non_payees = stats['montant_factures_brouillon'] + stats['montant_factures_validee']
     
     context = {
         'fournisseur': fournisseur,
@@ -1350,6 +1335,7 @@ def fournisseur_dashboard_view(request):
         'montant_total_commandes': montant_total_commandes,
         'montant_payees': montant_payees,
         'montant_non_payees': montant_non_payees,
+        'compteurs_notifications': compteurs.totaux(destinataire=fournisseur.pk),
     }
     
     return render(request, 'stock/fournisseur_dashboard.html', context)
@@ -1399,8 +1385,8 @@ def ajouter_produit_fournisseur_view(request):
             messages.error(request, "Le nom du produit est obligatoire.")
             return render(request, 'stock/ajouter_produit_fournisseur.html', {'fournisseur': fournisseur})
         
-        # Vérifier si le produit existe déjà pour ce fournisseur
-        if Produit.objects.filter(fournisseur=fournisseur, nom_prod=nom_prod, is_deleted=False).exists():
+        # Vérifier si le produit existe déjà pour ce fournisseur (même archivé)
+        if Produit.all_objects.filter(fournisseur=fournisseur, nom_prod=nom_prod).exists():
             messages.error(request, f'Un produit "{nom_prod}" existe déjà pour ce fournisseur.')
             return render(request, 'stock/ajouter_produit_fournisseur.html', {'fournisseur': fournisseur})
         
@@ -1440,7 +1426,7 @@ def modifier_produit_fournisseur_view(request, produit_id):
     
     try:
         fournisseur = Fournisseur.objects.get(user=request.user)
-        produit = Produit.objects.get(code_prod=produit_id, fournisseur=fournisseur, is_deleted=False)
+        produit = Produit.objects.get(code_prod=produit_id, fournisseur=fournisseur)
     except (Fournisseur.DoesNotExist, Produit.DoesNotExist):
         messages.error(request, "Produit non trouvé ou accès refusé.")
         return redirect('stock:fournisseur_dashboard')
@@ -1490,7 +1476,7 @@ def supprimer_produit_fournisseur_view(request, produit_id):
     
     try:
         fournisseur = Fournisseur.objects.get(user=request.user)
-        produit = Produit.objects.get(code_prod=produit_id, fournisseur=fournisseur, is_deleted=False)
+        produit = Produit.objects.get(code_prod=produit_id, fournisseur=fournisseur)
         
         # Soft delete du produit
         produit.supprimer_logique()
@@ -1603,6 +1589,263 @@ def marquer_commande_payee_view(request, commande_id):
     return redirect('stock:fournisseur_dashboard')
 
 
+# ==================== NOTIFICATIONS ====================
+
+@login_required
+@require_http_methods(["POST"])
+def marquer_notifications_lues_view(request):
+    """
+    Marque comme lues toutes les notifications d'un produit et/ou d'un
+    fournisseur (paramètres POST `produit` et `fournisseur`), en un UPDATE.
+    
+    Un administrateur choisit le produit ou le fournisseur ; un fournisseur
+    ne marque que ses propres notifications.
+    """
+    filtres = {}
+    if request.POST.get('produit'):
+        filtres['produit_id'] = request.POST['produit']
+    
+    if request.user.is_staff:
+        if request.POST.get('fournisseur'):
+            filtres['fournisseur_id'] = request.POST['fournisseur']
+    elif 'Fournisseur' in request.user.groups.values_list('name', flat=True):
+        try:
+            filtres['fournisseur'] = request.user.fournisseur
+        except Fournisseur.DoesNotExist:
+            return JsonResponse({'error': 'Fournisseur non trouvé'}, status=403)
+    else:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    
+    if not filtres:
+        return JsonResponse({'error': 'Paramètre produit ou fournisseur requis'}, status=400)
+    
+    try:
+        modifiees = Notification.objects.filter(**filtres).marquer_lues()
+    except ValueError:
+        return JsonResponse({'error': 'Paramètre invalide'}, status=400)
+    return JsonResponse({'modifiees': modifiees})
+
+
+@login_required
+@require_http_methods(["GET"])
+def compteurs_notifications_view(request):
+    """
+    Nombre de notifications non lues / non traitées, au total et par type
+    (stock.compteurs : cache, sans compter les notifications).
+    
+    Un administrateur voit tous les compteurs, ou ceux d'un fournisseur
+    destinataire (`fournisseur`) ou du fournisseur des produits
+    (`fournisseur_produit`) ; un fournisseur voit ses propres compteurs.
+    """
+    if request.user.is_staff:
+        portee = {
+            champ: request.GET[parametre]
+            for parametre, champ in (('fournisseur', 'destinataire'), ('fournisseur_produit', 'fournisseur_produit'))
+            if request.GET.get(parametre)
+        }
+        if len(portee) > 1:
+            return JsonResponse({'error': 'Un seul paramètre fournisseur ou fournisseur_produit'}, status=400)
+        return JsonResponse(compteurs.totaux(**portee))
+    
+    totaux = compteurs.totaux_utilisateur(request.user)
+    if totaux is None:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    return JsonResponse(totaux)
+
+
+# ==================== VARIANTES ASYNCHRONES (ASGI) ====================
+#
+# Mêmes gabarits et mêmes données que les vues synchrones. Les requêtes
+# indépendantes d'une page sont lancées ensemble (asyncio.gather) avec l'ORM
+# asynchrone : sous ASGI, la boucle n'est pas bloquée pendant les requêtes,
+# et chaque requête HTTP a son propre thread pour l'accès à la base.
+
+async def _rassembler(**attentes):
+    """Attend ensemble des coroutines indépendantes ; retourne {nom: résultat}."""
+    resultats = await asyncio.gather(*attentes.values())
+    return dict(zip(attentes, resultats))
+
+
+async def _liste(queryset):
+    """Évalue un QuerySet avec l'ORM asynchrone."""
+    return [objet async for objet in queryset]
+
+
+async def _rendre(request, template_name, context):
+    """
+    Rendu d'un gabarit depuis une vue asynchrone.
+    
+    Le gabarit de base lit encore la base (groupes de l'utilisateur) : le
+    rendu se fait donc dans un thread, avec l'utilisateur déjà chargé.
+    """
+    request.user = await request.auser()
+    return await sync_to_async(render)(request, template_name, context)
+
+
+async def dashboard_async_view(request):
+    """Variante asynchrone de DashboardView."""
+    donnees = await _rassembler(
+        stats=statistiques.atotaux(),
+        total_produits=Produit.objects.acount(),
+        dernieres_commandes=_liste(Commande.objects.select_related('code_prod').order_by('-date_commande')[:5]),
+        produits_rupture=_liste(Produit.objects.filter(quantite=0).order_by('nom_prod')),
+        ruptures_prevues=_liste(ruptures_prevues(jours=7)[:5]),
+        compteurs_notifications=compteurs.atotaux(),
+    )
+    stats = donnees.pop('stats')
+    context = {
+        **donnees,
+        'total_commandes': stats['nb_commandes'],
+        'total_factures': stats['nb_factures'],
+        'factures_impayees': stats['nb_factures'] - stats['nb_factures_payee'],
+    }
+    return await _rendre(request, 'stock/dashboard.html', context)
+
+
+@login_required(login_url='login')
+async def agent_dashboard_async_view(request):
+    """Variante asynchrone de agent_dashboard_view."""
+    user = await request.auser()
+    if user.is_staff:
+        return redirect('admin:index')
+    
+    commandes_agent = Commande.objects.filter(
+        agent_utilisateur=user
+    ).select_related('code_prod', 'code_prod__fournisseur').with_montant().order_by('-date_commande')
+    factures_agent = Facture.objects.filter(
+        agent_utilisateur=user
+    ).select_related('commande', 'commande__code_prod', 'commande__code_prod__fournisseur').order_by('-date_facture')
+    
+    context = await _rassembler(
+        produits=_liste(Produit.objects.select_related('fournisseur')),
+        commandes=_liste(commandes_agent),
+        factures=_liste(factures_agent),
+        montant_total_commandes=commandes_agent.atotal_montant(),
+        montant_total_factures=factures_agent.aaggregate(Sum('montant_total')),
+        montant_agent=sync_to_async(MontantAgent.montant_pour)(user.pk),
+    )
+    context['montant_total_factures'] = context['montant_total_factures']['montant_total__sum'] or 0
+    context['nombre_commandes'] = len(context['commandes'])
+    context['nombre_factures'] = len(context['factures'])
+    return await _rendre(request, 'stock/agent_dashboard.html', context)
+
+
+async def fournisseur_dashboard_async_view(request):
+    """Variante asynchrone de fournisseur_dashboard_view."""
+    user = await request.auser()
+    if not user.is_authenticated:
+        messages.error(request, "Vous devez être connecté pour accéder au dashboard.")
+        return redirect('login')
+    
+    if not await user.groups.filter(name='Fournisseur').aexists():
+        messages.error(request, "Accès refusé. Vous n'êtes pas un fournisseur.")
+        return redirect('login')
+    
+    fournisseur = await Fournisseur.objects.filter(user=user).afirst()
+    if fournisseur is None:
+        messages.error(request, "Fournisseur non trouvé.")
+        return redirect('login')
+    
+    donnees = await _rassembler(
+        produits=_liste(Produit.objects.filter(fournisseur=fournisseur)),
+        commandes=_liste(Commande.objects.filter(
+            code_prod__fournisseur=fournisseur
+        ).select_related('code_prod', 'agent_utilisateur').with_montant()),
+        factures=_liste(Facture.objects.filter(
+            commande__code_prod__fournisseur=fournisseur
+        ).select_related('commande', 'commande__code_prod', 'agent_utilisateur')),
+        stats=statistiques.atotaux(fournisseur=fournisseur),
+        compteurs_notifications=compteurs.atotaux(destinataire=fournisseur.pk),
+    )
+    stats = donnees.pop('stats')
+    context = {
+        **donnees,
+        'fournisseur': fournisseur,
+        'total_produits': len(donnees['produits']),
+        'total_commandes': stats['nb_commandes'],
+        'montant_total_commandes': stats['montant_commandes'],
+        'montant_payees': stats['montant_factures_payee'],
+        'montant_non_payees': stats['montant_factures_brouillon'] + stats['montant_factures_validee'],
+    }
+    return await _rendre(request, 'stock/fournisseur_dashboard.html', context)
+
+
+async def agent_graphs_data_async(request, pk):
+    """Variante asynchrone de agent_graphs_data."""
+    if not (await request.auser()).is_staff:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    
+    donnees = await _rassembler(
+        agent=User.objects.filter(pk=pk, is_staff=False).afirst(),
+        repartitions=statistiques.arepartitions(**REPARTITIONS_GRAPHIQUES),
+    )
+    if donnees['agent'] is None:
+        return JsonResponse({'error': 'Agent not found'}, status=404)
+    return JsonResponse(donnees_graphiques_agent(donnees['agent'], donnees['repartitions']))
+
+
+# ==================== FLUX EN DIRECT ====================
+
+@login_required
+@require_http_methods(["GET"])
+async def flux_evenements_view(request):
+    """
+    Flux server-sent events des tableaux de bord : commandes, notifications
+    et niveaux de stock, filtrés selon l'utilisateur (voir stock.evenements).
+    
+    La connexion reste ouverte ; un commentaire est envoyé toutes les
+    STOCK_FLUX_PING secondes sans événement. Disponible uniquement sous
+    ASGI : sous WSGI, la réponse occuperait un worker indéfiniment.
+    """
+    if not hasattr(request, 'scope'):
+        return JsonResponse({'error': 'Flux disponible uniquement en ASGI'}, status=501)
+    
+    user = await request.auser()
+    if user.is_staff:
+        filtres = {}
+    elif await user.groups.filter(name='Fournisseur').aexists():
+        fournisseur = await Fournisseur.objects.filter(user=user).afirst()
+        if fournisseur is None:
+            return JsonResponse({'error': 'Fournisseur non trouvé'}, status=403)
+        filtres = {'fournisseur': fournisseur.pk}
+    else:
+        filtres = {'agent': user.pk}
+    
+    async def flux():
+        abonnement = evenements.abonner(**filtres)
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                evenement = await abonnement.suivant(evenements.intervalle_ping())
+                yield ': ping\n\n' if evenement is None else evenements.format_sse(evenement)
+        finally:
+            evenements.desabonner(abonnement)
+    
+    response = StreamingHttpResponse(flux(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# ==================== MÉTRIQUES ====================
+
+@require_http_methods(["GET"])
+def metriques_view(request):
+    """
+    Métriques de tous les processus au format texte Prometheus (stock.metriques).
+    
+    Accessible aux administrateurs connectés, ou avec l'en-tête
+    `Authorization: Bearer <STOCK_METRIQUES_JETON>` pour le collecteur.
+    """
+    jeton = getattr(settings, 'STOCK_METRIQUES_JETON', None)
+    autorise = request.user.is_staff or (
+        jeton and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {jeton}')
+    )
+    if not autorise:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    return HttpResponse(metriques.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 # ==================== GESTION ANCIENNE (À GARDER POUR COMPATIBILITÉ) ====================
 
 def marquer_facture_payee_view_old(request, facture_id):
@@ -1639,35 +1882,8 @@ class FournisseurListView(AdminOnlyMixin, ListView):
     paginate_by = 10
     
     def get_queryset(self):
-        return Fournisseur.objects.all().order_by('code_fournisseur')
-    
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        
-        # Ajouter les statistiques pour chaque fournisseur
-        fournisseurs_list = list(context['fournisseurs'])
-        
-        for fournisseur in fournisseurs_list:
-            fournisseur.produits_count = Produit.objects.filter(
-                fournisseur=fournisseur,
-                is_deleted=False
-            ).count()
-            fournisseur.commandes_count = Commande.objects.filter(
-                code_prod__fournisseur=fournisseur
-            ).count()
-            fournisseur.factures_count = Facture.objects.filter(
-                commande__code_prod__fournisseur=fournisseur
-            ).count()
-            fournisseur.factures_payees = Facture.objects.filter(
-                commande__code_prod__fournisseur=fournisseur,
-                statut='payee'
-            ).count()
-            fournisseur.montant_total = Facture.objects.filter(
-                commande__code_prod__fournisseur=fournisseur
-            ).aggregate(Sum('montant_total'))['montant_total__sum'] or 0.0
-        
-        context['fournisseurs'] = fournisseurs_list
-        return context
+        # Statistiques de toute la page en une seule requête groupée
+        return statistiques.annoter_fournisseurs().order_by('code_fournisseur')
 
 
 class FournisseurCreateView(AdminOnlyMixin, CreateView):
@@ -1775,13 +1991,7 @@ class FournisseurUpdateView(AdminOnlyMixin, UpdateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         if self.object:
-            context['produits_count'] = Produit.objects.filter(
-                fournisseur=self.object,
-                is_deleted=False
-            ).count()
-            context['commandes_count'] = Commande.objects.filter(
-                code_prod__fournisseur=self.object
-            ).count()
+            context.update(statistiques.statistiques_fournisseur(self.object))
         return context
 
 